@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Universal Book Scraper 性能基準測試
+parse：比較不同 HTML 解析器在頁面上的「解析 + 提取章節 + 找下一章」耗時
+clean：比較 ContentFilter 和原來逐條 re.sub 的 clean_content，並檢查輸出一致
+site：啟動本地測試站點（可模擬延遲、錯誤、429、斷線和分頁章節），測量 scrape_from_url 的吞吐量和請求數
+
+用法：
+    python scraper_benchmark.py parse                      # 使用生成的測試頁面
+    python scraper_benchmark.py parse --fixtures pages/    # 使用保存的 .html 頁面
+    python scraper_benchmark.py save-fixtures pages/       # 把生成的測試頁面保存到目錄
+    python scraper_benchmark.py clean --chapters 20        # 正文過濾微基準
+    python scraper_benchmark.py site --chapters 50 --latency 50 --error-rate 0.05 --throttle-rate 0.05
+    python scraper_benchmark.py site --subpages 3 --cache  # 每章 3 個分頁，開啟回應快取
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from universal_book_scraper import ContentFilter, UniversalBookScraper, available_html_parsers
+
+# find_next_page_url 支援的各種「下一章」版面
+LAYOUTS = ['rel_next', 'article_nav_next', 'keyword', 'title_attr', 'nested_span']
+
+def _next_link_html(layout, next_href):
+    """按版面生成下一章連結"""
+    if not next_href:
+        return ''
+    if layout == 'rel_next':
+        return f'<a rel="next" href="{next_href}">繼續</a>'
+    if layout == 'article_nav_next':
+        return f'<div class="article-nav"><span class="article-nav-next"><a href="{next_href}">後一篇文章</a></span></div>'
+    if layout == 'keyword':
+        return f'<div class="bottem"><a href="index.html">目錄</a> <a href="{next_href}">下一章</a></div>'
+    if layout == 'title_attr':
+        return f'<div class="pager"><a href="{next_href}" title="下一章">→</a></div>'
+    if layout == 'nested_span':
+        return f'<div class="post-nav"><span class="next-article"><em><a href="{next_href}">繼續閱讀</a></em></span></div>'
+    raise ValueError(f"未知版面：{layout}")
+
+def generate_chapter_page(chapter_num, layout='keyword', next_href=None, paragraphs=40, seed=None, continued=False):
+    """生成一個帶廣告、側欄和內嵌腳本的章節頁面
+    continued: 是否為分頁章節中還有下一頁的頁面（加上「本章未完」提示）
+    """
+    rng = random.Random(seed if seed is not None else chapter_num)
+    words = "天地玄黃宇宙洪荒日月盈昃辰宿列張寒來暑往秋收冬藏閏餘成歲律呂調陽雲騰致雨露結為霜金生麗水玉出崑岡"
+
+    def sentence():
+        return ''.join(rng.choice(words) for _ in range(rng.randint(12, 40))) + '。'
+
+    body = ''.join(f'<p>{"".join(sentence() for _ in range(rng.randint(2, 5)))}</p>\n' for _ in range(paragraphs))
+    sidebar = ''.join(f'<li><a href="/book/{rng.randint(1, 9999)}.html">推薦書籍{i}</a></li>' for i in range(60))
+    script = 'var ads = [' + ','.join(f'"slot-{i}"' for i in range(300)) + '];'
+    prev_link = f'<a href="{chapter_num - 1}.html">上一章</a>' if chapter_num > 1 else ''
+    marker = '<p>本章未完，點擊下一頁繼續閱讀</p>' if continued else ''
+
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>第{chapter_num}章 - 測試小說</title>
+<script>{script}</script><style>.content p {{ text-indent: 2em; }}</style></head>
+<body>
+<div class="header"><a href="/">首頁</a><a href="/rank">排行榜</a></div>
+<div class="sidebar"><ul>{sidebar}</ul></div>
+<div class="readtitle"><h1>第{chapter_num}章 測試章節</h1></div>
+<div id="content" class="content">
+{body}{marker}
+</div>
+<div class="chapter-nav">{prev_link}{_next_link_html(layout, next_href)}</div>
+<div class="footer">廣告位招租 | 免費閱讀 | 更多精彩</div>
+</body></html>"""
+
+def generated_pages(count=20):
+    """生成覆蓋所有版面的測試頁面：[(名稱, URL, HTML)]"""
+    pages = []
+    for i in range(count):
+        layout = LAYOUTS[i % len(LAYOUTS)]
+        chapter_num = i + 1
+        url = f"http://bench.local/{layout}/{chapter_num}.html"
+        pages.append((f"{layout}_{chapter_num}.html", url, generate_chapter_page(chapter_num, layout, f"{chapter_num + 1}.html")))
+    return pages
+
+def load_fixture_pages(fixtures_dir):
+    """讀取目錄下保存的 .html 頁面"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, '*.html'))):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            pages.append((os.path.basename(path), f"http://fixture.local/{os.path.basename(path)}", f.read()))
+    return pages
+
+def bench_parse(pages, parsers, rounds=3):
+    """對每個解析器測量每頁的解析、提取和找下一章耗時（毫秒）"""
+    results = {}
+    for parser in parsers:
+        scraper = UniversalBookScraper()
+        scraper.html_parser = parser
+        scraper.site_profiles = None  # 測量完整搜索，不使用站點配置
+        timings = {'parse': [], 'extract': [], 'next_link': []}
+        found_links = []
+
+        for _ in range(rounds):
+            for chapter_num, (_, url, html) in enumerate(pages, 1):
+                started = time.perf_counter()
+                soup = scraper.make_soup(html)
+                parsed = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    next_url = scraper.find_next_page_url(soup, url)
+                linked = time.perf_counter()
+                scraper.extract_chapter_content(soup, chapter_num)
+                extracted = time.perf_counter()
+
+                timings['parse'].append((parsed - started) * 1000)
+                timings['next_link'].append((linked - parsed) * 1000)
+                timings['extract'].append((extracted - linked) * 1000)
+                found_links.append(next_url)
+
+        results[parser] = {stage: statistics.mean(values) for stage, values in timings.items()}
+        results[parser]['links'] = found_links[:len(pages)]
+    return results
+
+def print_parse_report(results, page_count):
+    print(f"\n📊 解析基準測試：{page_count} 個頁面（每頁平均毫秒）")
+    print("-" * 72)
+    print(f"{'解析器':<14}{'解析':>12}{'提取章節':>12}{'找下一章':>12}{'合計':>12}")
+    baseline = None
+    for parser, timing in results.items():
+        total = timing['parse'] + timing['extract'] + timing['next_link']
+        baseline = baseline or total
+        print(f"{parser:<14}{timing['parse']:>12.2f}{timing['extract']:>12.2f}{timing['next_link']:>12.2f}{total:>12.2f}"
+              f"   (x{baseline / total:.2f})")
+
+    parsers = list(results)
+    if len(parsers) > 1:
+        same = all(results[p]['links'] == results[parsers[0]]['links'] for p in parsers[1:])
+        print(f"\n🔗 各解析器找到的下一章連結{'一致' if same else '不一致，請檢查'}")
+
+def legacy_clean_content(text):
+    """原來的 clean_content（逐條 re.sub），作為正確性和速度的對照"""
+    ad_patterns = [
+        r'.*?章節錯誤.*?',
+        r'.*?舉報.*?',
+        r'.*?收藏.*?',
+        r'.*?投票.*?',
+        r'.*?推薦.*?',
+        r'.*?廣告.*?',
+        r'.*?免費閱讀.*?',
+        r'.*?點擊進入.*?',
+        r'.*?更多精彩.*?',
+        r'本章未完.*?點擊下一頁繼續閱讀.*?',
+    ]
+    for pattern in ad_patterns:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    text = '\n'.join(re.sub(r'[ \t]+', ' ', line.strip()) for line in text.split('\n'))
+    text = text.strip()
+    text = re.sub(r'(?<!\n)\n(?!\n)(?=\S)', '\n\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text
+
+def generate_raw_chapter(size_chars, seed):
+    """生成帶廣告行、多餘空白和各種換行的原始章節文字"""
+    rng = random.Random(seed)
+    words = "天地玄黃宇宙洪荒日月盈昃辰宿列張寒來暑往秋收冬藏閏餘成歲律呂調陽 abc XYZ"
+    noise = ContentFilter.CUT_KEYWORDS + ['本章未完', '點擊下一頁繼續閱讀', '本章未完，點擊下一頁繼續閱讀',
+                                          '\u3000', '\t', '  ', '\r', '\xa0', '\n', '\n\n', '\n \n\t\n']
+    parts = []
+    length = 0
+    while length < size_chars:
+        if rng.random() < 0.15:
+            part = rng.choice(noise)
+        else:
+            part = ''.join(rng.choice(words) for _ in range(rng.randint(1, 60)))
+        if rng.random() < 0.3:
+            part += rng.choice(['\n', '\n\n', '\n  \n', '\n\n\n\n'])
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)
+
+def bench_clean(chapters=20, size_chars=200000, rounds=3, fuzz_cases=2000):
+    """返回 (舊實現平均毫秒, 新實現平均毫秒, 不一致的樣本數)"""
+    content_filter = ContentFilter()
+    
+    # 先用大量小樣本檢查輸出一致（覆蓋邊界情況）
+    mismatches = 0
+    for seed in range(fuzz_cases):
+        sample = generate_raw_chapter(random.Random(seed).randint(0, 400), seed)
+        if legacy_clean_content(sample) != content_filter.clean(sample):
+            mismatches += 1
+    
+    texts = [generate_raw_chapter(size_chars, 100000 + i) for i in range(chapters)]
+    for text in texts:
+        if legacy_clean_content(text) != content_filter.clean(text):
+            mismatches += 1
+    
+    timings = {'legacy': [], 'filter': []}
+    for _ in range(rounds):
+        for text in texts:
+            started = time.perf_counter()
+            legacy_clean_content(text)
+            timings['legacy'].append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            content_filter.clean(text)
+            timings['filter'].append((time.perf_counter() - started) * 1000)
+    
+    return statistics.mean(timings['legacy']), statistics.mean(timings['filter']), mismatches
+
+class FixtureSiteHandler(BaseHTTPRequestHandler):
+    """本地測試站點：/<版面>/<章節號>.html（分頁為 <章節號>_<頁碼>.html），按配置加入延遲、503、429 和斷線"""
+    protocol_version = 'HTTP/1.1'
+    config = {}
+    request_count = None  # multiprocessing.Value，統計收到的請求數
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        config = self.config
+        with self.request_count.get_lock():
+            self.request_count.value += 1
+        rng = random.random()
+        if config['latency']:
+            time.sleep(config['latency'])
+        
+        if rng < config['disconnect_rate']:
+            # 不回應就關閉連接，模擬 RemoteDisconnected / 連接重置
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        rng -= config['disconnect_rate']
+        if rng < config['throttle_rate']:
+            return self._send(429, b'Too Many Requests', {'Retry-After': '0'})
+        rng -= config['throttle_rate']
+        if rng < config['error_rate']:
+            return self._send(503, b'Service Unavailable')
+        
+        match = re.fullmatch(r'/([a-z_]+)/(\d+)(?:_(\d+))?\.html', self.path)
+        if not match or match.group(1) not in LAYOUTS:
+            return self._send(404, b'Not Found')
+        layout, chapter_num, page = match.group(1), int(match.group(2)), int(match.group(3) or 1)
+        continued = page < config['subpages']
+        if continued:
+            next_href = f"{chapter_num}_{page + 1}.html"
+        else:
+            next_href = f"{chapter_num + 1}.html" if chapter_num < config['chapters'] else None
+        html = generate_chapter_page(chapter_num, layout, next_href, paragraphs=config['paragraphs'],
+                                     seed=chapter_num * 100 + page, continued=continued)
+        self._send(200, html.encode('utf-8'), {'Content-Type': 'text/html; charset=utf-8'})
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve_fixture_site(config, port_queue, request_count):
+    """在子進程中運行測試站點，避免伺服器的 CPU 計入爬蟲"""
+    FixtureSiteHandler.config = config
+    FixtureSiteHandler.request_count = request_count
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureSiteHandler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+def bench_site(layout, config, pipeline=False, cache=False):
+    """對一個版面運行 scrape_from_url，返回吞吐量、CPU、解析/網絡耗時、請求數和峰值內存
+    cache: 是否開啟回應快取；默認關閉，請求數反映每個頁面實際下載了幾次
+    """
+    port_queue = multiprocessing.Queue()
+    request_count = multiprocessing.Value('i', 0)
+    server = multiprocessing.Process(target=serve_fixture_site, args=(config, port_queue, request_count), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=10)
+    
+    work_dir = tempfile.mkdtemp(prefix='scraper_bench_')
+    original_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        # 在臨時目錄中建立，開啟回應快取時從空開始
+        scraper = UniversalBookScraper()
+        if not cache:
+            scraper.response_cache = None
+        scraper.delay = 0
+        scraper.rate_limiter.min_interval = 0
+        scraper.retry_delay = 0
+        scraper.recovery_delay = 0
+        
+        # 包裝 fetch_page、make_soup 和限速器，分別統計網絡、解析和限速等待耗時
+        # （遇到 429/503 後限速器會把間隔提高到至少 1 秒，這部分不算網絡時間）
+        timings = {'network': 0.0, 'parse': 0.0, 'wait': 0.0}
+        timing_lock = threading.Lock()
+        
+        def timed(name, method):
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    with timing_lock:
+                        timings[name] += time.perf_counter() - started
+            return wrapper
+        
+        scraper.fetch_page = timed('network', scraper.fetch_page)
+        scraper.make_soup = timed('parse', scraper.make_soup)
+        scraper.rate_limiter.acquire = timed('wait', scraper.rate_limiter.acquire)
+        
+        tracemalloc.start()
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.scrape_from_url(f"http://127.0.0.1:{port}/{layout}/1.html", config['chapters'], pipeline=pipeline)
+        wall, cpu = time.perf_counter() - wall_started, time.process_time() - cpu_started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        chapters = scraper.stats['total_chapters']
+        per_chapter = max(chapters, 1)
+        return {
+            'chapters': chapters,
+            'failed': scraper.stats['failed_chapters'],
+            'requests_per_page': request_count.value / max(chapters * config['subpages'], 1),
+            'chapters_per_sec': chapters / wall if wall else 0,
+            'cpu_ms': cpu * 1000 / per_chapter,
+            'network_ms': (timings['network'] - timings['wait']) * 1000 / per_chapter,
+            'wait_ms': timings['wait'] * 1000 / per_chapter,
+            'parse_ms': timings['parse'] * 1000 / per_chapter,
+            'peak_kb': peak / 1024
+        }
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        server.terminate()
+        server.join()
+
+def print_site_report(results, config, pipeline, cache):
+    print(f"\n📊 測試站點基準：每本 {config['chapters']} 章，每章 {config['subpages']} 頁，延遲 {config['latency'] * 1000:.0f}ms，"
+          f"503 {config['error_rate']:.0%}，429 {config['throttle_rate']:.0%}，斷線 {config['disconnect_rate']:.0%}"
+          f"{'，管線模式' if pipeline else ''}，回應快取{'開啟' if cache else '關閉'}")
+    print("-" * 118)
+    print(f"{'版面':<18}{'章節':>8}{'失敗':>6}{'章/秒':>10}{'請求/頁':>10}{'CPU ms/章':>12}{'網絡 ms/章':>12}{'解析 ms/章':>12}"
+          f"{'限速 ms/章':>12}{'峰值內存 KB':>14}")
+    for layout, result in results.items():
+        print(f"{layout:<18}{result['chapters']:>8}{result['failed']:>6}{result['chapters_per_sec']:>10.1f}"
+              f"{result['requests_per_page']:>10.2f}{result['cpu_ms']:>12.2f}{result['network_ms']:>12.2f}"
+              f"{result['parse_ms']:>12.2f}{result['wait_ms']:>12.2f}{result['peak_kb']:>14.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Universal Book Scraper 性能基準測試")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parse_cmd = subparsers.add_parser('parse', help="比較 HTML 解析器的解析和提取耗時")
+    parse_cmd.add_argument('--fixtures', help="保存的 .html 頁面目錄（默認使用生成的頁面）")
+    parse_cmd.add_argument('--pages', type=int, default=20, help="生成的頁面數量")
+    parse_cmd.add_argument('--rounds', type=int, default=3, help="重複次數")
+
+    save_cmd = subparsers.add_parser('save-fixtures', help="保存生成的測試頁面")
+    save_cmd.add_argument('directory')
+    save_cmd.add_argument('--pages', type=int, default=20)
+
+    clean_cmd = subparsers.add_parser('clean', help="比較正文過濾器和原來的 clean_content")
+    clean_cmd.add_argument('--chapters', type=int, default=20, help="大章節數量")
+    clean_cmd.add_argument('--size', type=int, default=200000, help="每章字元數")
+    clean_cmd.add_argument('--rounds', type=int, default=3, help="重複次數")
+
+    site_cmd = subparsers.add_parser('site', help="用本地測試站點測量 scrape_from_url 的吞吐量")
+    site_cmd.add_argument('--layout', choices=LAYOUTS, action='append', help="只測試指定版面（可重複，默認全部）")
+    site_cmd.add_argument('--chapters', type=int, default=30, help="每本書的章節數")
+    site_cmd.add_argument('--paragraphs', type=int, default=40, help="每章段落數")
+    site_cmd.add_argument('--latency', type=float, default=0, help="每個請求的延遲（毫秒）")
+    site_cmd.add_argument('--error-rate', type=float, default=0, help="返回 503 的比例")
+    site_cmd.add_argument('--throttle-rate', type=float, default=0, help="返回 429 的比例")
+    site_cmd.add_argument('--disconnect-rate', type=float, default=0, help="不回應直接斷線的比例")
+    site_cmd.add_argument('--subpages', type=int, default=1, help="每章的分頁數（大於 1 時非最後一頁帶「本章未完」提示）")
+    site_cmd.add_argument('--pipeline', action='store_true', help="使用管線模式")
+    site_cmd.add_argument('--cache', action='store_true', help="開啟回應快取（默認關閉，請求數反映實際下載次數）")
+
+    args = parser.parse_args()
+
+    if args.command == 'site':
+        config = {
+            'chapters': args.chapters,
+            'paragraphs': args.paragraphs,
+            'subpages': max(1, args.subpages),
+            'latency': args.latency / 1000,
+            'error_rate': args.error_rate,
+            'throttle_rate': args.throttle_rate,
+            'disconnect_rate': args.disconnect_rate
+        }
+        results = {layout: bench_site(layout, config, args.pipeline, args.cache) for layout in (args.layout or LAYOUTS)}
+        print_site_report(results, config, args.pipeline, args.cache)
+        return
+
+    if args.command == 'clean':
+        legacy_ms, filter_ms, mismatches = bench_clean(args.chapters, args.size, args.rounds)
+        print(f"\n📊 正文過濾微基準：{args.chapters} 章 × {args.size} 字元（每章平均毫秒）")
+        print("-" * 60)
+        print(f"{'clean_content（逐條 re.sub）':<30}{legacy_ms:>12.2f}")
+        print(f"{'ContentFilter（逐行一次）':<30}{filter_ms:>12.2f}   (x{legacy_ms / filter_ms:.2f})")
+        print(f"\n🔍 輸出{'完全一致' if mismatches == 0 else f'有 {mismatches} 個樣本不一致，請檢查'}")
+        return
+
+    if args.command == 'save-fixtures':
+        os.makedirs(args.directory, exist_ok=True)
+        for name, _, html in generated_pages(args.pages):
+            with open(os.path.join(args.directory, name), 'w', encoding='utf-8') as f:
+                f.write(html)
+        print(f"💾 已保存 {args.pages} 個頁面到：{args.directory}")
+        return
+
+    if args.command == 'parse':
+        pages = load_fixture_pages(args.fixtures) if args.fixtures else generated_pages(args.pages)
+        if not pages:
+            print("❌ 沒有找到任何 .html 頁面")
+            return
+        parsers = list(reversed(available_html_parsers()))  # html.parser 作為基準
+        print_parse_report(bench_parse(pages, parsers, args.rounds), len(pages))
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,1331 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString
+import argparse
 import json
 import time
 import re
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+from requests.structures import CaseInsensitiveDict
 import os
+import sys
+import hashlib
+import codecs
+import socket
+import bisect
+import operator
+import threading
+import asyncio
+from email.utils import parsedate_to_datetime
+from collections import deque, Counter, OrderedDict
+from collections.abc import Sequence
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 from http.client import RemoteDisconnected  # 正確的導入
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+def available_html_parsers():
+    """按速度排序返回可用的 BeautifulSoup 解析器；lxml 需另外安裝（pip install lxml）"""
+    parsers = []
+    try:
+        import lxml  # noqa: F401
+        parsers.append('lxml')
+    except ImportError:
+        pass
+    parsers.append('html.parser')
+    return parsers
+
+class UnwantedResponseError(requests.exceptions.RequestException):
+    """回應不是網頁或正文超過大小上限；重試也不會改變結果，調用方應直接跳過"""
+
+def check_page_headers(url, status_code, headers, max_bytes=None):
+    """下載正文前根據標頭判斷：200 回應不是 HTML/文字，或 Content-Length 已超過上限時拋出 UnwantedResponseError"""
+    content_type = (headers.get('Content-Type') or '').split(';')[0].strip().lower()
+    if status_code == 200 and content_type and not (
+            content_type.startswith('text/') or 'html' in content_type or 'xml' in content_type):
+        raise UnwantedResponseError(f"不是網頁（{content_type}）：{url}")
+    
+    length = headers.get('Content-Length') or ''
+    if max_bytes and length.isdigit() and int(length) > max_bytes:
+        raise UnwantedResponseError(f"頁面大小 {int(length) // 1024} KB 超過上限 {max_bytes // 1024} KB：{url}")
+
+class StreamedResponse(requests.Response):
+    """下載時已增量解碼的回應：編碼沒被改過時 text 直接返回解碼結果，不再把整個正文解碼一遍"""
+    decoded_text = None
+    decoded_encoding = None
+
+    @property
+    def text(self):
+        if self.decoded_text is not None and self.encoding == self.decoded_encoding:
+            return self.decoded_text
+        return super().text
+
+class HostConcurrencyLimiter:
+    """按主機（netloc）限制同時進行的請求數，取代全局的固定等待"""
+    def __init__(self, max_per_host=2):
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _semaphore_for(self, netloc):
+        with self._lock:
+            semaphore = self._semaphores.get(netloc)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_per_host)
+                self._semaphores[netloc] = semaphore
+            return semaphore
+
+    @contextmanager
+    def slot(self, url):
+        """佔用目標主機的一個請求名額，離開時釋放"""
+        semaphore = self._semaphore_for(urlparse(url).netloc)
+        semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+class AdaptiveRateLimiter:
+    """按主機（netloc）自適應調整請求間隔的限速器
+    以令牌桶（GCRA 形式）控制節奏，用 AIMD 調整速率：
+    回應快且為 2xx 時速率加性增加；遇到 429/503、Retry-After 或連接錯誤時速率減半
+    """
+    THROTTLE_STATUS = (429, 503)
+
+    def __init__(self, min_interval=1.0, max_interval=300.0, increase_step=0.05,
+                 slow_response=5.0, burst=1):
+        self.min_interval = min_interval  # 最快請求間隔（秒）
+        self.max_interval = max_interval  # 最慢請求間隔（秒）
+        self.increase_step = increase_step  # 每次成功增加的速率（請求/秒）
+        self.slow_response = slow_response  # 超過此回應時間（秒）不再加速
+        self.burst = burst  # 令牌桶容量
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, netloc, initial_interval):
+        state = self._hosts.get(netloc)
+        if state is None:
+            floor = min(self.min_interval, initial_interval)
+            state = {
+                'interval': min(initial_interval, self.max_interval),
+                'floor': floor,
+                'tat': 0.0,  # 理論到達時間
+                'blocked_until': 0.0
+            }
+            self._hosts[netloc] = state
+        return state
+
+    def acquire(self, url, initial_interval):
+        """預約目標主機的下一個請求時段，必要時等待"""
+        netloc = urlparse(url).netloc
+        with self._lock:
+            state = self._state(netloc, initial_interval)
+            now = time.monotonic()
+            tat = max(state['tat'], now, state['blocked_until'])
+            allow_at = max(tat - (self.burst - 1) * state['interval'], state['blocked_until'])
+            state['tat'] = tat + state['interval']
+        wait = allow_at - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_response(self, url, status_code, elapsed, retry_after=None):
+        """根據回應狀態和耗時調整速率"""
+        netloc = urlparse(url).netloc
+        with self._lock:
+            state = self._hosts.get(netloc)
+            if state is None:
+                return
+            if status_code in self.THROTTLE_STATUS or retry_after:
+                self._slow_down(state, retry_after or 0)
+            elif (200 <= status_code < 300 or status_code == 304) and elapsed < self.slow_response:
+                interval = state['interval']
+                if interval > state['floor']:
+                    interval = 1 / (1 / interval + self.increase_step)
+                    state['interval'] = max(interval, state['floor'])
+
+    def on_error(self, url, min_wait=0):
+        """連接錯誤或超時：速率減半並暫停該主機至少 min_wait 秒，返回實際等待秒數"""
+        netloc = urlparse(url).netloc
+        with self._lock:
+            state = self._hosts.get(netloc)
+            if state is None:
+                return min_wait
+            self._slow_down(state, min_wait)
+            return max(0.0, state['blocked_until'] - time.monotonic())
+
+    def pause(self, url, seconds):
+        """暫停該主機至少 seconds 秒（不改變速率），返回實際等待秒數"""
+        netloc = urlparse(url).netloc
+        with self._lock:
+            state = self._hosts.get(netloc)
+            if state is None:
+                return seconds
+            now = time.monotonic()
+            state['blocked_until'] = max(state['blocked_until'], now + seconds)
+            state['tat'] = max(state['tat'], state['blocked_until'])
+            return state['blocked_until'] - now
+
+    def current_interval(self, url):
+        """目標主機目前的請求間隔（秒）"""
+        state = self._hosts.get(urlparse(url).netloc)
+        return state['interval'] if state else None
+
+    def _slow_down(self, state, pause):
+        state['interval'] = min(max(state['interval'] * 2, 1.0), self.max_interval)
+        now = time.monotonic()
+        state['blocked_until'] = max(state['blocked_until'], now + pause, now + state['interval'])
+        state['tat'] = max(state['tat'], state['blocked_until'])
+
+    @staticmethod
+    def parse_retry_after(value):
+        """解析 Retry-After 標頭（秒數或 HTTP 日期），返回秒數"""
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+class CharsetDetector:
+    """判斷回應的字元編碼，避免每頁都對整個正文做統計檢測（apparent_encoding）
+    順序：HTTP Content-Type 的 charset → 前 1KB 的 <meta charset> → BOM
+    → 該主機之前檢測出的編碼 → 只對第一個非 ASCII 字節起的一段做 UTF-8 嘗試和統計檢測
+    只有從非 ASCII 內容檢測出的編碼才按主機快取；純 ASCII 的頁面不能說明該主機用什麼編碼
+    """
+    META_SCAN_BYTES = 1024
+    DETECT_BYTES = 16 * 1024
+    HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+    META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+    NON_ASCII = re.compile(rb'[\x80-\xff]')
+    # 常見的子集標籤換成超集解碼，避免生僻字變成亂碼
+    SUPERSETS = {'gb2312': 'gb18030', 'gbk': 'gb18030', 'big5': 'big5hkscs'}
+
+    def __init__(self):
+        self._host_encodings = {}
+
+    @classmethod
+    def normalize(cls, name):
+        """返回 Python 可用的編碼名稱；不認識的編碼返回 None"""
+        if isinstance(name, bytes):
+            name = name.decode('ascii', 'ignore')
+        try:
+            codec = codecs.lookup(name.strip().lower()).name
+        except (LookupError, AttributeError):
+            return None
+        return cls.SUPERSETS.get(codec, codec)
+
+    def declared_encoding(self, headers, body):
+        """HTTP 標頭或 <meta> 聲明的編碼；都沒有時返回 None"""
+        match = self.HEADER_CHARSET.search(headers.get('Content-Type') or '')
+        if match and self.normalize(match.group(1)):
+            return self.normalize(match.group(1))
+        
+        match = self.META_CHARSET.search(body[:self.META_SCAN_BYTES])
+        if match and self.normalize(match.group(1)):
+            return self.normalize(match.group(1))
+        
+        if body.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        return None
+
+    def detect(self, body):
+        """只檢測從第一個非 ASCII 字節起的一段：先試 UTF-8，再用 requests 依賴的檢測庫
+        整個正文都是 ASCII 時返回 None（任何 ASCII 相容的編碼都能正確解碼）
+        """
+        first = self.NON_ASCII.search(body)
+        if not first:
+            return None
+        # 前面都是 ASCII，第一個非 ASCII 字節一定是多字節字元的開頭
+        prefix = body[first.start():first.start() + self.DETECT_BYTES]
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(prefix, final=first.start() + self.DETECT_BYTES >= len(body))
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+        
+        try:
+            from charset_normalizer import from_bytes
+            best = from_bytes(prefix).best()
+            detected = best.encoding if best else None
+        except ImportError:
+            try:
+                import chardet
+                detected = chardet.detect(prefix).get('encoding')
+            except ImportError:
+                detected = None
+        return self.normalize(detected) if detected else None
+
+    def early_encoding(self, url, headers, prefix):
+        """只看標頭和正文開頭就能確定的編碼（與 encoding_for 的結果相同），否則返回 None"""
+        return self.declared_encoding(headers, prefix) or self._host_encodings.get(urlparse(url).netloc)
+
+    def encoding_for(self, url, response):
+        """返回回應應使用的編碼；從非 ASCII 內容檢測出的結果按主機快取"""
+        body = response.content or b''
+        declared = self.declared_encoding(response.headers, body)
+        if declared:
+            return declared
+        
+        netloc = urlparse(url).netloc
+        encoding = self._host_encodings.get(netloc)
+        if encoding is None:
+            encoding = self.detect(body)
+            if encoding is None:
+                return 'utf-8'  # 純 ASCII 或無法檢測，不快取，下一頁重新檢測
+            self._host_encodings[netloc] = encoding
+        return encoding
+
+class StageMetrics:
+    """按階段統計耗時的直方圖（累積桶，與 Prometheus histogram 相同），運行中定期導出
+    網絡：dns、connect（含 TLS）、ttfb、download；處理：charset、parse、extract（包含 clean_content）、
+    clean_content、find_next_page_url；其他：sleep（限速和恢復等待）、save（章節日誌和書籍文件）
+    export_path 以 .prom 或 .txt 結尾時寫 Prometheus 文本格式，否則寫 JSON
+    """
+    STAGES = ('dns', 'connect', 'ttfb', 'download', 'charset', 'parse', 'extract',
+              'clean_content', 'find_next_page_url', 'sleep', 'save')
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+    EXPORT_INTERVAL = 30  # 運行中最多每隔此秒數導出一次
+
+    def __init__(self, export_path=None):
+        self.export_path = export_path
+        self._lock = threading.Lock()
+        self._stages = {}  # 階段 -> {'count', 'sum', 'buckets'}（buckets 不累積，最後一格為 +Inf）
+        self._last_export = time.monotonic()
+
+    def observe(self, stage, seconds):
+        index = bisect.bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            record = self._stages.get(stage)
+            if record is None:
+                record = {'count': 0, 'sum': 0.0, 'buckets': [0] * (len(self.BUCKETS) + 1)}
+                self._stages[stage] = record
+            record['count'] += 1
+            record['sum'] += seconds
+            record['buckets'][index] += 1
+            
+            now = time.monotonic()
+            due = self.export_path and now - self._last_export >= self.EXPORT_INTERVAL
+            if due:
+                self._last_export = now
+        if due:
+            self.export()
+
+    @contextmanager
+    def timer(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def _quantile(self, buckets, count, q):
+        """按桶估計分位數：返回累積數首次達到 q 的桶上限（落在 +Inf 時返回最大的桶）"""
+        target = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.BUCKETS, buckets):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return bound
+        return self.BUCKETS[-1]
+
+    def snapshot(self):
+        """返回各階段的次數、總耗時、平均值、p50/p95 和累積桶（按 STAGES 順序）"""
+        with self._lock:
+            stages = {stage: {'count': record['count'], 'sum': record['sum'], 'buckets': list(record['buckets'])}
+                      for stage, record in self._stages.items()}
+        
+        order = list(self.STAGES) + sorted(set(stages) - set(self.STAGES))
+        result = {}
+        for stage in order:
+            record = stages.get(stage)
+            if not record:
+                continue
+            count = record['count']
+            cumulative, buckets = 0, {}
+            for bound, bucket_count in zip(self.BUCKETS + ('+Inf',), record['buckets']):
+                cumulative += bucket_count
+                buckets[str(bound)] = cumulative
+            result[stage] = {
+                'count': count,
+                'sum': record['sum'],
+                'mean': record['sum'] / count,
+                'p50': self._quantile(record['buckets'], count, 0.5),
+                'p95': self._quantile(record['buckets'], count, 0.95),
+                'buckets': buckets
+            }
+        return result
+
+    def to_json(self):
+        return json.dumps({'updated_at': time.time(), 'stages': self.snapshot()}, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        name = 'scraper_stage_duration_seconds'
+        lines = [f"# HELP {name} Time spent in each scraping stage.", f"# TYPE {name} histogram"]
+        for stage, record in self.snapshot().items():
+            for bound, cumulative in record['buckets'].items():
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {record["sum"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {record["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path=None):
+        """寫入導出文件（先寫臨時文件再替換，讀取方不會看到寫了一半的內容）"""
+        path = path or self.export_path
+        if not path:
+            return
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+_connection_timings = threading.local()  # 當前執行緒最近一次新建連接的 dns/connect 耗時
+
+class _TimedConnectionMixin:
+    """記錄 DNS 解析和建立連接（含 TLS 握手）的耗時；重用的長連接不經過這裡"""
+    def connect(self):
+        _connection_timings.dns = 0.0
+        started = time.perf_counter()
+        super().connect()
+        _connection_timings.connect = time.perf_counter() - started - _connection_timings.dns
+
+    def _new_conn(self):
+        host = self._dns_host
+        started = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            return super()._new_conn()  # 解析失敗時由 urllib3 拋出原有的異常
+        _connection_timings.dns = time.perf_counter() - started
+        
+        # 逐個嘗試已解析的地址，避免 urllib3 再解析一次
+        error = None
+        for *_, sockaddr in addresses:
+            self._dns_host = sockaddr[0]
+            try:
+                return super()._new_conn()
+            except (NewConnectionError, ConnectTimeoutError) as e:
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """requests 的傳輸適配器：新建連接時記錄 DNS 和建立連接的耗時（見 take_timings）"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+    @staticmethod
+    def take_timings():
+        """取出並清空當前執行緒記錄的連接耗時；沒有新建連接時為空"""
+        timings = dict(_connection_timings.__dict__)
+        _connection_timings.__dict__.clear()
+        return timings
+
+class AsyncFetchEngine:
+    """基於 asyncio + httpx 的抓取引擎（需另外安裝：pip install httpx；HTTP/2 需 pip install 'httpx[http2]'）
+    背景執行緒運行一個事件循環，每個主機一個連接池並保持長連接；
+    同步的 fetch() 把請求提交到事件循環並等待結果，返回 requests.Response，
+    所以 UniversalBookScraper 的其餘代碼不需要改動。多本書、多個主機可共用同一個引擎
+    """
+    def __init__(self, pool_size_per_host=2, keepalive_expiry=60.0, http2=False, headers=None):
+        import httpx
+        self._httpx = httpx
+        
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("⚠️ 沒有安裝 h2，改用 HTTP/1.1（pip install 'httpx[http2]'）")
+                http2 = False
+        self.http2 = http2
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.headers = dict(headers or {})
+        
+        self._clients = {}  # netloc -> httpx.AsyncClient（只在事件循環執行緒中訪問）
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='fetch-engine', daemon=True)
+        self._thread.start()
+
+    def _client_for(self, netloc):
+        client = self._clients.get(netloc)
+        if client is None or client.is_closed:
+            httpx = self._httpx
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                headers=self.headers,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size_per_host,
+                    max_keepalive_connections=self.pool_size_per_host,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            self._clients[netloc] = client
+        return client
+
+    async def afetch(self, url, timeout=15, headers=None, max_bytes=None):
+        """在事件循環中發出請求（供 asyncio 代碼直接 await），返回 requests.Response
+        max_bytes: 正文上限，超過或不是網頁時中止下載並拋出 UnwantedResponseError
+        """
+        client = self._client_for(urlparse(url).netloc)
+        marks = {}
+        
+        async def trace(event_name, info):
+            marks[event_name] = time.perf_counter()
+        
+        async with client.stream('GET', url, headers=headers, timeout=timeout, extensions={'trace': trace}) as response:
+            check_page_headers(url, response.status_code, response.headers, max_bytes)
+            chunks, size = [], 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UnwantedResponseError(f"頁面超過 {max_bytes // 1024} KB 上限，已中止下載：{url}")
+                chunks.append(chunk)
+        
+        converted = requests.Response()
+        converted.status_code = response.status_code
+        converted.reason = response.reason_phrase
+        converted.url = str(response.url)
+        converted.headers = CaseInsensitiveDict(response.headers)
+        converted._content = b''.join(chunks)
+        converted.elapsed = response.elapsed
+        converted.http_version = response.http_version
+        converted.stage_timings = self._stage_timings(marks)
+        return converted
+
+    @staticmethod
+    def _stage_timings(marks):
+        """從 httpcore 的 trace 事件計算 connect/ttfb/download（httpcore 的 connect_tcp 已包含 DNS 解析）"""
+        def span(start, end):
+            if start in marks and end in marks:
+                return marks[end] - marks[start]
+            return None
+        
+        timings = {}
+        connect = [span(f'connection.{step}.started', f'connection.{step}.complete')
+                   for step in ('connect_tcp', 'start_tls')]
+        if connect[0] is not None:
+            timings['connect'] = sum(part for part in connect if part is not None)
+        for protocol in ('http11', 'http2'):
+            ttfb = span(f'{protocol}.send_request_headers.started', f'{protocol}.receive_response_headers.complete')
+            if ttfb is not None:
+                timings['ttfb'] = ttfb
+                download = span(f'{protocol}.receive_response_body.started', f'{protocol}.receive_response_body.complete')
+                if download is not None:
+                    timings['download'] = download
+        return timings
+
+    def fetch(self, url, timeout=15, headers=None, max_bytes=None, max_seconds=None):
+        """同步接口：httpx 的異常轉換成對應的 requests 異常，沿用現有的重試和恢復邏輯
+        max_seconds: 整個請求（含下載正文）的總時間上限，超過時取消請求並拋出 ReadTimeout
+        """
+        future = asyncio.run_coroutine_threadsafe(self.afetch(url, timeout, headers, max_bytes), self.loop)
+        httpx = self._httpx
+        try:
+            return future.result(timeout=max_seconds)
+        except FutureTimeoutError:
+            future.cancel()
+            raise requests.exceptions.ReadTimeout(f"下載超過 {max_seconds} 秒，已中止：{url}")
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+
+    async def _close_clients(self, netlocs):
+        for netloc in netlocs:
+            client = self._clients.pop(netloc, None)
+            if client is not None:
+                await client.aclose()
+
+    def reconnect(self, url):
+        """只回收出錯主機的連接池；出錯的單個連接 httpx 已自動丟棄，其他主機的長連接不受影響"""
+        netloc = urlparse(url).netloc
+        asyncio.run_coroutine_threadsafe(self._close_clients([netloc]), self.loop).result()
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._close_clients(list(self._clients)), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+class ResponseCache:
+    """磁碟上的原始回應快取
+    正文按 SHA-256 內容尋址存放在 objects/ 下，index.json 記錄 URL → 正文摘要、
+    ETag/Last-Modified 和最近訪問時間；總大小超過上限時按 LRU 淘汰
+    記錄按訪問順序保存在 OrderedDict 中，並維護總大小和每個正文的引用數，寫入時不必重新統計和排序
+    """
+    INDEX_FILE = 'index.json'
+    FLUSH_EVERY = 20  # 每寫入多少條記錄保存一次索引（至少；記錄多時按記錄數的 5% 計，重寫索引的成本分攤後不隨快取增長）
+    HEADER_KEYS = ('Content-Type', 'ETag', 'Last-Modified')
+
+    def __init__(self, cache_dir='.scraper_cache', max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = None  # OrderedDict：URL -> 記錄，最久未訪問的在前
+        self._references = {}  # 正文摘要 -> 引用它的記錄數
+        self._total = 0  # 不重複正文的總大小
+        self._dirty = 0
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest)
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        entries = {}
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ 快取索引損壞，將重新建立：{e}")
+        
+        self._entries = OrderedDict()
+        for url, entry in sorted(entries.items(), key=lambda item: item[1]['last_access']):
+            self._add_entry(url, entry)
+
+    def _add_entry(self, url, entry):
+        self._entries[url] = entry
+        if self._references.get(entry['digest'], 0) == 0:
+            self._total += entry['size']
+        self._references[entry['digest']] = self._references.get(entry['digest'], 0) + 1
+
+    def _drop_entry(self, url):
+        self._release(self._entries.pop(url))
+
+    def _release(self, entry):
+        """減少正文的引用數；不再被引用時刪除正文文件"""
+        self._references[entry['digest']] -= 1
+        if self._references[entry['digest']] == 0:
+            del self._references[entry['digest']]
+            self._total -= entry['size']
+            try:
+                os.remove(self._object_path(entry['digest']))
+            except OSError:
+                pass
+
+    def lookup(self, url):
+        """返回 URL 的快取記錄（正文仍存在時），否則返回 None"""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(url)
+            if entry and not os.path.exists(self._object_path(entry['digest'])):
+                self._drop_entry(url)
+                return None
+            return entry
+
+    def is_fresh(self, entry, max_age):
+        return time.time() - entry['stored_at'] <= max_age
+
+    def conditional_headers(self, entry):
+        """生成重新驗證用的 If-None-Match / If-Modified-Since 標頭"""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def build_response(self, url, entry):
+        """從快取記錄構造 requests.Response（不產生網絡請求）
+        正文文件在 lookup 之後被其他執行緒淘汰時返回 None，調用方當作未命中處理
+        """
+        try:
+            with open(self._object_path(entry['digest']), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                if self._entries.get(url) is entry:
+                    self._drop_entry(url)
+            return None
+        with self._lock:
+            entry['last_access'] = time.time()
+            if url in self._entries:
+                self._entries.move_to_end(url)
+            self._mark_dirty()
+        
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.from_cache = True
+        return response
+
+    def revalidated(self, url, response):
+        """304 回應：刷新記錄的驗證標頭和時間"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return
+            for key in ('ETag', 'Last-Modified'):
+                if response.headers.get(key):
+                    entry['headers'][key] = response.headers[key]
+            entry['stored_at'] = entry['last_access'] = time.time()
+            self._entries.move_to_end(url)
+            self._mark_dirty()
+
+    def store(self, url, response):
+        """保存 200 回應的正文和驗證標頭"""
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(body)
+            os.replace(temp_path, path)
+        
+        now = time.time()
+        with self._lock:
+            self._load()
+            entry = {
+                'digest': digest,
+                'size': len(body),
+                'headers': {key: response.headers[key] for key in self.HEADER_KEYS if response.headers.get(key)},
+                'stored_at': now,
+                'last_access': now
+            }
+            # 先加入新記錄再移除舊記錄，內容沒變時正文文件不會被刪除
+            previous = self._entries.pop(url, None)
+            self._add_entry(url, entry)
+            if previous:
+                self._release(previous)
+            self._evict()
+            self._mark_dirty()
+
+    def _mark_dirty(self):
+        self._dirty += 1
+        if self._dirty >= max(self.FLUSH_EVERY, len(self._entries) // 20):
+            self._write_index()
+
+    def _evict(self):
+        """按最近訪問順序淘汰，直到總大小低於上限的 90%"""
+        if self._total <= self.max_bytes:
+            return
+        while self._entries and self._total > self.max_bytes * 0.9:
+            self._drop_entry(next(iter(self._entries)))
+
+    def _write_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self._index_path() + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self._entries, ensure_ascii=False))  # dumps 使用 C 編碼器，比 dump 逐塊寫出快很多
+        os.replace(temp_path, self._index_path())
+        self._dirty = 0
+
+    def flush(self):
+        """把未保存的索引寫入磁碟"""
+        with self._lock:
+            if self._entries is not None and self._dirty:
+                self._write_index()
+
+def book_file_stem(index_dir, start_url):
+    """同一本書的側車文件共用的路徑前綴（按主機和起始URL區分）"""
+    netloc = re.sub(r'[^\w]', '_', urlparse(start_url).netloc)
+    key = hashlib.sha1(start_url.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(index_dir, f"{netloc}_{key}")
+
+# 只去掉已知的廣告/分享追蹤參數；p、page、id、from 等可能是文章ID或分頁，必須保留
+TRACKING_PARAMS = {'gclid', 'dclid', 'msclkid', 'fbclid', 'igshid', 'yclid', 'mc_cid', 'mc_eid',
+                   '_ga', '_gl', 'spm'}  # 以及所有 utm_* 參數
+
+def canonical_url(url):
+    """判斷「是否同一章」用的規範化URL（只用於比較，不用於請求）
+    忽略協議、www./m. 前綴、默認端口、#片段、追蹤參數和參數順序
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    for prefix in ('www.', 'm.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_')
+    )
+    return urlunsplit(('', host, parts.path or '/', urlencode(query), ''))
+
+class ContentFilter:
+    """預先編譯的正文過濾器，逐行一次處理：
+    cut_keywords: 行內出現這些關鍵字時，刪除該行到最後一個關鍵字為止的內容（廣告、舉報、收藏等）
+    segment_patterns: 行內刪除匹配的片段（如「本章未完……點擊下一頁繼續閱讀」）
+    之後去掉每行首尾空白、合併空格，非空行之間統一用雙換行分隔段落
+    """
+    CUT_KEYWORDS = [
+        '章節錯誤', '舉報', '收藏', '投票', '推薦',
+        '廣告', '免費閱讀', '點擊進入', '更多精彩'
+    ]
+    SEGMENT_PATTERNS = [r'本章未完.*?點擊下一頁繼續閱讀']
+    SPACES = re.compile(r'[ \t]+')
+
+    def __init__(self, cut_keywords=None, segment_patterns=None):
+        self.cut_keywords = list(self.CUT_KEYWORDS if cut_keywords is None else cut_keywords)
+        self.segment_patterns = list(self.SEGMENT_PATTERNS if segment_patterns is None else segment_patterns)
+        
+        # 反轉行和關鍵字後做一次 search：最左的匹配就是原行中結束位置最靠後的關鍵字
+        self._cut_reversed = None
+        if self.cut_keywords:
+            alternation = '|'.join(re.escape(keyword[::-1]) for keyword in self.cut_keywords)
+            self._cut_reversed = re.compile(alternation, re.IGNORECASE)
+        self._segments = [re.compile(pattern, re.IGNORECASE) for pattern in self.segment_patterns]
+
+    @classmethod
+    def with_site_rules(cls, rules):
+        """在默認規則後追加站點規則：{"cut_keywords": [...], "segment_patterns": [...]}"""
+        return cls(cls.CUT_KEYWORDS + list(rules.get('cut_keywords', [])),
+                   cls.SEGMENT_PATTERNS + list(rules.get('segment_patterns', [])))
+
+    def clean(self, text):
+        paragraphs = []
+        cut_reversed = self._cut_reversed
+        for line in text.split('\n'):
+            if cut_reversed is not None:
+                match = cut_reversed.search(line[::-1])
+                if match:
+                    line = line[len(line) - match.start():]
+            for segment in self._segments:
+                line = segment.sub('', line)
+            line = line.strip()
+            if line:
+                paragraphs.append(self.SPACES.sub(' ', line))
+        return '\n\n'.join(paragraphs)
+
+class ChapterLog:
+    """追加式章節日誌（JSONL）
+    每爬到一章就追加一行，按批次 fsync；中途崩潰也只會丟失最後一批未同步的章節
+    書籍 JSON 由 export 步驟從日誌生成，保存成本與章節大小成正比，而不是整本書
+    """
+    def __init__(self, path, fsync_every=10):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._file = None
+        self._unsynced = 0
+
+    @classmethod
+    def for_book(cls, index_dir, start_url):
+        return cls(book_file_stem(index_dir, start_url) + '.chapters.jsonl')
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _records(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # 中斷時可能留下不完整的最後一行
+        except FileNotFoundError:
+            return
+
+    def book_info(self):
+        """返回最後記錄的書籍信息（書名、作者、起始URL），沒有則返回 None"""
+        info = None
+        for record in self._records():
+            if record.get('type') == 'book':
+                info = record
+        return info
+
+    def iter_chapters(self):
+        """按章節順序逐條讀出章節記錄（不會一次載入整本書）"""
+        last_chapter = 0
+        for record in self._records():
+            if record.get('type') == 'chapter' and record['chapter'] > last_chapter:
+                last_chapter = record['chapter']
+                yield record
+
+    def _write(self, record):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def append_chapter(self, chapter_num, chapter):
+        record = {'type': 'chapter', 'chapter': chapter_num}
+        record.update(chapter)
+        self._write(record)
+
+    def set_book_info(self, title, author, start_url):
+        self._write({'type': 'book', 'title': title, 'author': author, 'start_url': start_url})
+        self.sync()
+
+    def sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+class ChapterLogPages(Sequence):
+    """書籍的 pages 列表：按需從章節日誌逐章分頁，不把整本書的正文留在內存中
+    可以像列表一樣 len()、迭代、索引和切片（索引和切片需從頭讀到該頁）；要一次取出全部時用 list(pages)
+    """
+    def __init__(self, chapter_log, paginate, page_count):
+        self.chapter_log = chapter_log
+        self.paginate = paginate
+        self.page_count = page_count
+
+    def __iter__(self):
+        for chapter in self.chapter_log.iter_chapters():
+            yield from self.paginate(chapter['title'], chapter['content'])
+
+    def __len__(self):
+        return self.page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(islice(self, *index.indices(self.page_count)))
+        if index < 0:
+            index += self.page_count
+        if not 0 <= index < self.page_count:
+            raise IndexError('page index out of range')
+        return next(islice(self, index, None))
+
+class BookManifest:
+    """書籍文件清單：起始URL → 書籍文件、最後一章URL、章節數
+    續傳時只需讀取這個小文件，不必逐個 json.load 目錄下的所有書籍
+    """
+    HEAD_BYTES = 4096  # 重建清單時只讀取每個文件的開頭
+
+    def __init__(self, path='book_manifest.json'):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, manifest):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        """讀取清單；不存在或損壞時掃描目錄重建"""
+        with self._lock:
+            return self._load_unlocked()
+
+    def _load_unlocked(self):
+        try:
+            return self._read()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ 書籍清單損壞，將重新建立：{e}")
+        manifest = self.rebuild()
+        self._write(manifest)
+        return manifest
+
+    def rebuild(self):
+        """掃描目錄下的書籍 JSON，只讀文件開頭判斷是否為書籍"""
+        import glob
+        manifest = {'books': {}}
+        manifest_name = os.path.basename(self.path)
+        
+        for file_path in glob.glob("*.json"):
+            if os.path.basename(file_path) == manifest_name:
+                continue
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    head = f.read(self.HEAD_BYTES)
+            except Exception:
+                continue
+            if '"instruction"' not in head:
+                continue
+            
+            title = re.search(r'"title":\s*("(?:[^"\\]|\\.)*")', head)
+            manifest['books'][f"file:{file_path}"] = {
+                'file': file_path,
+                'title': json.loads(title.group(1)) if title else None,
+                'start_url': None,
+                'updated': os.path.getmtime(file_path)
+            }
+        
+        print(f"🗂️ 已重建書籍清單：{len(manifest['books'])} 本書")
+        return manifest
+
+    def lookup(self, start_url):
+        """按起始URL查找書籍文件；舊文件按文件名中的域名匹配"""
+        books = self.load()['books']
+        
+        entry = books.get(start_url)
+        if entry and os.path.exists(entry['file']):
+            return entry['file']
+        
+        url_identifier = urlparse(start_url).netloc.replace('.', '_')
+        for entry in books.values():
+            if (entry.get('start_url') is None and url_identifier in entry['file'].lower()
+                    and os.path.exists(entry['file'])):
+                return entry['file']
+        return None
+
+    def record(self, start_url, file_path, title, chapter_count, last_url):
+        """保存書籍後更新清單"""
+        with self._lock:
+            manifest = self._load_unlocked()
+            manifest['books'][start_url] = {
+                'file': file_path,
+                'title': title,
+                'start_url': start_url,
+                'netloc': urlparse(start_url).netloc,
+                'last_url': last_url,
+                'chapter_count': chapter_count,
+                'updated': time.time()
+            }
+            # 舊的掃描記錄若指向同一文件則移除
+            manifest['books'].pop(f"file:{file_path}", None)
+            self._write(manifest)
+
+class SiteProfileStore:
+    """站點提取配置：netloc → 上次成功的標題選擇器、內容選擇器和下一章策略
+    同一站點的頁面結構基本不變，之後的頁面先試這些策略，失敗才做完整搜索
+    配置保存到磁碟，下次運行直接沿用
+    """
+    WRITE_INTERVAL = 10  # 配置變化後最多每隔這麼多秒寫盤一次，其餘由 flush 補上
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._profiles = None
+        self._dirty = False
+        self._last_write = 0
+
+    def _load(self):
+        if self._profiles is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._profiles = json.load(f)
+            except FileNotFoundError:
+                self._profiles = {}
+            except Exception as e:
+                print(f"⚠️ 站點配置損壞，將重新學習：{e}")
+                self._profiles = {}
+        return self._profiles
+
+    def get(self, url):
+        """返回該站點的配置（沒有時返回空字典）"""
+        with self._lock:
+            return self._load().get(urlparse(url).netloc, {})
+
+    def learn(self, url, field, value):
+        """記錄成功的策略；與已有配置相同時什麼都不做"""
+        netloc = urlparse(url).netloc
+        with self._lock:
+            profiles = self._load()
+            profile = profiles.get(netloc, {})
+            if profile.get(field) == value:
+                return
+            # 替換整個字典，get() 返回的舊配置不受影響
+            profiles[netloc] = dict(profile, **{field: value, 'updated': time.time()})
+            self._dirty = True
+            if time.time() - self._last_write >= self.WRITE_INTERVAL:
+                self._write_unlocked()
+
+    def _write_unlocked(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._profiles, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+        self._dirty = False
+        self._last_write = time.time()
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._write_unlocked()
+
+class ChapterLinkIndex:
+    """章節連結圖索引（JSONL 側車文件）
+    每行是一條追加記錄：章節資料（章節號、標題、內容摘要）或下一章連結，載入時按 URL 合併
+    續傳時直接從最後一章的 next_url 繼續，不必從第一章重新走一遍
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}  # url -> {'url', 'chapter', 'title', 'content_hash', 'next_url'}
+        self._by_chapter = {}
+        self._load()
+
+    @classmethod
+    def for_book(cls, index_dir, start_url):
+        """按起始URL決定索引文件位置"""
+        return cls(book_file_stem(index_dir, start_url) + '.links.jsonl')
+
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 中斷時可能留下不完整的最後一行
+                    self._merge(record)
+        except FileNotFoundError:
+            pass
+
+    def _merge(self, record):
+        entry = self.entries.setdefault(record['url'], {'url': record['url']})
+        entry.update(record)
+        if 'chapter' in record:
+            self._by_chapter[record['chapter']] = entry
+
+    def _append(self, record):
+        with self._lock:
+            self._merge(record)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def record_chapter(self, chapter_num, url, title, content):
+        self._append({
+            'url': url,
+            'chapter': chapter_num,
+            'title': title,
+            'content_hash': self.content_hash(content)
+        })
+
+    def record_link(self, url, next_url):
+        self._append({'url': url, 'next_url': next_url})
+
+    def chapter_entry(self, chapter_num):
+        return self._by_chapter.get(chapter_num)
+
+class CompactUrlSet:
+    """只保存URL的 64 位摘要的集合，用於「是否已訪問」判斷
+    長篇書籍有上萬個URL時，比保存完整字串省下大部分內存
+    URL 先經過 canonical_url 規範化，帶追蹤參數或換了鏡像前綴的同一章視為已訪問
+    """
+    def __init__(self, urls=()):
+        self._digests = set()
+        for url in urls:
+            self.add(url)
+
+    @staticmethod
+    def _digest(url):
+        return int.from_bytes(hashlib.blake2b(canonical_url(url).encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, url):
+        self._digests.add(self._digest(url))
+
+    def __contains__(self, url):
+        return self._digest(url) in self._digests
+
+    def __len__(self):
+        return len(self._digests)
+
+    def copy(self):
+        other = CompactUrlSet()
+        other._digests = set(self._digests)
+        return other
+
+class ChapterFingerprints:
+    """章節內容的 SimHash 指紋索引，找出同一章在不同URL（鏡像站、帶參數的URL）下的重複內容
+    以標點和空白切出的相鄰兩個短句為特徵，空白、換行和標點寫法不同不影響指紋，
+    少量文字差異（廣告、簽名）只改變少數幾位；64 位指紋分成 8 段，
+    漢明距離不超過 6 的兩個指紋至少有一段相同，查找時只比較同段的指紋
+    指紋相近只是候選：正文規範化後完全相同，或字數相近且URL/標題相同，才確認是重複章節
+    """
+    BANDS = 8
+    MAX_DISTANCE = 6
+    CHAR_COUNT_TOLERANCE = 0.02  # 只憑URL或標題確認時，字數最多相差 2%
+    SPLIT = re.compile(r'[\W_]+')
+    _BYTE_OFFSETS = tuple(range(0, 8 * 256, 256))
+    _VALUES_WITH_BIT = [[value for value in range(256) if value >> bit & 1] for bit in range(8)]
+
+    def __init__(self):
+        self._bands = [{} for _ in range(self.BANDS)]  # 段值 -> [(指紋, 章節號)]
+        self._chapters = {}  # 章節號 -> (正文摘要, 字數, 規範化URL, 標題)，用於確認重複
+
+    @classmethod
+    def fingerprint(cls, text):
+        """返回 64 位 SimHash（整數）；沒有任何文字時返回 0"""
+        clauses = [clause for clause in cls.SPLIT.split(text or '') if clause]
+        if not clauses:
+            return 0
+        features = Counter(zip(clauses, clauses[1:])) if len(clauses) > 1 else Counter([(clauses[0],)])
+        
+        # 先按「字節位置 × 字節值」累計權重，最後再展開成 64 個位，比逐位累加少很多次運算
+        weights = [0] * (8 * 256)
+        for feature, count in features.items():
+            digest = hashlib.blake2b('\x00'.join(feature).encode('utf-8'), digest_size=8).digest()
+            for index in map(operator.add, cls._BYTE_OFFSETS, digest):
+                weights[index] += count
+        
+        half = sum(features.values()) / 2
+        fingerprint = 0
+        for position in range(8):
+            row = weights[position * 256:(position + 1) * 256]
+            for bit, values in enumerate(cls._VALUES_WITH_BIT):
+                if sum(map(row.__getitem__, values)) > half:
+                    fingerprint |= 1 << (position * 8 + bit)
+        return fingerprint
+
+    @classmethod
+    def content_digest(cls, text):
+        """忽略空白、換行和標點寫法的正文摘要，用於確認完全相同的內容"""
+        clauses = '\x00'.join(clause for clause in cls.SPLIT.split(text or '') if clause)
+        return hashlib.sha256(clauses.encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def identity(cls, chapter):
+        """章節記錄的確認用資料：(正文摘要, 字數, 規範化URL, 標題)"""
+        return (cls.content_digest(chapter['content']), chapter.get('char_count') or len(chapter['content']),
+                canonical_url(chapter.get('url') or ''), (chapter.get('title') or '').strip())
+
+    def _band_keys(self, fingerprint):
+        return [(fingerprint >> (band * 8)) & 0xFF for band in range(self.BANDS)]
+
+    def find(self, fingerprint):
+        """返回內容相近的已有章節號；沒有時返回 None"""
+        if not fingerprint:
+            return None
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            for other, chapter_num in band.get(key, ()):
+                if bin(other ^ fingerprint).count('1') <= self.MAX_DISTANCE:
+                    return chapter_num
+        return None
+
+    def match(self, fingerprint, identity):
+        """返回 (章節號, 是否確認重複)；沒有指紋相近的章節時返回 (None, False)
+        identity: identity() 的結果；指紋相近但內容未確認相同時返回該章節號和 False
+        """
+        chapter_num = self.find(fingerprint)
+        if chapter_num is None:
+            return None, False
+        known = self._chapters.get(chapter_num)
+        if not known:
+            return chapter_num, False
+        digest, char_count, url, title = identity
+        if digest == known[0]:
+            return chapter_num, True
+        close_size = abs(char_count - known[1]) <= max(char_count, known[1]) * self.CHAR_COUNT_TOLERANCE
+        same_source = url == known[2] or (title and title == known[3])
+        return chapter_num, bool(close_size and same_source)
+
+    def add(self, fingerprint, chapter_num, identity=None):
+        if identity:
+            self._chapters[chapter_num] = identity
+        if not fingerprint:
+            return
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            band.setdefault(key, []).append((fingerprint, chapter_num))
+
+class ChapterTally:
+    """已爬章節的摘要：章節數、頁數、第一章、最後一章和本次新增的前幾章
+    正文只寫入章節日誌，不留在內存中，內存佔用不隨書籍長度增長
+    """
+    PREVIEW = 10  # 爬取總結中顯示的章節數
+
+    def __init__(self):
+        self.count = 0
+        self.page_total = 0
+        self.existing_count = 0
+        self.existing_page_total = 0
+        self.first = None
+        self.last = None
+        self.preview = []
+
+    def add(self, summary, existing=False):
+        """summary: {'title', 'url', 'char_count', 'word_count', 'page_count'}"""
+        self.count += 1
+        self.page_total += summary['page_count']
+        if existing:
+            self.existing_count += 1
+            self.existing_page_total += summary['page_count']
+        elif len(self.preview) < self.PREVIEW:
+            self.preview.append(summary)
+        if self.first is None:
+            self.first = summary
+        self.last = summary
+
+    def __len__(self):
+        return self.count
 
 class UniversalBookScraper:
+    FAILED_URL_SAMPLE = 20  # 統計中保留的失敗URL數量
+
     def __init__(self):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
-        self.delay = 60  # 爬取間隔，避免被封
+        self.session.mount('http://', TimedHTTPAdapter())
+        self.session.mount('https://', TimedHTTPAdapter())
+        self.fetch_engine = None  # 設置 AsyncFetchEngine 後由它代替 session 發出請求（見 use_async_engine）
+        self.log = print  # 輸出函數；批量模式下換成寫入該書日誌文件的函數（工作執行緒的輸出也會寫到同一文件）
+        self.delay = 60  # 每個主機的初始爬取間隔，之後由限速器自動調整
         
         # 新增重試配置
         self.max_retries = 3  # 最大重試次數
-        self.retry_delay = 10  # 重試延遲（秒）
+        self.retry_delay = 10  # 重試前至少等待的秒數（限速器可能要求更久）
+        
+        # 新增自適應限速器（按主機共享，取代固定的 sleep）
+        self.rate_limiter = AdaptiveRateLimiter()
+        
+        # 新增回應快取（續傳和重試時不重複下載）
+        self.cache_max_age = 600  # 快取在此秒數內直接使用，超過則用 ETag/Last-Modified 重新驗證
+        self.response_cache = ResponseCache('.scraper_cache', max_bytes=512 * 1024 * 1024)
+        self.charset_detector = CharsetDetector()  # 按主機快取檢測出的編碼
+        self.max_page_bytes = 8 * 1024 * 1024  # 單個頁面的正文上限（邊下載邊計算，超過即中止）
+        self.max_download_seconds = 60  # 單個頁面下載的總時間上限（timeout 只限制每次讀取，防止伺服器慢慢滴數據）
+        self.metrics = StageMetrics()  # 各階段耗時直方圖；設置 metrics.export_path 後運行中定期導出
         
         # 新增統計變量
         self.stats = {
@@ -28,232 +1336,455 @@ class UniversalBookScraper:
             'total_characters': 0,
             'total_words': 0,
             'failed_chapters': 0,
-            'visited_urls': [],
-            'successful_urls': [],
-            'failed_urls': []
+            'duplicate_chapters': 0,
+            'suspected_duplicates': 0,  # 指紋相近但未確認重複、仍然保存的章節
+            'visited_count': 0,
+            'successful_count': 0,
+            'failed_urls': deque(maxlen=self.FAILED_URL_SAMPLE)  # 只保留最近的失敗URL樣本
         }
         
         # 新增續傳相關變量
-        self.existing_book_data = None
-        self.existing_chapters = []
-        self.existing_urls = set()
+        self.existing_book_data = None  # 已有書籍的書名和作者
+        self.existing_chapters = None  # 已有章節的摘要（ChapterTally）
+        self.existing_urls = CompactUrlSet()
+        self.fingerprints = ChapterFingerprints()  # 本書已保存章節的內容指紋（去重用）
         self.continue_mode = False
+        self.index_dir = '.scraper_index'  # 章節連結索引和章節日誌目錄
+        self.link_index = None
+        self.chapter_log = None
+        self.last_saved_file = None
+        self.manifest = BookManifest('book_manifest.json')  # 起始URL → 書籍文件清單
+        self.site_profiles = SiteProfileStore(os.path.join(self.index_dir, 'site_profiles.json'))  # 每個站點成功的提取策略
 
         # 新增自動恢復配置
         self.auto_recovery = True  # 是否啟用自動恢復
         self.recovery_delay = 60  # 恢復等待時間（秒）
         self.max_recoveries = 5  # 最大恢復次數
         self.recovery_count = 0  # 當前恢復次數
+
+        # 新增 HTML 解析器配置：'auto' 優先使用 lxml，沒有安裝時退回 html.parser
+        self.html_parser = 'auto'
+        
+        # 新增正文過濾配置：站點專用的廣告關鍵字規則（可選文件）
+        self.content_filter_file = 'content_filters.json'
+        self._content_filters = None
+        
+        # 新增管線模式配置
+        self.pipeline_mode = False  # 是否啟用管線模式（邊發現連結邊並行提取）
+        self.pipeline_workers = 4  # 提取章節內容的工作執行緒數
+        self.max_concurrent_per_host = 2  # 每個主機同時進行的最大請求數
+        self.host_limiter = HostConcurrencyLimiter(self.max_concurrent_per_host)
+        
+        # 新增分頁章節合併配置（一章分成 xxx_2.html、xxx_3.html 等多個頁面的網站）
+        self.stitch_subpages = True  # 是否把同一章的分頁合併為一章
+        self.max_prefetch_subpages = 8  # 第一頁解析後最多並行預取的分頁數
+        self._prefetch_executor = None
+        self._prefetch_lock = threading.Lock()
+        self._chapter_tail_url = None  # 最近一章最後一個分頁的URL（逐章模式從這裡找下一章）
+        self._probed_page = None  # 判斷分頁時已下載並解析、實為下一章的頁面：(URL, soup)
+        self.speculative_prefetch = True  # 逐章模式中提前下載下一章
+        self._speculative = None  # 逐章模式中預取的下一章：(URL, Future)
     
-    def scrape_from_url(self, start_url, max_chapters=999):
-        """從指定URL開始爬取書籍（支援續傳和自動恢復）"""
+    def scrape_from_url(self, start_url, max_chapters=999, pipeline=None):
+        """從指定URL開始爬取書籍（支援續傳和自動恢復）
+        pipeline: 是否使用管線模式，None 表示使用 self.pipeline_mode
+        返回書籍數據（與 convert_to_ebook 相同的字段）；pages 是 ChapterLogPages，按需從章節日誌讀取正文
+        書籍文件已從章節日誌導出到 last_saved_file
+        """
+        if pipeline is None:
+            pipeline = self.pipeline_mode
+
         # 初始化統計
         self.stats['start_time'] = time.time()
-        self.stats['visited_urls'] = []
-        self.stats['successful_urls'] = []
-        self.stats['failed_urls'] = []
-        
-        print(f"🚀 開始從URL爬取：{start_url}")
-        
-        # 🔍 檢查是否有現有的書籍文件
-        existing_file = self.check_existing_book_file(start_url)
-        chapters = []
-        
-        if (existing_file):
-            print(f"📖 發現現有書籍文件：{existing_file}")
-            chapters = self.load_existing_chapters(existing_file)
-            if chapters:
-                print(f"✅ 載入了 {len(chapters)} 個已存在的章節")
-                self.continue_mode = True
-                
-                # 找到應該繼續的URL
-                continue_url = self.find_continue_url(start_url, chapters)
-                if continue_url:
-                    start_url = continue_url
-                    print(f"🔗 續傳模式：從第 {len(chapters) + 1} 章開始：{continue_url}")
-                else:
-                    print("✅ 所有章節已完成，無需繼續爬取")
-                    return self.existing_book_data
+        self.stats['visited_count'] = 0
+        self.stats['successful_count'] = 0
+        self.stats['failed_urls'] = deque(maxlen=self.FAILED_URL_SAMPLE)
+        self.stats['duplicate_chapters'] = 0
+        self.stats['suspected_duplicates'] = 0
+        self.fingerprints = ChapterFingerprints()
+        
+        self.log(f"🚀 開始從URL爬取：{start_url}")
+        book_url = start_url
+        self.link_index = ChapterLinkIndex.for_book(self.index_dir, book_url)
+        self.chapter_log = ChapterLog.for_book(self.index_dir, book_url)
+        
+        # 🔍 優先從章節日誌續傳，其次檢查是否有現有的書籍文件
+        chapters = self.load_chapters_from_log()
+        if not chapters:
+            existing_file = self.check_existing_book_file(book_url)
+            if existing_file:
+                self.log(f"📖 發現現有書籍文件：{existing_file}")
+                chapters = self.seed_chapter_log(self.load_existing_chapters(existing_file), book_url)
+        self.existing_chapters = chapters
+        
+        if chapters:
+            self.log(f"✅ 載入了 {len(chapters)} 個已存在的章節")
+            self.continue_mode = True
+            
+            # 找到應該繼續的URL
+            continue_url = self.find_continue_url(book_url, chapters)
+            if continue_url:
+                start_url = continue_url
+                self.log(f"🔗 續傳模式：從第 {len(chapters) + 1} 章開始：{continue_url}")
+            else:
+                self.log("✅ 所有章節已完成，無需繼續爬取")
+                start_url = None
         
-        print(f"📚 最多爬取 {max_chapters} 章")
-        print(f"⏰ 開始時間：{time.strftime('%Y-%m-%d %H:%M:%S')}")
+        self.log(f"📚 最多爬取 {max_chapters} 章")
+        self.log(f"⏰ 開始時間：{time.strftime('%Y-%m-%d %H:%M:%S')}")
         if self.continue_mode:
-            print(f"🔄 續傳模式：已有 {len(chapters)} 章，繼續爬取新章節")
-        print("-" * 60)
+            self.log(f"🔄 續傳模式：已有 {len(chapters)} 章，繼續爬取新章節")
+        if pipeline:
+            self.log(f"⚡ 管線模式：{self.pipeline_workers} 個工作執行緒，每主機最多 {self.host_limiter.max_per_host} 個並發請求")
+        self.log("-" * 60)
         
-        current_url = start_url
-        chapter_count = len(chapters)  # 從已有章節數開始計算
         visited_urls = self.existing_urls.copy()  # 包含已存在的URLs
         
+        if pipeline:
+            current_url, chapter_count = self._scrape_pipelined(
+                start_url, len(chapters), chapters, visited_urls, max_chapters
+            )
+        else:
+            current_url, chapter_count = self._scrape_sequential(
+                start_url, len(chapters), chapters, visited_urls, max_chapters
+            )
+        
+        # 完成統計
+        self.stats['end_time'] = time.time()
+        self.stats['total_chapters'] = len(chapters)
+        if self.response_cache:
+            self.response_cache.flush()
+        if self.site_profiles:
+            self.site_profiles.flush()
+        self.metrics.export()
+        self._cancel_speculative()
+        if self._prefetch_executor:
+            self._prefetch_executor.shutdown(wait=False)
+            self._prefetch_executor = None
+        self.chapter_log.sync()
+        
+        # 顯示爬取總結
+        self.print_scraping_summary(chapters)
+        
+        if self.continue_mode:
+            self.log(f"🎉 續傳完成！總共 {len(chapters)} 章（新增 {len(chapters) - chapters.existing_count} 章）")
+        else:
+            self.log(f"🎉 爬取完成！共爬取 {len(chapters)} 章")
+        
+        # 如果爬取到內容，嘗試提取書名和作者
+        if chapters:
+            if self.continue_mode and self.existing_book_data:
+                # 續傳模式：更新現有書籍數據
+                book_title = self.existing_book_data['title']
+                author = self.existing_book_data['author']
+            else:
+                # 新書模式：提取書名和作者
+                book_title, author = self.extract_book_info(book_url, chapters.first)
+                self.chapter_log.set_book_info(book_title, author, book_url)
+            
+            ebook_data = self.ebook_metadata(book_title, author, len(chapters), chapters.page_total)
+            self.stats['total_pages'] = chapters.page_total
+            
+            # 自動保存：從章節日誌導出書籍 JSON
+            is_complete = (chapter_count >= max_chapters or current_url is None)
+            self.last_saved_file = self.auto_save_book(ebook_data, is_complete, is_continue=self.continue_mode)
+            self.chapter_log.close()
+            if self.last_saved_file and self.manifest:
+                self.manifest.record(book_url, self.last_saved_file, book_title, len(chapters), chapters.last['url'])
+            
+            pages = ChapterLogPages(self.chapter_log, self.paginate_chapter, chapters.page_total)
+            return {key: (pages if key == 'pages' else ebook_data[key]) for key in (
+                'id', 'title', 'author', 'coverImage', 'instruction',
+                'pages', 'totalPages', 'currentPage', 'bookmarkedPages'
+            )}
+        else:
+            self.log("❌ 沒有爬取到任何章節")
+            self.chapter_log.close()
+            return None
+
+    def _scrape_sequential(self, current_url, chapter_count, chapters, visited_urls, max_chapters):
+        """逐章爬取：抓取 → 解析 → 尋找下一章 → 等待"""
         while current_url and chapter_count < max_chapters:
             # 防止重複爬取
             if current_url in visited_urls:
-                print(f"⚠️ 檢測到重複URL，停止爬取：{current_url}")
+                self.log(f"⚠️ 檢測到重複URL，停止爬取：{current_url}")
                 break
                 
             visited_urls.add(current_url)
-            self.stats['visited_urls'].append(current_url)
+            self.stats['visited_count'] += 1
             
-            # 使用重試機制爬取章節
-            success = self.scrape_chapter_with_retry(
-                current_url, chapter_count + 1, chapters
+            # 使用重試機制爬取章節（同時返回解析頁面時找到的下一章）
+            success, next_url = self.scrape_chapter_with_retry(
+                current_url, chapter_count + 1, chapters,
+                visited_urls=visited_urls,
+                prefetch_next=(self.speculative_prefetch and chapter_count + 1 < max_chapters)
             )
             
             if success:
                 # 重置恢復計數器（成功後重置）
                 self.recovery_count = 0
                 
-                # 尋找下一章連結 - 加入自動恢復機制
-                next_url_result = self.find_next_page_with_recovery(current_url)
+                # 解析章節時沒找到下一章連結才重新查找 - 加入自動恢復機制（分頁章節從最後一個分頁開始找）
+                next_url_result = next_url or self.find_next_page_with_recovery(self._chapter_tail_url or current_url)
                 
                 if next_url_result is None:
                     # 自動恢復失敗，停止爬取
-                    print("💾 自動恢復失敗，正在保存已獲取的內容...")
+                    self.log("💾 自動恢復失敗，正在保存已獲取的內容...")
                     break
                 elif next_url_result == "completed":
                     # 正常完成，沒有下一章
-                    print("📄 沒有找到下一章連結，爬取完成")
+                    self.log("📄 沒有找到下一章連結，爬取完成")
+                    self._record_link(current_url, None)
+                    current_url = None
                     break
                 else:
-                    # 成功找到下一章
+                    # 成功找到下一章（重複章節未保存，不計入章節數）
+                    self._record_link(current_url, next_url_result)
                     current_url = next_url_result
-                    chapter_count += 1
-                    print(f"🔗 找到下一章：{next_url_result}")
-                    time.sleep(self.delay)
+                    if success != "duplicate":
+                        chapter_count += 1
+                    self.log(f"🔗 找到下一章：{next_url_result}")
+            elif next_url:
+                # 頁面不是網頁或過大：只跳過這一章，從連結索引或URL編號推算的下一章繼續
+                current_url = next_url
             else:
                 # 章節爬取失敗，但先保存已獲取的內容
-                print("💾 爬取中斷，正在保存已獲取的內容...")
+                self.log("💾 爬取中斷，正在保存已獲取的內容...")
                 break
-        
-        # 完成統計
-        self.stats['end_time'] = time.time()
-        self.stats['total_chapters'] = len(chapters)
-        
-        # 顯示爬取總結
-        self.print_scraping_summary(chapters)
-        
-        if self.continue_mode:
-            print(f"🎉 續傳完成！總共 {len(chapters)} 章（新增 {len(chapters) - len(self.existing_chapters)} 章）")
-        else:
-            print(f"🎉 爬取完成！共爬取 {len(chapters)} 章")
-        
-        # 如果爬取到內容，嘗試提取書名和作者
-        if chapters:
-            if self.continue_mode and self.existing_book_data:
-                # 續傳模式：更新現有書籍數據
-                book_title = self.existing_book_data['title']
-                author = self.existing_book_data['author']
-            else:
-                # 新書模式：提取書名和作者
-                book_title, author = self.extract_book_info(start_url, chapters[0])
-            
-            ebook_data = self.convert_to_ebook(book_title, author, chapters)
-            self.stats['total_pages'] = len(ebook_data['pages'])
+
+        return current_url, chapter_count
+
+    def _scrape_pipelined(self, current_url, chapter_count, chapters, visited_urls, max_chapters):
+        """管線模式：生產者沿下一章連結前進，工作執行緒並行提取章節內容
+        每頁只下載一次；章節按發現順序寫入 chapters，不依賴完成順序
+        """
+        pending = deque()  # (章節號, URL, Future)，按章節順序排列
+        max_pending = max(1, self.pipeline_workers * 2)
+        stop_producing = False
+        duplicates = 0  # 已取出的重複章節數；chapter_count 按發現的頁面計數，返回前扣除
+
+        def drain_one():
+            """按順序取出最早的章節結果；失敗時返回該章的 (章節號, URL)"""
+            nonlocal duplicates
+            chapter_num, url, future = pending.popleft()
+            try:
+                chapter = future.result()
+            except Exception as e:
+                self.log(f"❌ 第 {chapter_num} 章提取出錯：{e}")
+                chapter = None
             
-            # 自動保存（續傳模式下會覆蓋原文件）
-            is_complete = (chapter_count >= max_chapters or current_url is None)
-            self.auto_save_book(ebook_data, is_complete, is_continue=self.continue_mode)
+            if chapter is None:
+                self.log(f"⚠️ 內容為空，跳過：{url}")
+                self._record_failure(url)
+                return chapter_num, url
             
-            return ebook_data
-        else:
-            print("❌ 沒有爬取到任何章節")
+            if not self._record_chapter(chapters, chapter):
+                duplicates += 1
             return None
 
-    def find_next_page_with_recovery(self, current_url):
-        """尋找下一章連結，支援自動恢復機制"""
+        with ThreadPoolExecutor(max_workers=self.pipeline_workers) as executor:
+            while current_url and chapter_count - duplicates < max_chapters and not stop_producing:
+                # 防止重複爬取
+                if current_url in visited_urls:
+                    self.log(f"⚠️ 檢測到重複URL，停止爬取：{current_url}")
+                    break
+                
+                visited_urls.add(current_url)
+                self.stats['visited_count'] += 1
+                
+                chapter_num = chapter_count + 1
+                page_url = current_url
+                
+                def submit_extraction(soup, subpages=(), chapter_num=chapter_num, page_url=page_url):
+                    future = executor.submit(self._extract_chapter_record, soup, chapter_num, page_url, subpages)
+                    pending.append((chapter_num, page_url, future))
+                
+                self.log(f"📖 正在爬取第 {chapter_num} 章：{page_url}")
+                next_url_result = self.find_next_page_with_recovery(page_url, on_page=submit_extraction)
+                skipped = not (pending and pending[-1][1] == page_url)  # 頁面不可用，沒有提交提取
+                
+                # 控制在途章節數量，同時按順序收集結果
+                while len(pending) >= max_pending or (pending and pending[0][2].done()):
+                    failed = drain_one()
+                    if failed:
+                        stop_producing = True
+                        break
+                
+                if stop_producing:
+                    # 下次續傳從失敗的章節重新開始
+                    chapter_count, current_url = failed[0] - 1, failed[1]
+                    self.log("💾 爬取中斷，正在保存已獲取的內容...")
+                    break
+                
+                if next_url_result is None:
+                    self.log("💾 自動恢復失敗，正在保存已獲取的內容...")
+                    break
+                elif next_url_result == "completed":
+                    self.log("📄 沒有找到下一章連結，爬取完成")
+                    self._record_link(page_url, None)
+                    chapter_count = chapter_num
+                    current_url = None
+                    break
+                elif skipped:
+                    # 跳過的頁面不佔章節號，也不記錄推算出的連結
+                    current_url = next_url_result
+                else:
+                    self.recovery_count = 0
+                    self._record_link(page_url, next_url_result)
+                    current_url = next_url_result
+                    chapter_count = chapter_num
+                    self.log(f"🔗 找到下一章：{next_url_result}")
+            
+            # 收集剩餘結果；某章失敗後丟棄其後的章節，保證續傳時章節連續
+            while pending:
+                if stop_producing:
+                    pending.popleft()[2].cancel()
+                    continue
+                failed = drain_one()
+                if failed:
+                    stop_producing = True
+                    chapter_count, current_url = failed[0] - 1, failed[1]
+
+        return current_url, chapter_count - duplicates
+
+    def find_next_page_with_recovery(self, current_url, on_page=None):
+        """尋找下一章連結，支援自動恢復機制（同一章的分頁會被跳過）
+        on_page: 可選回調，頁面解析並找完連結後以 (soup, 其餘分頁) 調用（管線模式用來提交內容提取）
+        """
         for attempt in range(self.max_retries + 1):
             try:
-                print(f"🔍 正在查找下一章連結：{current_url}")
+                self.log(f"🔍 正在查找下一章連結：{current_url}")
                 if attempt > 0:
-                    print(f"   🔄 查找重試第 {attempt} 次...")
+                    self.log(f"   🔄 查找重試第 {attempt} 次...")
                 
-                response = self.session.get(current_url, timeout=10)
-                response.encoding = response.apparent_encoding or 'utf-8'
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = self._take_probed_page(current_url) or self.make_soup(self.fetch_page(current_url, timeout=10).text)
                 next_url = self.find_next_page_url(soup, current_url)
+                pages, next_url = self._collect_subpages(current_url, soup, next_url)
+                if on_page:
+                    on_page(soup, pages[1:])
                 
                 if next_url:
                     return next_url
                 else:
                     return "completed"  # 正常完成，沒有下一章
+            
+            except UnwantedResponseError as e:
+                self.log(f"❌ {e}，跳過此章節")
+                self._record_failure(current_url)
+                return self.url_after_unwanted(current_url) or None
                     
             except (requests.exceptions.ConnectionError, 
                     RemoteDisconnected,  # 修正：移除 requests.exceptions.
                     ConnectionError) as e:
-                print(f"❌ 連接錯誤 (查找下一章 {attempt + 1}/{self.max_retries + 1}): {e}")
+                self.log(f"❌ 連接錯誤 (查找下一章 {attempt + 1}/{self.max_retries + 1}): {e}")
                 
                 if attempt < self.max_retries:
-                    print(f"⏱️  等待 {self.retry_delay} 秒後重試...")
-                    time.sleep(self.retry_delay)
+                    self._backoff_before_retry(current_url)
                 else:
                     # 達到重試上限，啟動自動恢復
                     if self.auto_recovery and self.recovery_count < self.max_recoveries:
-                        return self.trigger_auto_recovery(current_url, "find_next_page")
+                        return self.trigger_auto_recovery(current_url, "find_next_page", on_page)
                     else:
-                        print("❌ 達到最大重試次數和恢復次數，停止爬取")
+                        self.log("❌ 達到最大重試次數和恢復次數，停止爬取")
                         return None
                         
             except requests.exceptions.Timeout as e:
-                print(f"❌ 請求超時 (查找下一章 {attempt + 1}/{self.max_retries + 1}): {e}")
+                self.log(f"❌ 請求超時 (查找下一章 {attempt + 1}/{self.max_retries + 1}): {e}")
                 
                 if attempt < self.max_retries:
-                    print(f"⏱️  等待 {self.retry_delay} 秒後重試...")
-                    time.sleep(self.retry_delay)
+                    self._backoff_before_retry(current_url)
                 else:
                     if self.auto_recovery and self.recovery_count < self.max_recoveries:
-                        return self.trigger_auto_recovery(current_url, "find_next_page")
+                        return self.trigger_auto_recovery(current_url, "find_next_page", on_page)
                     else:
-                        print("❌ 達到最大重試次數和恢復次數，停止爬取")
+                        self.log("❌ 達到最大重試次數和恢復次數，停止爬取")
                         return None
                         
             except Exception as e:
-                print(f"❌ 其他錯誤 (查找下一章 {attempt + 1}/{self.max_retries + 1}): {e}")
+                self.log(f"❌ 其他錯誤 (查找下一章 {attempt + 1}/{self.max_retries + 1}): {e}")
                 
                 if attempt < self.max_retries:
-                    print(f"⏱️  等待 {self.retry_delay} 秒後重試...")
-                    time.sleep(self.retry_delay)
+                    self._backoff_before_retry(current_url)
                 else:
                     if self.auto_recovery and self.recovery_count < self.max_recoveries:
-                        return self.trigger_auto_recovery(current_url, "find_next_page")
+                        return self.trigger_auto_recovery(current_url, "find_next_page", on_page)
                     else:
-                        print("❌ 達到最大重試次數和恢復次數，停止爬取")
+                        self.log("❌ 達到最大重試次數和恢復次數，停止爬取")
                         return None
         
         return None
 
-    def trigger_auto_recovery(self, failed_url, operation_type):
+    # 章節URL末尾的編號：123.html、chapter_0123、/read/45/
+    CHAPTER_NUMBER_URL = re.compile(r'^(?P<head>.*?)(?P<number>\d+)(?P<tail>(?:\.[A-Za-z]+)?/?)$')
+
+    def url_after_unwanted(self, url):
+        """頁面不是網頁或過大、讀不到下一章連結時的續傳URL：
+        優先用連結索引中上次記錄的下一章，否則把URL末尾的章節編號加一（需確認該頁存在）；都沒有時返回 None
+        """
+        entry = self.link_index.entries.get(url) if self.link_index else None
+        if entry and entry.get('next_url'):
+            self.log(f"⚡ 連結索引：跳過後從 {entry['next_url']} 繼續")
+            return entry['next_url']
+        
+        parts = urlsplit(url)
+        match = self.CHAPTER_NUMBER_URL.match(parts.path)
+        if parts.query or not match:
+            self.log("❌ 無法推算下一章URL，停止爬取")
+            return None
+        number = str(int(match.group('number')) + 1).zfill(len(match.group('number')))
+        next_url = urlunsplit(parts._replace(path=match.group('head') + number + match.group('tail'), fragment=''))
+        try:
+            response = self.fetch_page(next_url, timeout=15)
+        except requests.exceptions.RequestException as e:
+            self.log(f"❌ 推算的下一章無法讀取，停止爬取：{e}")
+            return None
+        if response.status_code != 200:
+            self.log(f"❌ 推算的下一章不存在（HTTP {response.status_code}），停止爬取：{next_url}")
+            return None
+        
+        self.log(f"🔗 按URL編號推算下一章：{next_url}")
+        self._probed_page = (next_url, self.make_soup(response.text))  # 爬取該章時直接使用
+        return next_url
+
+    def trigger_auto_recovery(self, failed_url, operation_type, on_page=None):
         """觸發自動恢復機制"""
         self.recovery_count += 1
         
-        print(f"\n🚨 === 自動恢復機制啟動 (第 {self.recovery_count} 次) ===")
-        print(f"❌ 操作失敗：{operation_type}")
-        print(f"🔗 失敗URL：{failed_url}")
-        print(f"⏰ 等待時間：{self.recovery_delay} 秒")
-        print(f"📊 剩餘恢復次數：{self.max_recoveries - self.recovery_count}")
-        print("=" * 60)
+        self.log(f"\n🚨 === 自動恢復機制啟動 (第 {self.recovery_count} 次) ===")
+        self.log(f"❌ 操作失敗：{operation_type}")
+        self.log(f"🔗 失敗URL：{failed_url}")
+        self.log(f"⏰ 等待時間：{self.recovery_delay} 秒")
+        self.log(f"📊 剩餘恢復次數：{self.max_recoveries - self.recovery_count}")
+        self.log("=" * 60)
         
         # 顯示倒數計時
-        for remaining in range(self.recovery_delay, 0, -1):
-            if remaining % 10 == 0 or remaining <= 10:
-                print(f"⏳ 自動恢復倒數：{remaining} 秒...")
-            time.sleep(1)
+        with self.metrics.timer('sleep'):
+            for remaining in range(self.recovery_delay, 0, -1):
+                if remaining % 10 == 0 or remaining <= 10:
+                    self.log(f"⏳ 自動恢復倒數：{remaining} 秒...")
+                time.sleep(1)
         
-        print("🔄 自動恢復開始，重新嘗試操作...")
+        self.log("🔄 自動恢復開始，重新嘗試操作...")
         
         # 重新建立連接
-        self.reset_session()
+        self.reset_session(failed_url)
         
         # 根據操作類型重新嘗試
         if operation_type == "find_next_page":
-            return self.retry_find_next_page(failed_url)
+            return self.retry_find_next_page(failed_url, on_page)
         elif operation_type == "scrape_chapter":
             return self.retry_scrape_chapter(failed_url)
         
         return None
 
-    def reset_session(self):
-        """重新建立會話連接"""
-        print("🔄 重新建立網絡連接...")
+    def reset_session(self, url=None):
+        """重新建立會話連接；使用異步引擎時只回收出錯主機的連接池"""
+        self.log("🔄 重新建立網絡連接...")
+        
+        if self.fetch_engine and url:
+            self.fetch_engine.reconnect(url)
+            self.log("✅ 網絡連接重新建立")
+            return
         
         # 關閉舊的會話
         self.session.close()
@@ -263,181 +1794,556 @@ class UniversalBookScraper:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.session.mount('http://', TimedHTTPAdapter())
+        self.session.mount('https://', TimedHTTPAdapter())
         
-        print("✅ 網絡連接重新建立")
+        self.log("✅ 網絡連接重新建立")
 
-    def retry_find_next_page(self, url):
+    def retry_find_next_page(self, url, on_page=None):
         """恢復後重新嘗試查找下一章"""
         try:
-            print(f"🔍 恢復：重新查找下一章連結：{url}")
+            self.log(f"🔍 恢復：重新查找下一章連結：{url}")
             
-            response = self.session.get(url, timeout=15)
-            response.encoding = response.apparent_encoding or 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
+            response = self.fetch_page(url, timeout=15)
+            soup = self.make_soup(response.text)
             next_url = self.find_next_page_url(soup, url)
+            pages, next_url = self._collect_subpages(url, soup, next_url)
+            if on_page:
+                on_page(soup, pages[1:])
             
             if next_url:
-                print(f"✅ 恢復成功：找到下一章：{next_url}")
+                self.log(f"✅ 恢復成功：找到下一章：{next_url}")
                 return next_url
             else:
-                print("✅ 恢復成功：確認沒有更多章節")
+                self.log("✅ 恢復成功：確認沒有更多章節")
                 return "completed"
                 
         except Exception as e:
-            print(f"❌ 恢復失敗：{e}")
+            self.log(f"❌ 恢復失敗：{e}")
             
             # 如果還有恢復機會，再次嘗試
             if self.recovery_count < self.max_recoveries:
-                print("🔄 將再次嘗試自動恢復...")
-                return self.trigger_auto_recovery(url, "find_next_page")
+                self.log("🔄 將再次嘗試自動恢復...")
+                return self.trigger_auto_recovery(url, "find_next_page", on_page)
             else:
-                print("❌ 已達到最大恢復次數，放棄恢復")
+                self.log("❌ 已達到最大恢復次數，放棄恢復")
                 return None
 
     def retry_scrape_chapter(self, url):
         """恢復後重新嘗試爬取章節"""
         try:
-            print(f"📖 恢復：重新爬取章節：{url}")
+            self.log(f"📖 恢復：重新爬取章節：{url}")
             
-            response = self.session.get(url, timeout=15)
-            response.encoding = response.apparent_encoding or 'utf-8'
-            soup = BeautifulSoup(response.text, 'html.parser')
+            response = self.fetch_page(url, timeout=15)
+            soup = self.make_soup(response.text)
             
             # 這裡可以重新爬取章節，但由於函數結構限制，
             # 我們返回 True 表示可以繼續，讓主循環重新處理
-            print("✅ 恢復成功：重新建立連接，可以繼續爬取")
+            self.log("✅ 恢復成功：重新建立連接，可以繼續爬取")
             return True
             
         except Exception as e:
-            print(f"❌ 章節恢復失敗：{e}")
+            self.log(f"❌ 章節恢復失敗：{e}")
             return False
 
-    def scrape_chapter_with_retry(self, url, chapter_num, chapters):
-        """使用重試機制爬取單個章節（加強錯誤處理）"""
+    def scrape_chapter_with_retry(self, url, chapter_num, chapters, visited_urls=None, prefetch_next=False):
+        """使用重試機制爬取單個章節（加強錯誤處理）
+        prefetch_next: 找到下一章URL後立即在背景下載，與本章的提取、清理和保存同時進行
+        返回 (結果, 下一章URL)：結果 True 表示已保存，"duplicate" 表示內容與已保存的章節重複（未保存，不計入章節數），
+        False 表示失敗；下一章URL 是解析本章時找到的連結，沒有找到或失敗時為 None
+        """
+        self._chapter_tail_url = None
         for attempt in range(self.max_retries + 1):
             try:
-                print(f"📖 正在爬取第 {chapter_num} 章：{url}")
+                self.log(f"📖 正在爬取第 {chapter_num} 章：{url}")
                 if attempt > 0:
-                    print(f"   🔄 重試第 {attempt} 次...")
+                    self.log(f"   🔄 重試第 {attempt} 次...")
+                
+                # 獲取頁面（判斷分頁時已解析過，或上一章已開始預取時直接取結果）
+                soup = self._take_probed_page(url)
+                if soup is None:
+                    response = self._take_speculative(url) or self.fetch_page(url, timeout=15)
+                    soup = self.make_soup(response.text)
+                
+                # 同一章分成多頁時，收集其餘分頁一併提取
+                pages, next_url = self._collect_subpages(url, soup, self.find_next_page_url(soup, url))
+                self._chapter_tail_url = pages[-1][0]
                 
-                # 獲取頁面
-                response = self.session.get(url, timeout=15)
-                response.encoding = response.apparent_encoding or 'utf-8'
-                soup = BeautifulSoup(response.text, 'html.parser')
+                # 鏈未結束且不是重複URL時，預取下一章（判斷分頁時已下載的不再預取）
+                probed = self._probed_page and self._probed_page[0] == next_url
+                if prefetch_next and next_url and not probed and (visited_urls is None or next_url not in visited_urls):
+                    self._speculate(next_url)
                 
                 # 智能提取章節標題和內容
-                chapter_title, content = self.extract_chapter_content(soup, chapter_num)
+                chapter = self._extract_chapter_record(soup, chapter_num, url, pages[1:])
                 
-                if content.strip():
-                    chapters.append({
-                        'title': chapter_title,
-                        'content': content,
-                        'url': url,
-                        'word_count': len(content.split()),
-                        'char_count': len(content)
-                    })
-                    
-                    # 更新統計
-                    self.stats['successful_urls'].append(url)
-                    self.stats['total_characters'] += len(content)
-                    self.stats['total_words'] += len(content.split())
-                    
-                    print(f"✅ 成功爬取：{chapter_title}")
-                    print(f"   📊 字符數：{len(content):,} | 詞數：{len(content.split()):,}")
-                    
-                    return True
+                if chapter:
+                    return (True if self._record_chapter(chapters, chapter) else "duplicate"), next_url
                 else:
-                    print(f"⚠️ 內容為空，跳過：{url}")
-                    self.stats['failed_urls'].append(url)
-                    self.stats['failed_chapters'] += 1
-                    return False
+                    self.log(f"⚠️ 內容為空，跳過：{url}")
+                    self._record_failure(url)
+                    return False, None
+            
+            except UnwantedResponseError as e:
+                self.log(f"❌ {e}，跳過此章節")
+                self._record_failure(url)
+                return False, self.url_after_unwanted(url)
                     
             except (requests.exceptions.ConnectionError, 
                     RemoteDisconnected,  # 修正：移除 requests.exceptions.
                     ConnectionError) as e:
-                print(f"❌ 連接錯誤 (爬取章節 {attempt + 1}/{self.max_retries + 1}): {e}")
+                self.log(f"❌ 連接錯誤 (爬取章節 {attempt + 1}/{self.max_retries + 1}): {e}")
                 
                 if attempt < self.max_retries:
-                    print(f"⏱️  等待 {self.retry_delay} 秒後重試...")
-                    time.sleep(self.retry_delay)
+                    self._backoff_before_retry(url)
                 else:
                     # 啟動自動恢復
                     if self.auto_recovery and self.recovery_count < self.max_recoveries:
                         recovery_result = self.trigger_auto_recovery(url, "scrape_chapter")
                         if recovery_result:
-                            return recovery_result
+                            return recovery_result, None
                     
-                    print("❌ 達到最大重試次數，跳過此章節")
-                    self.stats['failed_urls'].append(url)
-                    self.stats['failed_chapters'] += 1
-                    return False
+                    self.log("❌ 達到最大重試次數，跳過此章節")
+                    self._record_failure(url)
+                    return False, None
                     
             except requests.exceptions.Timeout as e:
-                print(f"❌ 請求超時 (爬取章節 {attempt + 1}/{self.max_retries + 1}): {e}")
+                self.log(f"❌ 請求超時 (爬取章節 {attempt + 1}/{self.max_retries + 1}): {e}")
                 if attempt < self.max_retries:
-                    print(f"⏱️  等待 {self.retry_delay} 秒後重試...")
-                    time.sleep(self.retry_delay)
+                    self._backoff_before_retry(url)
                 else:
                     if self.auto_recovery and self.recovery_count < self.max_recoveries:
                         recovery_result = self.trigger_auto_recovery(url, "scrape_chapter")
                         if recovery_result:
-                            return recovery_result
+                            return recovery_result, None
                     
-                    print("❌ 達到最大重試次數，跳過此章節")
-                    self.stats['failed_urls'].append(url)
-                    self.stats['failed_chapters'] += 1
-                    return False
+                    self.log("❌ 達到最大重試次數，跳過此章節")
+                    self._record_failure(url)
+                    return False, None
                     
             except Exception as e:
-                print(f"❌ 其他錯誤 (爬取章節 {attempt + 1}/{self.max_retries + 1}): {e}")
+                self.log(f"❌ 其他錯誤 (爬取章節 {attempt + 1}/{self.max_retries + 1}): {e}")
                 if attempt < self.max_retries:
-                    print(f"⏱️  等待 {self.retry_delay} 秒後重試...")
-                    time.sleep(self.retry_delay)
+                    self._backoff_before_retry(url)
                 else:
                     if self.auto_recovery and self.recovery_count < self.max_recoveries:
                         recovery_result = self.trigger_auto_recovery(url, "scrape_chapter")
                         if recovery_result:
-                            return recovery_result
+                            return recovery_result, None
                     
-                    print("❌ 達到最大重試次數，跳過此章節")
-                    self.stats['failed_urls'].append(url)
-                    self.stats['failed_chapters'] += 1
-                    return False
+                    self.log("❌ 達到最大重試次數，跳過此章節")
+                    self._record_failure(url)
+                    return False, None
         
-        return False
+        return False, None
 
-    def check_existing_book_file(self, start_url):
-        """檢查是否有現有的書籍文件"""
+    def fetch_page(self, url, timeout=15, revalidate=True, paced=True):
+        """統一的頁面請求入口（受每主機並發上限和自適應限速約束）
+        revalidate: False 時只要有快取就直接使用（已爬過、不會再變的章節）
+        paced: False 時不等待限速間隔（同一章的分頁預取），仍受每主機並發上限約束
+        遇到 429/503 時拋出 HTTPError，由調用方的重試機制處理
+        """
+        cache = self.response_cache
+        entry = cache.lookup(url) if cache else None
+        if entry and (not revalidate or cache.is_fresh(entry, self.cache_max_age)):
+            response = cache.build_response(url, entry)
+            if response is not None:
+                with self.metrics.timer('charset'):
+                    response.encoding = self.charset_detector.encoding_for(url, response)
+                return response
+            entry = None  # 正文剛被淘汰，當作未命中
+        
+        headers = cache.conditional_headers(entry) if entry else None
+        with self.host_limiter.slot(url):
+            if paced:
+                with self.metrics.timer('sleep'):
+                    self.rate_limiter.acquire(url, self.delay)
+            TimedHTTPAdapter.take_timings()  # 清掉同一執行緒上次留下的連接耗時
+            started = time.monotonic()
+            try:
+                if self.fetch_engine:
+                    response = self.fetch_engine.fetch(url, timeout=timeout, headers=headers,
+                                                       max_bytes=self.max_page_bytes,
+                                                       max_seconds=self.max_download_seconds)
+                else:
+                    response = self._read_body(url, self.session.get(url, timeout=timeout, headers=headers, stream=True))
+            except UnwantedResponseError:
+                raise  # 不是伺服器出錯，不調整限速
+            except requests.exceptions.RequestException:
+                self.rate_limiter.on_error(url)
+                raise
+            elapsed = time.monotonic() - started
+        self._observe_network(response, elapsed)
+        
+        retry_after = AdaptiveRateLimiter.parse_retry_after(response.headers.get('Retry-After'))
+        self.rate_limiter.on_response(url, response.status_code, elapsed, retry_after)
+        if response.status_code in AdaptiveRateLimiter.THROTTLE_STATUS:
+            response.raise_for_status()
+        
+        if cache:
+            if response.status_code == 304 and entry:
+                cache.revalidated(url, response)
+                response = cache.build_response(url, entry)
+                if response is None:
+                    # 正文在重新驗證期間被淘汰，記錄已移除，重新完整下載
+                    return self.fetch_page(url, timeout, revalidate, paced)
+            elif response.status_code == 200:
+                cache.store(url, response)
+        
+        with self.metrics.timer('charset'):
+            response.encoding = self.charset_detector.encoding_for(url, response)
+        return response
+
+    STREAM_CHUNK_BYTES = 64 * 1024
+
+    def _read_body(self, url, response):
+        """分塊讀取正文，返回 StreamedResponse；累計超過 max_page_bytes 或 max_download_seconds 時中止並斷開連接
+        讀到前 1KB 後如果已能確定編碼（標頭、<meta> 或該主機之前的檢測結果），之後每塊下載後立即解碼
+        """
+        deadline = time.monotonic() + self.max_download_seconds if self.max_download_seconds else None
         try:
-            # 根據URL生成可能的文件名模式
-            parsed_url = urlparse(start_url)
-            url_identifier = parsed_url.netloc.replace('.', '_')
-            
-            # 搜索當前目錄中的JSON文件
-            import glob
-            json_files = glob.glob("*.json")
-            
-            for file_path in json_files:
+            check_page_headers(url, response.status_code, response.headers, self.max_page_bytes)
+            chunks, size = [], 0
+            decoder, text_parts, encoding = None, [], None
+            for chunk in response.iter_content(self.STREAM_CHUNK_BYTES):
+                size += len(chunk)
+                if self.max_page_bytes and size > self.max_page_bytes:
+                    raise UnwantedResponseError(f"頁面超過 {self.max_page_bytes // 1024} KB 上限，已中止下載：{url}")
+                if deadline and time.monotonic() > deadline:
+                    raise requests.exceptions.ReadTimeout(f"下載超過 {self.max_download_seconds} 秒，已中止：{url}")
+                chunks.append(chunk)
+                
+                if decoder is not None:
+                    text_parts.append(decoder.decode(chunk))
+                elif encoding is None and size >= CharsetDetector.META_SCAN_BYTES:
+                    prefix = b''.join(chunks)[:CharsetDetector.META_SCAN_BYTES]
+                    encoding = self.charset_detector.early_encoding(url, response.headers, prefix) or False
+                    if encoding:
+                        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                        text_parts = [decoder.decode(part) for part in chunks]
+        except BaseException:
+            response.close()
+            raise
+        
+        streamed = StreamedResponse()
+        for field in ('status_code', 'reason', 'url', 'headers', 'elapsed', 'history', 'cookies', 'request', 'encoding'):
+            setattr(streamed, field, getattr(response, field))
+        streamed._content = b''.join(chunks)
+        response.close()  # 正文已讀完，連接交還連接池
+        if decoder is not None:
+            text_parts.append(decoder.decode(b'', final=True))
+            streamed.decoded_text = ''.join(text_parts)
+            streamed.decoded_encoding = encoding
+        return streamed
+
+    def _observe_network(self, response, elapsed):
+        """記錄一次請求的網絡階段耗時
+        requests：dns/connect 來自 TimedHTTPAdapter（只在新建連接時有），response.elapsed 是收到標頭的時間，
+        其餘為下載正文；異步引擎直接提供 httpcore 的分階段耗時
+        """
+        if self.fetch_engine:
+            timings = getattr(response, 'stage_timings', None) or {}
+        else:
+            timings = TimedHTTPAdapter.take_timings()
+            headers_received = response.elapsed.total_seconds()
+            timings['ttfb'] = max(0.0, headers_received - sum(timings.values()))
+            timings['download'] = max(0.0, elapsed - headers_received)
+        for stage, seconds in timings.items():
+            self.metrics.observe(stage, seconds)
+
+    def use_async_engine(self, engine=None, http2=False):
+        """改用異步抓取引擎；不傳 engine 時按每主機並發上限建立連接池"""
+        self.fetch_engine = engine or AsyncFetchEngine(
+            pool_size_per_host=self.max_concurrent_per_host,
+            http2=http2,
+            headers=self.session.headers
+        )
+        return self.fetch_engine
+
+    def make_soup(self, html):
+        """按配置的解析器建立 BeautifulSoup；快速解析器失敗時退回 html.parser"""
+        parser = self.html_parser
+        if parser == 'auto':
+            parser = available_html_parsers()[0]
+        
+        with self.metrics.timer('parse'):
+            if parser != 'html.parser':
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        
-                    if isinstance(data, list) and len(data) > 0:
-                        book_data = data[0]
-                        
-                        # 檢查是否是同一本書（通過URL域名判斷）
-                        if ('instruction' in book_data and 
-                            url_identifier in file_path.lower()):
-                            return file_path
-                            
+                    return BeautifulSoup(html, parser)
                 except Exception as e:
-                    continue
-                    
+                    self.log(f"⚠️ {parser} 解析失敗，改用 html.parser：{e}")
+            return BeautifulSoup(html, 'html.parser')
+
+    def _backoff_before_retry(self, url):
+        """重試前讓該主機至少暫停 retry_delay 秒；實際等待在下一次 fetch_page 中進行"""
+        wait = self.rate_limiter.pause(url, self.retry_delay)
+        self.log(f"⏱️  等待 {wait:.0f} 秒後重試...")
+
+    # 分頁章節的判斷：「本章未完」提示、xxx_2.html 形式的URL、標題中的 (1/3) 頁碼
+    SUBPAGE_MARKER = re.compile(r'本章未完|點擊下一頁繼續閱讀')
+    SUBPAGE_URL = re.compile(r'^(?P<stem>.+?)(?P<ext>\.[A-Za-z]+)?$')
+    TITLE_PAGE_MARKER = re.compile(r'\s*(?:[（(]\s*\d+\s*/\s*\d+\s*[)）]|第\s*\d+\s*頁)\s*$')
+
+    def _subpage_number(self, first_url, candidate_url):
+        """candidate_url 是章節第一頁 first_url 的第幾個分頁（123.html → 123_2.html 為 2）；不是分頁時返回 None
+        第一頁本身不帶分頁號，所以 chapter-1.html → chapter-2.html 這類相鄰章節不會被當成分頁
+        """
+        if '?' in first_url or '?' in candidate_url:
+            return None
+        match = self.SUBPAGE_URL.match(first_url.split('#')[0])
+        subpage = re.fullmatch(re.escape(match.group('stem')) + r'_(\d{1,2})' + re.escape(match.group('ext') or ''),
+                               candidate_url.split('#')[0])
+        if not subpage or int(subpage.group(1)) < 2:
+            return None
+        return int(subpage.group(1))
+
+    def _chapter_title_key(self, title):
+        """去掉標題末尾的分頁頁碼，用於判斷是否同一章"""
+        return self.TITLE_PAGE_MARKER.sub('', title or '').strip()
+
+    def _speculate(self, url):
+        """在背景下載下一章（仍經過限速器，所以不會比逐章爬取更快地請求同一主機）"""
+        if self._speculative and self._speculative[0] == url:
+            return
+        self._cancel_speculative()
+        self._speculative = (url, self._get_prefetch_executor().submit(self.fetch_page, url, 15))
+
+    def _take_speculative(self, url):
+        """取出預取的回應；沒有預取或URL不符時返回 None，預取出錯時拋出原異常交給重試邏輯"""
+        if not self._speculative or self._speculative[0] != url:
+            return None
+        _, future = self._speculative
+        self._speculative = None
+        return future.result()
+
+    def _take_probed_page(self, url):
+        """取出判斷分頁時已解析的頁面；URL 不符時返回 None"""
+        probed, self._probed_page = self._probed_page, None
+        if probed and probed[0] == url:
+            return probed[1]
+        return None
+
+    def _cancel_speculative(self):
+        """丟棄未使用的預取（已在進行中的請求會完成並寫入快取）"""
+        if self._speculative:
+            self._speculative[1].cancel()
+            self._speculative = None
+
+    def _get_prefetch_executor(self):
+        with self._prefetch_lock:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(
+                    max_workers=max(1, self.max_concurrent_per_host), thread_name_prefix='subpage-prefetch'
+                )
+            return self._prefetch_executor
+
+    def _prefetch_subpages(self, url, soup, title):
+        """第一頁看起來是分頁章節時，立即並行下載頁面上列出的其餘分頁；返回 {URL: Future}"""
+        if not (self.SUBPAGE_MARKER.search(soup.get_text()) or self.TITLE_PAGE_MARKER.search(title or '')):
+            return {}
+        
+        urls = set()
+        for link in soup.find_all('a', href=True):
+            candidate = urljoin(url, link['href']).split('#')[0]
+            if self._subpage_number(url, candidate):
+                urls.add(candidate)
+        
+        urls = sorted(urls, key=lambda candidate: self._subpage_number(url, candidate))[:self.max_prefetch_subpages]
+        if not urls:
+            return {}
+        executor = self._get_prefetch_executor()
+        self.log(f"⚡ 預取 {len(urls)} 個分頁")
+        return {candidate: executor.submit(self.fetch_page, candidate, 15, True, False) for candidate in urls}
+
+    def _collect_subpages(self, url, soup, next_url):
+        """沿下一頁連結收集同一章的其餘分頁，返回 ([(URL, soup), ...], 下一章URL)
+        同一章需同時滿足：去掉頁碼後標題相同，且URL為第一頁的分頁形式或上一頁有「本章未完」提示
+        （標題每頁都相同的網站，如 <h1> 是書名，只有帶提示的頁面會和下一頁合併）
+        """
+        pages = [(url, soup)]
+        if not self.stitch_subpages or not next_url:
+            return pages, next_url
+        
+        title = self._extract_title(soup, url)
+        title_key = self._chapter_title_key(title)
+        
+        prefetched = None
+        last_number = 1
+        try:
+            while next_url and title_key:
+                page_url, page_soup = pages[-1]
+                number = self._subpage_number(url, next_url)
+                if number is not None and number > last_number:
+                    last_number = number
+                elif number is not None or not self.SUBPAGE_MARKER.search(page_soup.get_text()):
+                    break
+                
+                if prefetched is None:
+                    prefetched = self._prefetch_subpages(url, soup, title)
+                
+                future = prefetched.pop(next_url, None)
+                try:
+                    response = future.result() if future else self.fetch_page(next_url, timeout=15)
+                except UnwantedResponseError:
+                    break  # 下一頁不是網頁或過大，肯定不是本章的分頁，留給下一章處理
+                next_soup = self.make_soup(response.text)
+                next_title = self._extract_title(next_soup, next_url)
+                if self._chapter_title_key(next_title) != title_key:
+                    self._probed_page = (next_url, next_soup)  # 已經是下一章，爬取下一章時直接使用，不再下載和解析
+                    break
+                pages.append((next_url, next_soup))
+                next_url = self.find_next_page_url(next_soup, next_url)
+        finally:
+            for future in (prefetched or {}).values():
+                future.cancel()
+        
+        if len(pages) > 1:
+            self.stats['visited_count'] += len(pages) - 1
+            self.log(f"📑 合併分頁：{len(pages)} 個頁面合為一章")
+        return pages, next_url
+
+    def _extract_chapter_record(self, soup, chapter_num, url, subpages=()):
+        """從已解析的頁面生成章節記錄；內容為空時返回 None（可在工作執行緒中調用）
+        subpages: 同一章其餘分頁的 [(URL, soup)]，內容按順序接在第一頁之後
+        """
+        chapter_title, content = self.extract_chapter_content(soup, chapter_num, url)
+        if subpages:
+            chapter_title = self._chapter_title_key(chapter_title)
+            parts = [content] + [self.extract_chapter_content(page_soup, chapter_num, page_url)[1]
+                                 for page_url, page_soup in subpages]
+            
+            # 「下一頁」指向同一頁的鏡像時內容會重複，只保留第一份（只去掉規範化後完全相同的分頁）
+            seen = set()
+            unique_parts = []
+            for part in parts:
+                digest = ChapterFingerprints.content_digest(part)
+                if part and digest not in seen:
+                    seen.add(digest)
+                    unique_parts.append(part)
+            content = '\n\n'.join(unique_parts)
+        
+        if not content.strip():
+            return None
+        
+        return {
+            'title': chapter_title,
+            'content': content,
+            'url': url,
+            'word_count': len(content.split()),
+            'char_count': len(content),
+            'fingerprint': f"{ChapterFingerprints.fingerprint(content):016x}"
+        }
+
+    def _chapter_fingerprint(self, chapter):
+        """章節記錄中的指紋；舊日誌或舊書籍文件沒有時即時計算"""
+        if chapter.get('fingerprint'):
+            return int(chapter['fingerprint'], 16)
+        return ChapterFingerprints.fingerprint(chapter['content'])
+
+    def _chapter_summary(self, chapter):
+        """章節摘要：正文以外的字段加上分頁後的頁數"""
+        return {
+            'title': chapter['title'],
+            'url': chapter['url'],
+            'char_count': chapter['char_count'],
+            'word_count': chapter['word_count'],
+            'page_count': len(self.paginate_chapter(chapter['title'], chapter['content']))
+        }
+
+    def _record_chapter(self, chapters, chapter):
+        """把章節正文寫入章節日誌，chapters 只記錄摘要並更新統計（只在主執行緒中調用）
+        內容確認與已保存的章節相同（鏡像、換了參數的URL）時不保存，返回 False；
+        只是指紋相近（短章、公告、大段相同模板）時照常保存，記為疑似重複
+        """
+        fingerprint = self._chapter_fingerprint(chapter)
+        identity = ChapterFingerprints.identity(chapter)
+        similar_to, confirmed = self.fingerprints.match(fingerprint, identity)
+        if confirmed:
+            self.stats['duplicate_chapters'] += 1
+            self.log(f"♻️ 內容與第 {similar_to} 章重複，不再保存：{chapter['url']}")
+            return False
+        if similar_to is not None:
+            self.stats['suspected_duplicates'] += 1
+            self.log(f"⚠️ 內容與第 {similar_to} 章相似但未確認重複，仍然保存：{chapter['url']}")
+        
+        chapter_num = len(chapters) + 1
+        self.fingerprints.add(fingerprint, chapter_num, identity)
+        with self.metrics.timer('save'):
+            if self.chapter_log:
+                self.chapter_log.append_chapter(chapter_num, chapter)
+            if self.link_index:
+                self.link_index.record_chapter(chapter_num, chapter['url'], chapter['title'], chapter['content'])
+        chapters.add(self._chapter_summary(chapter))
+        
+        # 更新統計
+        self.stats['successful_count'] += 1
+        self.stats['total_characters'] += chapter['char_count']
+        self.stats['total_words'] += chapter['word_count']
+        
+        self.log(f"✅ 成功爬取：{chapter['title']}")
+        self.log(f"   📊 字符數：{chapter['char_count']:,} | 詞數：{chapter['word_count']:,}")
+        return True
+
+    def _record_failure(self, url):
+        """記錄失敗章節：計數加一，URL 放入有上限的樣本"""
+        self.stats['failed_urls'].append(url)
+        self.stats['failed_chapters'] += 1
+
+    def _record_link(self, url, next_url):
+        """把章節間的連結寫入索引，供續傳時直接跳轉"""
+        if self.link_index:
+            self.link_index.record_link(url, next_url)
+
+    def check_existing_book_file(self, start_url):
+        """檢查是否有現有的書籍文件（通過書籍清單查找）"""
+        try:
+            return self.manifest.lookup(start_url)
         except Exception as e:
-            print(f"⚠️ 檢查現有文件時出錯：{e}")
+            self.log(f"⚠️ 檢查現有文件時出錯：{e}")
             
         return None
 
+    def load_chapters_from_log(self):
+        """從章節日誌逐條讀取已爬取的章節，只保留摘要（含真實URL）"""
+        chapters = ChapterTally()
+        if not self.chapter_log or not self.chapter_log.exists():
+            return chapters
+        
+        for chapter in self.chapter_log.iter_chapters():
+            chapters.add(self._chapter_summary(chapter), existing=True)
+            self.existing_urls.add(chapter['url'])
+            self.fingerprints.add(self._chapter_fingerprint(chapter), len(chapters), ChapterFingerprints.identity(chapter))
+        if not chapters:
+            return chapters
+        
+        self.log(f"📖 發現章節日誌：{self.chapter_log.path}")
+        book_info = self.chapter_log.book_info()
+        if book_info:
+            self.existing_book_data = {'title': book_info['title'], 'author': book_info['author']}
+        return chapters
+
+    def seed_chapter_log(self, chapters, start_url):
+        """把舊版書籍文件的章節一次性寫入章節日誌，之後只需追加新章節；返回章節摘要"""
+        tally = ChapterTally()
+        if not chapters or not self.chapter_log:
+            return tally
+        
+        for i, chapter in enumerate(chapters, 1):
+            # 舊文件只有模擬URL，寫入指紋後續傳時才能按內容識別重疊的章節
+            fingerprint = self._chapter_fingerprint(chapter)
+            chapter['fingerprint'] = f"{fingerprint:016x}"
+            self.fingerprints.add(fingerprint, i, ChapterFingerprints.identity(chapter))
+            self.chapter_log.append_chapter(i, chapter)
+            tally.add(self._chapter_summary(chapter), existing=True)
+        if self.existing_book_data:
+            self.chapter_log.set_book_info(self.existing_book_data['title'], self.existing_book_data['author'], start_url)
+        self.chapter_log.sync()
+        
+        # 舊文件的頁數以文件本身為準
+        if self.existing_book_data and self.existing_book_data.get('page_count') is not None:
+            tally.existing_page_total = self.existing_book_data['page_count']
+        return tally
+
     def load_existing_chapters(self, file_path):
         """載入現有書籍的章節信息"""
         try:
@@ -445,10 +2351,15 @@ class UniversalBookScraper:
                 data = json.load(f)
                 
             if isinstance(data, list) and len(data) > 0:
-                self.existing_book_data = data[0]
+                # 只保留書名、作者和頁數，頁面內容寫入章節日誌後即可釋放
+                pages = data[0].get('pages', [])
+                self.existing_book_data = {
+                    'title': data[0].get('title'),
+                    'author': data[0].get('author'),
+                    'page_count': len(pages)
+                }
                 
                 # 從頁面重建章節列表
-                pages = self.existing_book_data.get('pages', [])
                 chapters = []
                 
                 for i, page in enumerate(pages):
@@ -460,22 +2371,25 @@ class UniversalBookScraper:
                         title = f"第{i+1}章"
                         content = page
                     
+                    # 有連結索引時使用真實URL，否則用模擬URL
+                    entry = self.link_index.chapter_entry(i + 1) if self.link_index else None
+                    url = entry['url'] if entry else f"existing_chapter_{i+1}"
+                    
                     chapters.append({
                         'title': title,
                         'content': content,
-                        'url': f"existing_chapter_{i+1}",
+                        'url': url,
                         'word_count': len(content.split()),
                         'char_count': len(content)
                     })
                     
-                    # 記錄已存在的URL（模擬）
-                    self.existing_urls.add(f"existing_chapter_{i+1}")
+                    # 記錄已存在的URL
+                    self.existing_urls.add(url)
                 
-                self.existing_chapters = chapters.copy()
                 return chapters
                 
         except Exception as e:
-            print(f"❌ 載入現有文件失敗：{e}")
+            self.log(f"❌ 載入現有文件失敗：{e}")
             
         return []
 
@@ -484,40 +2398,73 @@ class UniversalBookScraper:
         if not existing_chapters:
             return start_url
             
-        print(f"🔍 尋找續傳URL，已有 {len(existing_chapters)} 章")
+        self.log(f"🔍 尋找續傳URL，已有 {len(existing_chapters)} 章")
+        
+        # 優先使用連結索引直接跳到續傳點
+        resume_url = self.find_continue_url_from_index(len(existing_chapters))
+        if resume_url is not False:
+            return resume_url
         
         # 從起始URL開始，跳過已存在的章節數
         current_url = start_url
         skip_count = len(existing_chapters)
         
-        print(f"📖 需要跳過 {skip_count} 章")
+        self.log(f"📖 需要跳過 {skip_count} 章")
         
         for i in range(skip_count):
             try:
-                response = self.session.get(current_url, timeout=10)
-                response.encoding = response.apparent_encoding or 'utf-8'
-                soup = BeautifulSoup(response.text, 'html.parser')
+                # 已爬過的章節直接用快取；最後一章需重新驗證，因為可能已有新的下一章連結
+                is_last = (i == skip_count - 1)
+                response = self.fetch_page(current_url, timeout=10, revalidate=is_last)
+                soup = self.make_soup(response.text)
                 
                 # 獲取當前章節標題進行驗證
-                chapter_title, _ = self.extract_chapter_content(soup, i + 1)
-                print(f"   跳過第 {i+1} 章：{chapter_title}")
+                chapter_title, _ = self.extract_chapter_content(soup, i + 1, current_url)
+                self.log(f"   跳過第 {i+1} 章：{chapter_title}")
                 
-                # 找到下一章
+                # 找到下一章（跳過同一章的分頁）
                 next_url = self.find_next_page_url(soup, current_url)
+                _, next_url = self._collect_subpages(current_url, soup, next_url)
                 if next_url:
                     current_url = next_url
-                    time.sleep(self.delay)  # 避免請求過快
                 else:
-                    print("📄 沒有找到更多章節，爬取已完成")
+                    self.log("📄 沒有找到更多章節，爬取已完成")
                     return None
                     
             except Exception as e:
-                print(f"❌ 跳過章節時出錯：{e}")
+                self.log(f"❌ 跳過章節時出錯：{e}")
                 return start_url
         
-        print(f"✅ 找到續傳起點：第 {skip_count + 1} 章")
+        self.log(f"✅ 找到續傳起點：第 {skip_count + 1} 章")
         return current_url
 
+    def find_continue_url_from_index(self, chapter_count):
+        """從連結索引找續傳URL；返回URL、None（已完成）或 False（索引不可用）"""
+        entry = self.link_index.chapter_entry(chapter_count) if self.link_index else None
+        if not entry:
+            return False
+        
+        if entry.get('next_url'):
+            self.log(f"⚡ 連結索引：第 {chapter_count} 章的下一章為 {entry['next_url']}")
+            return entry['next_url']
+        
+        # 上次爬取時最後一章沒有下一章連結，重新檢查是否有新章節
+        self.log(f"🔍 連結索引：重新檢查第 {chapter_count} 章是否有新的下一章")
+        try:
+            response = self.fetch_page(entry['url'], timeout=10)
+            soup = self.make_soup(response.text)
+            next_url = self.find_next_page_url(soup, entry['url'])
+        except Exception as e:
+            self.log(f"⚠️ 重新檢查失敗，改為逐章查找：{e}")
+            return False
+        
+        if not next_url:
+            self.log("📄 沒有找到更多章節，爬取已完成")
+            return None
+        
+        self._record_link(entry['url'], next_url)
+        return next_url
+
     def auto_save_book(self, ebook_data, is_complete=True, is_continue=False):
         """自動保存書籍（支援續傳模式）"""
         safe_title = re.sub(r'[^\w\s-]', '', ebook_data['title'])
@@ -528,60 +2475,155 @@ class UniversalBookScraper:
             # 續傳模式：更新原文件名，但加上新的時間戳
             status_suffix = "updated_complete" if is_complete else "updated_partial"
             filename = f"{safe_title}_{status_suffix}_{timestamp}.json"
-            print(f"🔄 續傳模式：更新書籍文件")
+            self.log(f"🔄 續傳模式：更新書籍文件")
         else:
             # 新書模式
             status_suffix = "complete" if is_complete else "partial"
             filename = f"{safe_title}_{status_suffix}_{timestamp}.json"
         
+        # 批量模式下同名書籍可能在同一秒保存，預留一個不衝突的文件名
+        filename = self._reserve_filename(filename)
+        saved = False
+        
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump([ebook_data], f, ensure_ascii=False, indent=2)
+            with self.metrics.timer('save'):
+                if 'pages' in ebook_data:
+                    temp_path = filename + '.tmp'
+                    with open(temp_path, 'w', encoding='utf-8') as f:
+                        json.dump([ebook_data], f, ensure_ascii=False, indent=2)
+                    os.replace(temp_path, filename)
+                else:
+                    # 正文只在章節日誌中，逐章導出
+                    self.chapter_log.sync()
+                    self.export_book(self.chapter_log, filename, ebook_data['title'], ebook_data['author'])
+            saved = True
             
             file_size = os.path.getsize(filename) / 1024
-            print(f"\n💾 書籍已保存到：{filename}")
-            print(f"📁 完整路徑：{os.path.abspath(filename)}")
-            print(f"📄 文件大小：{file_size:.1f} KB")
+            self.log(f"\n💾 書籍已保存到：{filename}")
+            self.log(f"📁 完整路徑：{os.path.abspath(filename)}")
+            self.log(f"📄 文件大小：{file_size:.1f} KB")
             
             if is_continue:
-                print(f"🔄 續傳完成：新增了 {len(ebook_data['pages']) - len(self.existing_book_data.get('pages', []))} 頁")
+                self.log(f"🔄 續傳完成：新增了 {ebook_data['totalPages'] - self.existing_page_count()} 頁")
             
             if not is_complete:
-                print("⚠️  注意：這是部分完成的書籍，可能還有更多章節")
-                print("💡 建議：稍後重新運行腳本進行續傳")
+                self.log("⚠️  注意：這是部分完成的書籍，可能還有更多章節")
+                self.log("💡 建議：稍後重新運行腳本進行續傳")
             
             return filename
         except Exception as e:
-            print(f"❌ 保存文件失敗：{e}")
+            self.log(f"❌ 保存文件失敗：{e}")
+            # 刪除預留的空佔位文件和寫到一半的臨時文件，避免之後被當成書籍文件載入
+            for path in ((filename + '.tmp',) if saved else (filename, filename + '.tmp')):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
             return None
 
-    def extract_chapter_content(self, soup, chapter_num):
-        """智能提取章節標題和內容"""
-        # 常見的標題選擇器
-        title_selectors = [
-            'h1', 'h2', 'h3',
-            '.title', '.chapter-title', '.readtitle h1',
-            '.j_chapterName', '.chapter_name',
-            '.bookname h1', '.book-title'
-        ]
-        
-        # 常見的內容選擇器
-        content_selectors = [
-            '.content', '#content', '.chapter-content',
-            '.novel-content', '.read-content', '#chapter_content',
-            '.text', '.txt', '.detail', '.main-text',
-            'div[id*="content"]', 'div[class*="content"]'
-        ]
+    _filename_lock = threading.Lock()
+
+    def _reserve_filename(self, filename):
+        """返回一個尚未存在的文件名（必要時加上序號），並立即建立空的佔位文件
+        正文先寫入 .tmp 再 os.replace 到這個文件名；導出失敗時 auto_save_book 會刪除佔位文件
+        """
+        base, ext = os.path.splitext(filename)
+        with self._filename_lock:
+            candidate, n = filename, 1
+            while os.path.exists(candidate):
+                n += 1
+                candidate = f"{base}_{n}{ext}"
+            open(candidate, 'w').close()
+        return candidate
+
+    def existing_page_count(self):
+        """續傳前已有的頁數"""
+        return self.existing_chapters.existing_page_total if self.existing_chapters else 0
+
+    def export_book(self, chapter_log, filename, title, author):
+        """從章節日誌導出 OursReader 書籍 JSON（逐章讀取、逐頁寫出）"""
+        # 第一遍只統計章節數和頁數，供 instruction 和 totalPages 使用
+        chapter_total = 0
+        page_total = 0
+        for chapter in chapter_log.iter_chapters():
+            chapter_total += 1
+            page_total += len(self.paginate_chapter(chapter['title'], chapter['content']))
+        
+        book = self.ebook_metadata(title, author, chapter_total, page_total)
+        temp_path = filename + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write('[\n  {\n')
+            for key in ('id', 'title', 'author', 'coverImage', 'instruction'):
+                f.write(f'    {json.dumps(key)}: {json.dumps(book[key], ensure_ascii=False)},\n')
+            
+            f.write('    "pages": [')
+            first = True
+            for chapter in chapter_log.iter_chapters():
+                for page in self.paginate_chapter(chapter['title'], chapter['content']):
+                    f.write('\n      ' if first else ',\n      ')
+                    f.write(json.dumps(page, ensure_ascii=False))
+                    first = False
+            f.write('\n    ],\n' if not first else '],\n')
+            
+            f.write(f'    "totalPages": {book["totalPages"]},\n')
+            f.write(f'    "currentPage": {book["currentPage"]},\n')
+            f.write('    "bookmarkedPages": []\n  }\n]')
+        os.replace(temp_path, filename)
+        return filename
+
+    # 常見的標題選擇器
+    TITLE_SELECTORS = [
+        'h1', 'h2', 'h3',
+        '.title', '.chapter-title', '.readtitle h1',
+        '.j_chapterName', '.chapter_name',
+        '.bookname h1', '.book-title'
+    ]
+    
+    # 常見的內容選擇器
+    CONTENT_SELECTORS = [
+        '.content', '#content', '.chapter-content',
+        '.novel-content', '.read-content', '#chapter_content',
+        '.text', '.txt', '.detail', '.main-text',
+        'div[id*="content"]', 'div[class*="content"]'
+    ]
+
+    @staticmethod
+    def _preferred_first(selectors, preferred):
+        """把站點配置中記錄的選擇器排到最前面"""
+        if preferred in selectors:
+            return [preferred] + [selector for selector in selectors if selector != preferred]
+        return selectors
+
+    def _extract_title(self, soup, page_url=None, title_selectors=None):
+        """按選擇器順序提取章節標題；找不到時返回 None"""
+        if title_selectors is None:
+            profile = self.site_profiles.get(page_url) if (self.site_profiles and page_url) else {}
+            title_selectors = self._preferred_first(self.TITLE_SELECTORS, profile.get('title_selector'))
         
-        # 提取標題
-        chapter_title = f"第{chapter_num}章"
         for selector in title_selectors:
             title_element = soup.select_one(selector)
             if title_element:
                 title_text = title_element.get_text().strip()
                 if title_text and len(title_text) < 200:  # 標題不應該太長
-                    chapter_title = title_text
-                    break
+                    if page_url and self.site_profiles:
+                        self.site_profiles.learn(page_url, 'title_selector', selector)
+                    return title_text
+        return None
+
+    def extract_chapter_content(self, soup, chapter_num, page_url=None):
+        """智能提取章節標題和內容
+        page_url: 提供時先試該站點上次成功的選擇器，並記錄本次成功的選擇器
+        """
+        with self.metrics.timer('extract'):
+            return self._extract_chapter_content(soup, chapter_num, page_url)
+
+    def _extract_chapter_content(self, soup, chapter_num, page_url=None):
+        profile = self.site_profiles.get(page_url) if (self.site_profiles and page_url) else {}
+        title_selectors = self._preferred_first(self.TITLE_SELECTORS, profile.get('title_selector'))
+        content_selectors = self._preferred_first(self.CONTENT_SELECTORS, profile.get('content_selector'))
+        
+        # 提取標題
+        chapter_title = self._extract_title(soup, page_url, title_selectors) or f"第{chapter_num}章"
         
         # 提取內容 - 修改這部分來正確處理 <p> 標籤
         content = ""
@@ -594,10 +2636,12 @@ class UniversalBookScraper:
                 
                 # 🔧 新增：專門處理 <p> 標籤以保留分行
                 content = self.extract_content_with_paragraphs(content_element)
-                content = self.clean_content(content)
+                content = self.clean_content(content, page_url)
                 
                 # 檢查內容長度，太短可能不是正文
                 if len(content) > 200:
+                    if page_url and self.site_profiles:
+                        self.site_profiles.learn(page_url, 'content_selector', selector)
                     break
         
         return chapter_title, content
@@ -621,205 +2665,243 @@ class UniversalBookScraper:
             # 如果沒有 <p> 標籤，使用原有邏輯
             return content_element.get_text()
 
-    def clean_content(self, text):
-        """清理文本內容（保留分行格式）"""
-        # 首先移除常見的廣告文字和無關內容
-        ad_patterns = [
-            r'.*?章節錯誤.*?',
-            r'.*?舉報.*?',
-            r'.*?收藏.*?',
-            r'.*?投票.*?',
-            r'.*?推薦.*?',
-            r'.*?廣告.*?',
-            r'.*?免費閱讀.*?',
-            r'.*?點擊進入.*?',
-            r'.*?更多精彩.*?',
-            r'本章未完.*?點擊下一頁繼續閱讀.*?',
-        ]
-        
-        for pattern in ad_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-        
-        # 🔧 修改：更好地處理段落間距
-        # 保留由 extract_content_with_paragraphs 產生的雙換行
-        # 但清理多餘的空白行（超過兩個換行的情況）
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        
-        # 清理每行開頭和結尾的空白，但保留換行
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            # 清理每行的首尾空白和多餘的空格
-            cleaned_line = re.sub(r'[ \t]+', ' ', line.strip())
-            cleaned_lines.append(cleaned_line)
-        
-        # 重新組合，保留分行
-        text = '\n'.join(cleaned_lines)
-        
-        # 移除開頭和結尾的空白行
-        text = text.strip()
-        
-        # 🔧 修改：確保段落之間保持雙換行
-        # 將單個換行後跟非空行的情況轉換為雙換行（如果不是已經是雙換行）
-        text = re.sub(r'(?<!\n)\n(?!\n)(?=\S)', '\n\n', text)
-        
-        # 最後清理：將多於兩個的連續換行縮減為兩個
-        text = re.sub(r'\n{3,}', '\n\n', text)
+    def clean_content(self, text, page_url=None):
+        """清理文本內容（保留分行格式）；page_url 提供時加上該站點的過濾規則"""
+        with self.metrics.timer('clean_content'):
+            return self.content_filter_for(page_url).clean(text)
+
+    def content_filter_for(self, page_url=None):
+        """返回站點的正文過濾器；站點規則從 content_filter_file 讀取：
+        {"www.example.com": {"cut_keywords": ["..."], "segment_patterns": ["..."]}}
+        """
+        if self._content_filters is None:
+            site_rules = {}
+            if self.content_filter_file and os.path.exists(self.content_filter_file):
+                try:
+                    with open(self.content_filter_file, 'r', encoding='utf-8') as f:
+                        site_rules = json.load(f)
+                except Exception as e:
+                    self.log(f"⚠️ 無法讀取正文過濾規則：{e}")
+            filters = {netloc: ContentFilter.with_site_rules(rules) for netloc, rules in site_rules.items()}
+            filters[None] = ContentFilter()
+            self._content_filters = filters
         
-        return text
+        netloc = urlparse(page_url).netloc if page_url else None
+        return self._content_filters.get(netloc) or self._content_filters[None]
 
-    def find_next_page_url(self, soup, current_url):
-        """智能尋找下一頁連結（增強版：支援"下一篇"和嵌套結構）"""
-        # 常見的下一頁選擇器和文字
-        next_selectors = [
-            # 原有選擇器
-            'a[title*="下一"]', 'a[title*="下一頁"]', 'a[title*="下一章"]',
-            'a:contains("下一")', 'a:contains("下一頁")', 'a:contains("下一章")',
-            '.next', 'a.next', '#next', 'a#next',
-            'a[id*="next"]', 'a[class*="next"]',
-            '.chapter-nav .next', '.page-nav .next',
-            'a#j_chapterNext', '.j_chapterNext',
+    # 下一章關鍵字（按優先順序），以及預先編譯的正則
+    NEXT_KEYWORDS = [
+        "下一頁", "下一章", "下頁", "下章",
+        "下一篇", "下篇",
+        "next", "Next", "NEXT"
+    ]
+    NEXT_KEYWORD_PATTERNS = [
+        (keyword, re.compile(f'^{re.escape(keyword)}$', re.I), re.compile(re.escape(keyword), re.I))
+        for keyword in NEXT_KEYWORDS
+    ]
+    NEXT_KEYWORD_ANY = re.compile('|'.join(re.escape(keyword) for keyword in NEXT_KEYWORDS), re.I)
+    PREV_PATTERN = re.compile(r'上一|prev|previous', re.I)
+    # 嵌套結構的容器選擇器（如 span.article-nav-next 內的 a 標籤）
+    NEXT_CONTAINERS = ['.article-nav-next', 'span.article-nav-next', '.next-article', '.nav-next', '.post-nav-next']
+    # 非 <a> 元素也可能匹配的 class / id（對應 .next、#next 等選擇器）
+    NEXT_ELEMENT_CLASSES = {'next', 'j_chapterNext', 'article-nav-next'}
+
+    @staticmethod
+    def _is_valid_href(href):
+        return bool(href) and href not in ('#', 'javascript:void(0)')
+
+    def _describe_element(self, node, is_anchor):
+        """提取判斷下一章所需的元素特徵（含祖先元素的 class）"""
+        ancestor_classes = set()
+        for parent in node.parents:
+            for cls in parent.get('class') or ():
+                ancestor_classes.add(cls)
+                ancestor_classes.add(f"{parent.name}.{cls}")
+        classes = node.get('class') or []
+        rel = node.get('rel') or []
+        return {
+            'tag': node,
+            'is_anchor': is_anchor,
+            'href': node.get('href'),
+            'text': node.get_text() if is_anchor else '',
+            'string': node.string if is_anchor else None,
+            'title': node.get('title') or '',
+            'rel': rel,
+            'rel_attr': ' '.join(rel) if isinstance(rel, list) else rel,
+            'classes': classes,
+            'class_attr': ' '.join(classes),
+            'id': node.get('id') or '',
+            'ancestor_classes': ancestor_classes
+        }
+
+    def _collect_link_candidates(self, soup):
+        """單次遍歷文檔，收集：
+        elements: 所有 <a> 及帶 next 相關 class/id 的元素（按文檔順序）
+        containers: 每種嵌套容器選擇器的第一個匹配元素
+        keyword_nodes: 含下一章關鍵字的文字節點
+        """
+        elements = []
+        containers = {}
+        keyword_nodes = []
+        
+        for node in soup.descendants:
+            if isinstance(node, NavigableString):
+                if self.NEXT_KEYWORD_ANY.search(node):
+                    keyword_nodes.append(node)
+                continue
             
-            # 🔧 新增：針對"下一篇"的選擇器
-            'a[title*="下一篇"]', 'a:contains("下一篇")',
-            '.article-nav-next', '.article-nav-next a',
-            'span.article-nav-next a', '.next-article a',
-            'a[rel="next"]', 'a[rel*="next"]'
-        ]
-        
-        # 🔧 擴展關鍵字：加入"下一篇"相關
-        next_keywords = [
-            "下一頁", "下一章", "下頁", "下章", 
-            "下一篇", "下篇",  # 新增
-            "next", "Next", "NEXT"
-        ]
-        
-        print(f"🔍 開始尋找下一頁連結...")
+            classes = node.get('class') or ()
+            for selector in self.NEXT_CONTAINERS:
+                tag_name, cls = selector.split('.')
+                if cls in classes and (not tag_name or tag_name == node.name):
+                    containers.setdefault(selector, node)
+            
+            if node.name == 'a':
+                elements.append(self._describe_element(node, True))
+            elif node.get('id') == 'next' or self.NEXT_ELEMENT_CLASSES.intersection(classes):
+                elements.append(self._describe_element(node, False))
         
-        # 🔧 方法1：優先處理嵌套結構（如 span.article-nav-next 內的 a 標籤）
-        nested_containers = [
-            '.article-nav-next', 'span.article-nav-next', 
-            '.next-article', '.nav-next', '.post-nav-next'
+        return elements, containers, keyword_nodes
+
+    def _next_link_strategies(self):
+        """按優先順序排列的下一章判斷策略：(名稱, 判斷函數, 是否只看第一個匹配元素, CSS 選擇器)
+        「只看第一個」對應 select_one / find 的語義：第一個匹配的元素沒有有效連結就換下一個策略
+        有 CSS 選擇器的策略可以直接用 select_one 重放（站點配置的快速路徑）
+        """
+        strategies = []
+        
+        # 方法2：rel="next" 屬性（這是標準的下一頁標記）
+        strategies.append(("rel='next'", lambda e: e['is_anchor'] and 'next' in e['rel'], True, 'a[rel~="next"]'))
+        
+        # 方法3：常見的下一頁選擇器
+        selectors = [
+            ('a[title*="下一"]', lambda e: e['is_anchor'] and '下一' in e['title']),
+            ('a[title*="下一頁"]', lambda e: e['is_anchor'] and '下一頁' in e['title']),
+            ('a[title*="下一章"]', lambda e: e['is_anchor'] and '下一章' in e['title']),
+            ('a:-soup-contains("下一")', lambda e: e['is_anchor'] and '下一' in e['text']),
+            ('a:-soup-contains("下一頁")', lambda e: e['is_anchor'] and '下一頁' in e['text']),
+            ('a:-soup-contains("下一章")', lambda e: e['is_anchor'] and '下一章' in e['text']),
+            ('.next', lambda e: 'next' in e['classes']),
+            ('a.next', lambda e: e['is_anchor'] and 'next' in e['classes']),
+            ('#next', lambda e: e['id'] == 'next'),
+            ('a#next', lambda e: e['is_anchor'] and e['id'] == 'next'),
+            ('a[id*="next"]', lambda e: e['is_anchor'] and 'next' in e['id']),
+            ('a[class*="next"]', lambda e: e['is_anchor'] and 'next' in e['class_attr']),
+            ('.chapter-nav .next', lambda e: 'next' in e['classes'] and 'chapter-nav' in e['ancestor_classes']),
+            ('.page-nav .next', lambda e: 'next' in e['classes'] and 'page-nav' in e['ancestor_classes']),
+            ('a#j_chapterNext', lambda e: e['is_anchor'] and e['id'] == 'j_chapterNext'),
+            ('.j_chapterNext', lambda e: 'j_chapterNext' in e['classes']),
+            ('a[title*="下一篇"]', lambda e: e['is_anchor'] and '下一篇' in e['title']),
+            ('a:-soup-contains("下一篇")', lambda e: e['is_anchor'] and '下一篇' in e['text']),
+            ('.article-nav-next', lambda e: 'article-nav-next' in e['classes']),
+            ('.article-nav-next a', lambda e: e['is_anchor'] and 'article-nav-next' in e['ancestor_classes']),
+            ('span.article-nav-next a', lambda e: e['is_anchor'] and 'span.article-nav-next' in e['ancestor_classes']),
+            ('.next-article a', lambda e: e['is_anchor'] and 'next-article' in e['ancestor_classes']),
+            ('a[rel="next"]', lambda e: e['is_anchor'] and e['rel_attr'] == 'next'),
+            ('a[rel*="next"]', lambda e: e['is_anchor'] and 'next' in e['rel_attr']),
         ]
+        strategies += [(f"選擇器 {selector}", matches, True, selector) for selector, matches in selectors]
+        
+        # 方法4：改進的文字匹配（先精確後部分，部分匹配避免"上一篇"等無關連結）
+        for keyword, exact, partial in self.NEXT_KEYWORD_PATTERNS:
+            strategies.append((f"精確文字匹配 {keyword}", lambda e, p=exact: (
+                e['is_anchor'] and e['string'] is not None and p.search(e['string'])
+            ), False, None))
+            strategies.append((f"部分文字匹配 {keyword}", lambda e, p=partial: (
+                e['is_anchor'] and e['string'] is not None and p.search(e['string'])
+                and not self.PREV_PATTERN.search(e['text'].strip())
+            ), False, None))
+        
+        # 方法5：title 屬性匹配（確保不是"上一篇"）
+        for keyword, _, partial in self.NEXT_KEYWORD_PATTERNS:
+            strategies.append((f"title 屬性匹配 {keyword}", lambda e, p=partial: (
+                e['is_anchor'] and p.search(e['title']) and not self.PREV_PATTERN.search(e['title'])
+            ), False, None))
+        
+        return strategies
+
+    def _find_next_with_profile(self, soup, current_url, learned):
+        """站點配置的快速路徑：直接重放上次成功的容器或選擇器，不遍歷整個文檔"""
+        kind, selector = learned
+        if kind == 'container':
+            container = soup.select_one(selector)
+            link = container.find('a') if container else None
+        elif kind == 'selector':
+            link = soup.select_one(selector)
+        else:
+            return None
         
-        for container_selector in nested_containers:
-            try:
-                container = soup.select_one(container_selector)
-                if container:
-                    print(f"   🎯 找到容器：{container_selector}")
-                    # 在容器內尋找 a 標籤
-                    link = container.find('a')
-                    if link and link.get('href'):
-                        href = link.get('href')
-                        if href and href != '#' and href != 'javascript:void(0)':
-                            full_url = urljoin(current_url, href)
-                            link_text = link.get_text().strip()
-                            print(f"   ✅ 嵌套結構找到：{link_text} -> {full_url}")
-                            return full_url
-            except Exception as e:
-                print(f"   ⚠️ 處理容器 {container_selector} 時出錯：{e}")
-                continue
-        
-        # 🔧 方法2：使用 rel="next" 屬性（這是標準的下一頁標記）
-        try:
-            rel_next = soup.find('a', {'rel': 'next'})
-            if rel_next and rel_next.get('href'):
-                href = rel_next.get('href')
-                if href and href != '#' and href != 'javascript:void(0)':
-                    full_url = urljoin(current_url, href)
-                    link_text = rel_next.get_text().strip()
-                    print(f"   ✅ rel='next' 找到：{link_text} -> {full_url}")
-                    return full_url
-        except Exception as e:
-            print(f"   ⚠️ 處理 rel='next' 時出錯：{e}")
-        
-        # 方法3：原有的選擇器方法
-        for selector in next_selectors:
-            try:
-                next_element = soup.select_one(selector)
-                if next_element and next_element.get('href'):
-                    href = next_element.get('href')
-                    if href and href != '#' and href != 'javascript:void(0)':
-                        full_url = urljoin(current_url, href)
-                        print(f"   ✅ 選擇器找到：{selector} -> {full_url}")
+        if link is not None and self._is_valid_href(link.get('href')):
+            full_url = urljoin(current_url, link.get('href'))
+            self.log(f"   ✅ 站點配置 {selector}：{link.get_text().strip()} -> {full_url}")
+            return full_url
+        return None
+
+    def find_next_page_url(self, soup, current_url):
+        """智能尋找下一頁連結
+        先試該站點上次成功的策略；失敗時單次遍歷收集候選元素，再按優先順序逐個策略判斷
+        """
+        self.log(f"🔍 開始尋找下一頁連結...")
+        
+        with self.metrics.timer('find_next_page_url'):
+            learned = None
+            if self.site_profiles:
+                learned = self.site_profiles.get(current_url).get('next_link')
+                if learned:
+                    full_url = self._find_next_with_profile(soup, current_url, learned)
+                    if full_url:
                         return full_url
-            except Exception as e:
-                print(f"   ⚠️ 處理選擇器 {selector} 時出錯：{e}")
-                continue
-        
-        # 🔧 方法4：改進的文字匹配（更精確的匹配）
-        for keyword in next_keywords:
-            print(f"   🔍 搜尋關鍵字：{keyword}")
-            
-            # 精確文字匹配
-            links = soup.find_all('a', string=re.compile(f'^{re.escape(keyword)}$', re.I))
-            for link in links:
-                href = link.get('href')
-                if href and href != '#' and href != 'javascript:void(0)':
-                    full_url = urljoin(current_url, href)
-                    print(f"   ✅ 精確文字匹配：{keyword} -> {full_url}")
-                    return full_url
             
-            # 部分文字匹配
-            links = soup.find_all('a', string=re.compile(keyword, re.I))
-            for link in links:
-                link_text = link.get_text().strip()
-                # 避免匹配到"上一篇"等無關連結
-                if not re.search(r'上一|prev|previous', link_text, re.I):
-                    href = link.get('href')
-                    if href and href != '#' and href != 'javascript:void(0)':
-                        full_url = urljoin(current_url, href)
-                        print(f"   ✅ 部分文字匹配：{link_text} -> {full_url}")
-                        return full_url
-        
-        # 🔧 方法5：title 屬性匹配（加入下一篇）
-        for keyword in next_keywords:
-            try:
-                links = soup.find_all('a', attrs={'title': re.compile(keyword, re.I)})
-                for link in links:
-                    title = link.get('title', '')
-                    # 確保不是"上一篇"
-                    if not re.search(r'上一|prev|previous', title, re.I):
-                        href = link.get('href')
-                        if href and href != '#' and href != 'javascript:void(0)':
-                            full_url = urljoin(current_url, href)
-                            print(f"   ✅ title 屬性匹配：{title} -> {full_url}")
-                            return full_url
-            except Exception as e:
-                print(f"   ⚠️ 處理 title 屬性時出錯：{e}")
-                continue
-        
-        # 🔧 方法6：包含文字的元素內查找連結（處理複雜嵌套）
-        for keyword in next_keywords:
-            try:
-                # 找到包含關鍵字的所有元素
-                elements = soup.find_all(string=re.compile(keyword, re.I))
-                for element in elements:
-                    parent = element.parent
-                    if parent:
-                        # 如果父元素是 a 標籤
-                        if parent.name == 'a':
-                            href = parent.get('href')
-                            if href and href != '#' and href != 'javascript:void(0)':
-                                full_url = urljoin(current_url, href)
-                                print(f"   ✅ 包含文字元素：{keyword} -> {full_url}")
-                                return full_url
-                        
-                        # 在父元素中尋找 a 標籤
-                        link = parent.find('a')
-                        if link and link.get('href'):
-                            href = link.get('href')
-                            if href and href != '#' and href != 'javascript:void(0)':
-                                full_url = urljoin(current_url, href)
-                                print(f"   ✅ 父元素內連結：{keyword} -> {full_url}")
-                                return full_url
-            except Exception as e:
-                print(f"   ⚠️ 處理包含文字元素時出錯：{e}")
+            full_url, strategy = self._search_next_link(soup, current_url, learned)
+            if full_url and self.site_profiles:
+                self.site_profiles.learn(current_url, 'next_link', strategy)
+            return full_url
+
+    def _search_next_link(self, soup, current_url, learned=None):
+        """完整搜索下一頁連結，返回 (URL, 成功的策略)；找不到時返回 (None, None)"""
+        elements, containers, keyword_nodes = self._collect_link_candidates(soup)
+        
+        # 方法1：優先處理嵌套結構（如 span.article-nav-next 內的 a 標籤）
+        for selector in self.NEXT_CONTAINERS:
+            container = containers.get(selector)
+            if container is None:
                 continue
+            link = container.find('a')
+            if link and self._is_valid_href(link.get('href')):
+                full_url = urljoin(current_url, link.get('href'))
+                self.log(f"   ✅ 嵌套結構找到：{link.get_text().strip()} -> {full_url}")
+                return full_url, ['container', selector]
+        
+        # 方法2～5：對收集到的元素按策略優先順序判斷（站點配置中的文字策略排在最前）
+        strategies = self._next_link_strategies()
+        if learned and learned[0] == 'strategy':
+            strategies.sort(key=lambda strategy: strategy[0] != learned[1])
+        
+        for name, matches, first_only, selector in strategies:
+            for element in elements:
+                if not matches(element):
+                    continue
+                if self._is_valid_href(element['href']):
+                    full_url = urljoin(current_url, element['href'])
+                    self.log(f"   ✅ {name}：{element['text'].strip()} -> {full_url}")
+                    return full_url, ['selector', selector] if selector else ['strategy', name]
+                if first_only:
+                    break
         
-        print("   ❌ 沒有找到下一頁連結")
-        return None
+        # 方法6：包含關鍵字的文字節點，在其父元素內查找連結（處理複雜嵌套）
+        for keyword, _, partial in self.NEXT_KEYWORD_PATTERNS:
+            for node in keyword_nodes:
+                parent = node.parent
+                if parent is None or not partial.search(node):
+                    continue
+                link = parent if parent.name == 'a' else parent.find('a')
+                if link is not None and self._is_valid_href(link.get('href')):
+                    full_url = urljoin(current_url, link.get('href'))
+                    self.log(f"   ✅ 包含文字元素：{keyword} -> {full_url}")
+                    return full_url, ['strategy', f"包含文字元素 {keyword}"]
+        
+        self.log("   ❌ 沒有找到下一頁連結")
+        return None, None
 
     def extract_book_info(self, start_url, first_chapter):
         """從URL和第一章提取書名和作者"""
@@ -849,190 +2931,381 @@ class UniversalBookScraper:
         
         return book_title, author
     
-    def clean_content(self, text):
-        """清理文本內容（保留分行格式）"""
-        # 首先移除常見的廣告文字和無關內容
-        ad_patterns = [
-            r'.*?章節錯誤.*?',
-            r'.*?舉報.*?',
-            r'.*?收藏.*?',
-            r'.*?投票.*?',
-            r'.*?推薦.*?',
-            r'.*?廣告.*?',
-            r'.*?免費閱讀.*?',
-            r'.*?點擊進入.*?',
-            r'.*?更多精彩.*?',
-            r'本章未完.*?點擊下一頁繼續閱讀.*?',
-        ]
-        
-        for pattern in ad_patterns:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE)
-        
-        # 🔧 修改：更好地處理段落間距
-        # 保留由 extract_content_with_paragraphs 產生的雙換行
-        # 但清理多餘的空白行（超過兩個換行的情況）
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        
-        # 清理每行開頭和結尾的空白，但保留換行
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            # 清理每行的首尾空白和多餘的空格
-            cleaned_line = re.sub(r'[ \t]+', ' ', line.strip())
-            cleaned_lines.append(cleaned_line)
-        
-        # 重新組合，保留分行
-        text = '\n'.join(cleaned_lines)
-        
-        # 移除開頭和結尾的空白行
-        text = text.strip()
-        
-        # 🔧 修改：確保段落之間保持雙換行
-        # 將單個換行後跟非空行的情況轉換為雙換行（如果不是已經是雙換行）
-        text = re.sub(r'(?<!\n)\n(?!\n)(?=\S)', '\n\n', text)
-        
-        # 最後清理：將多於兩個的連續換行縮減為兩個
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        return text
-    
     def convert_to_ebook(self, title, author, chapters):
         """轉換為 Ebook 格式"""
         # 將章節內容分頁
         pages = []
         
         for chapter in chapters:
-            content = chapter['content']
-            chapter_title = chapter['title']
-            
-            # 每頁最多2000字
-            max_chars_per_page = 2000
+            pages.extend(self.paginate_chapter(chapter['title'], chapter['content']))
+        
+        ebook_data = self.ebook_metadata(title, author, len(chapters), len(pages))
+        ebook_data['pages'] = pages
+        
+        # 保持原有的字段順序
+        return {key: ebook_data[key] for key in (
+            'id', 'title', 'author', 'coverImage', 'instruction',
+            'pages', 'totalPages', 'currentPage', 'bookmarkedPages'
+        )}
+
+    def paginate_chapter(self, chapter_title, content):
+        """將單個章節分頁（每頁最多2000字）"""
+        pages = []
+        max_chars_per_page = 2000
+        
+        if len(content) <= max_chars_per_page:
+            # 短章節，整章作為一頁
+            pages.append(f"{chapter_title}\n\n{content}")
+        else:
+            # 長章節，智能分頁
+            paragraphs = content.split('\n\n')
+            current_page = f"{chapter_title}\n\n"
+            current_length = len(current_page)
             
-            if len(content) <= max_chars_per_page:
-                # 短章節，整章作為一頁
-                pages.append(f"{chapter_title}\n\n{content}")
-            else:
-                # 長章節，智能分頁
-                paragraphs = content.split('\n\n')
-                current_page = f"{chapter_title}\n\n"
-                current_length = len(current_page)
-                
-                for paragraph in paragraphs:
-                    if current_length + len(paragraph) + 2 > max_chars_per_page and current_page.strip() != chapter_title:
-                        pages.append(current_page.strip())
-                        current_page = paragraph + "\n\n"
-                        current_length = len(current_page)
-                    else:
-                        current_page += paragraph + "\n\n"
-                        current_length += len(paragraph) + 2
-                
-                if current_page.strip():
+            for paragraph in paragraphs:
+                if current_length + len(paragraph) + 2 > max_chars_per_page and current_page.strip() != chapter_title:
                     pages.append(current_page.strip())
+                    current_page = paragraph + "\n\n"
+                    current_length = len(current_page)
+                else:
+                    current_page += paragraph + "\n\n"
+                    current_length += len(paragraph) + 2
+            
+            if current_page.strip():
+                pages.append(current_page.strip())
         
+        return pages
+
+    def ebook_metadata(self, title, author, chapter_count, page_count):
+        """生成書籍 JSON 中除 pages 以外的字段"""
         # 生成書籍ID
         book_id = f"scraped_{title.replace(' ', '_').lower()}"
         
-        ebook_data = {
+        return {
             "id": book_id,
             "title": title,
             "author": author,
             "coverImage": "default_cover",
-            "instruction": f"從網路爬取的書籍：{title}，作者：{author}。共{len(chapters)}章，{len(pages)}頁。",
-            "pages": pages,
-            "totalPages": len(pages),
+            "instruction": f"從網路爬取的書籍：{title}，作者：{author}。共{chapter_count}章，{page_count}頁。",
+            "totalPages": page_count,
             "currentPage": 0,
             "bookmarkedPages": []
         }
-        
-        return ebook_data
 
     def print_scraping_summary(self, chapters):
         """顯示詳細的爬取總結（包含恢復統計）"""
         duration = self.stats['end_time'] - self.stats['start_time']
         
-        print("\n" + "=" * 80)
+        self.log("\n" + "=" * 80)
         if self.continue_mode:
-            print("🔄 續傳完成！詳細統計報告")
+            self.log("🔄 續傳完成！詳細統計報告")
         else:
-            print("🎉 爬取完成！詳細統計報告")
-        print("=" * 80)
+            self.log("🎉 爬取完成！詳細統計報告")
+        self.log("=" * 80)
         
         # 基本統計
-        print("📊 基本統計：")
-        print(f"   ⏰ 本次耗時：{duration:.2f} 秒 ({duration/60:.1f} 分鐘)")
+        self.log("📊 基本統計：")
+        self.log(f"   ⏰ 本次耗時：{duration:.2f} 秒 ({duration/60:.1f} 分鐘)")
         
         if self.continue_mode:
-            new_chapters = len(chapters) - len(self.existing_chapters)
-            print(f"   📚 總章節：{len(chapters)} 章")
-            print(f"   📖 已有章節：{len(self.existing_chapters)} 章")
-            print(f"   🆕 新增章節：{new_chapters} 章")
-            print(f"   ❌ 失敗章節：{self.stats['failed_chapters']} 章")
+            new_chapters = len(chapters) - chapters.existing_count
+            self.log(f"   📚 總章節：{len(chapters)} 章")
+            self.log(f"   📖 已有章節：{chapters.existing_count} 章")
+            self.log(f"   🆕 新增章節：{new_chapters} 章")
+            self.log(f"   ❌ 失敗章節：{self.stats['failed_chapters']} 章")
         else:
-            print(f"   📚 成功章節：{self.stats['total_chapters']} 章")
-            print(f"   ❌ 失敗章節：{self.stats['failed_chapters']} 章")
+            self.log(f"   📚 成功章節：{self.stats['total_chapters']} 章")
+            self.log(f"   ❌ 失敗章節：{self.stats['failed_chapters']} 章")
+        if self.stats['duplicate_chapters']:
+            self.log(f"   ♻️ 重複章節（未保存）：{self.stats['duplicate_chapters']} 章")
+        if self.stats['suspected_duplicates']:
+            self.log(f"   ⚠️ 疑似重複章節（已保存，請檢查）：{self.stats['suspected_duplicates']} 章")
         
         # 新增恢復統計
         if self.recovery_count > 0:
-            print(f"   🔄 自動恢復次數：{self.recovery_count} 次")
+            self.log(f"   🔄 自動恢復次數：{self.recovery_count} 次")
         
-        print(f"   🌐 訪問URL數：{len(self.stats['visited_urls'])}")
-        print(f"   ✅ 成功率：{(self.stats['total_chapters']/(self.stats['total_chapters']+self.stats['failed_chapters'])*100):.1f}%" if (self.stats['total_chapters']+self.stats['failed_chapters']) > 0 else "   ✅ 成功率：0%")
+        self.log(f"   🌐 訪問URL數：{self.stats['visited_count']}")
+        self.log(f"   ✅ 成功率：{(self.stats['total_chapters']/(self.stats['total_chapters']+self.stats['failed_chapters'])*100):.1f}%" if (self.stats['total_chapters']+self.stats['failed_chapters']) > 0 else "   ✅ 成功率：0%")
         
         # 內容統計
-        print("\n📝 內容統計：")
+        self.log("\n📝 內容統計：")
         if self.continue_mode:
-            print(f"   📄 總字符數：{self.stats['total_characters']:,} (本次新增)")
-            print(f"   📝 總詞數：{self.stats['total_words']:,} (本次新增)")
+            self.log(f"   📄 總字符數：{self.stats['total_characters']:,} (本次新增)")
+            self.log(f"   📝 總詞數：{self.stats['total_words']:,} (本次新增)")
         else:
-            print(f"   📄 總字符數：{self.stats['total_characters']:,}")
-            print(f"   📝 總詞數：{self.stats['total_words']:,}")
+            self.log(f"   📄 總字符數：{self.stats['total_characters']:,}")
+            self.log(f"   📝 總詞數：{self.stats['total_words']:,}")
         
         if self.stats['total_chapters'] > 0:
             avg_chars = self.stats['total_characters'] / self.stats['total_chapters']
             avg_words = self.stats['total_words'] / self.stats['total_chapters']
-            print(f"   📊 平均每章字符：{avg_chars:,.0f}")
-            print(f"   📊 平均每章詞數：{avg_words:,.0f}")
+            self.log(f"   📊 平均每章字符：{avg_chars:,.0f}")
+            self.log(f"   📊 平均每章詞數：{avg_words:,.0f}")
         
         # 章節詳情
         if chapters:
-            print("\n📖 章節詳情：")
-            if self.continue_mode and len(self.existing_chapters) > 0:
-                print(f"   (已有 {len(self.existing_chapters)} 章，以下為新增章節)")
-                start_index = len(self.existing_chapters)
-                display_chapters = chapters[start_index:start_index+10]
-                for i, chapter in enumerate(display_chapters, start_index + 1):
-                    print(f"   {i:2d}. {chapter['title'][:50]}{'...' if len(chapter['title']) > 50 else ''}")
-                    print(f"       📊 {chapter['char_count']:,} 字符 | {chapter['word_count']:,} 詞")
-            else:
-                for i, chapter in enumerate(chapters[:10], 1):
-                    print(f"   {i:2d}. {chapter['title'][:50]}{'...' if len(chapter['title']) > 50 else ''}")
-                    print(f"       📊 {chapter['char_count']:,} 字符 | {chapter['word_count']:,} 詞")
+            self.log("\n📖 章節詳情：")
+            start_index = chapters.existing_count
+            if self.continue_mode and start_index > 0:
+                self.log(f"   (已有 {start_index} 章，以下為新增章節)")
+            for i, chapter in enumerate(chapters.preview, start_index + 1):
+                self.log(f"   {i:2d}. {chapter['title'][:50]}{'...' if len(chapter['title']) > 50 else ''}")
+                self.log(f"       📊 {chapter['char_count']:,} 字符 | {chapter['word_count']:,} 詞")
             
-            if len(chapters) > 10:
-                print(f"   ... 還有 {len(chapters) - 10} 章")
+            if len(chapters) - start_index > len(chapters.preview):
+                self.log(f"   ... 還有 {len(chapters) - start_index - len(chapters.preview)} 章")
         
         # 效率統計
-        print("\n⚡ 效率統計：")
+        self.log("\n⚡ 效率統計：")
         if duration > 0:
             chars_per_sec = self.stats['total_characters'] / duration
             chapters_per_min = (self.stats['total_chapters'] / duration) * 60
-            print(f"   🚀 爬取速度：{chars_per_sec:,.0f} 字符/秒")
-            print(f"   📚 章節速度：{chapters_per_min:.1f} 章/分鐘")
+            self.log(f"   🚀 爬取速度：{chars_per_sec:,.0f} 字符/秒")
+            self.log(f"   📚 章節速度：{chapters_per_min:.1f} 章/分鐘")
+        
+        # 各階段耗時（extract 已包含 clean_content）
+        stages = self.metrics.snapshot()
+        if stages:
+            self.log("\n⏱️  各階段耗時：")
+            for stage, record in stages.items():
+                self.log(f"   {stage:<20}{record['count']:>7} 次 | 合計 {record['sum']:>9.2f} 秒 | "
+                      f"平均 {record['mean'] * 1000:>8.1f} ms | p95 ≤ {record['p95'] * 1000:,.0f} ms")
+            if self.metrics.export_path:
+                self.log(f"   📈 指標已導出到：{self.metrics.export_path}")
         
         # 失敗URL（如果有）
         if self.stats['failed_urls']:
-            print("\n❌ 失敗的URL：")
-            for i, url in enumerate(self.stats['failed_urls'][:5], 1):
-                print(f"   {i}. {url}")
-            if len(self.stats['failed_urls']) > 5:
-                print(f"   ... 還有 {len(self.stats['failed_urls']) - 5} 個失敗URL")
+            self.log("\n❌ 失敗的URL：")
+            shown = list(self.stats['failed_urls'])[-5:]
+            for i, url in enumerate(shown, 1):
+                self.log(f"   {i}. {url}")
+            if self.stats['failed_chapters'] > len(shown):
+                self.log(f"   ... 還有 {self.stats['failed_chapters'] - len(shown)} 個失敗URL")
+        
+        self.log("=" * 80)
+
+class BatchScraper:
+    """批量爬取多本書：不同主機的書並行爬取，同一主機的書依次爬取
+    所有書共用限速器、並發上限、回應快取和書籍清單，禮貌約束按主機生效
+    """
+    def __init__(self, max_parallel_hosts=8, pipeline=False, log_dir='batch_logs', progress_interval=30,
+                 async_engine=False, http2=False, metrics_path=None, max_page_bytes=None):
+        self.max_parallel_hosts = max_parallel_hosts
+        self.pipeline = pipeline
+        self.log_dir = log_dir
+        self.progress_interval = progress_interval
+        
+        # 共用組件
+        template = UniversalBookScraper()
+        self.rate_limiter = template.rate_limiter
+        self.host_limiter = template.host_limiter
+        self.response_cache = template.response_cache
+        self.manifest = template.manifest
+        self.site_profiles = template.site_profiles
+        self.charset_detector = template.charset_detector
+        self.metrics = template.metrics
+        self.metrics.export_path = metrics_path
+        self.max_page_bytes = max_page_bytes or template.max_page_bytes
+        self.fetch_engine = template.use_async_engine(http2=http2) if async_engine else None
+        
+        self._lock = threading.Lock()
+        self.active = {}  # 書籍序號 -> 正在運行的 scraper
+        self.results = []
+
+    @staticmethod
+    def load_jobs(file_path, default_max_chapters=999):
+        """讀取任務文件：每行「起始URL [最大章節數]」，# 開頭為註釋"""
+        jobs = []
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                parts = line.split()
+                url = parts[0]
+                if not url.startswith(('http://', 'https://')):
+                    url = 'https://' + url
+                max_chapters = default_max_chapters
+                if len(parts) > 1:
+                    if not parts[1].isdigit():
+                        print(f"⚠️ 第 {line_number} 行的章節數無效，使用默認值：{parts[1]}")
+                    else:
+                        max_chapters = int(parts[1])
+                jobs.append({'index': len(jobs) + 1, 'url': url, 'max_chapters': max_chapters})
+        return jobs
+
+    def _make_scraper(self):
+        scraper = UniversalBookScraper()
+        scraper.rate_limiter = self.rate_limiter
+        scraper.host_limiter = self.host_limiter
+        scraper.response_cache = self.response_cache
+        scraper.manifest = self.manifest
+        scraper.site_profiles = self.site_profiles
+        scraper.charset_detector = self.charset_detector
+        scraper.metrics = self.metrics
+        scraper.max_page_bytes = self.max_page_bytes
+        scraper.fetch_engine = self.fetch_engine
+        return scraper
+
+    @staticmethod
+    def _file_logger(log_file):
+        """返回寫入日誌文件的輸出函數（與 print 參數相同，可在多個執行緒中調用）"""
+        lock = threading.Lock()
+        
+        def log(*args, **kwargs):
+            kwargs.pop('file', None)
+            with lock:
+                print(*args, file=log_file, **kwargs)
+        return log
+
+    def _run_host(self, host_jobs, total):
+        """依次爬取同一主機的所有書；每本書的輸出寫入各自的日誌文件，終端只顯示批量進度"""
+        for job in host_jobs:
+            scraper = self._make_scraper()
+            host_id = re.sub(r'[^\w]', '_', urlparse(job['url']).netloc)
+            log_path = os.path.join(self.log_dir, f"{job['index']:04d}_{host_id}.log")
+            started = time.time()
+            with self._lock:
+                self.active[job['index']] = (job, scraper, started)
+            
+            result = {'job': job, 'file': None, 'chapters': 0, 'error': None}
+            with open(log_path, 'w', encoding='utf-8') as log_file:
+                scraper.log = self._file_logger(log_file)
+                try:
+                    ebook_data = scraper.scrape_from_url(job['url'], job['max_chapters'], pipeline=self.pipeline)
+                    if ebook_data:
+                        result['file'] = scraper.last_saved_file
+                        result['chapters'] = scraper.stats['total_chapters']
+                        result['title'] = ebook_data['title']
+                except Exception as e:
+                    result['error'] = str(e)
+                    scraper.log(f"❌ 爬取過程中發生錯誤：{e}")
+                finally:
+                    scraper.log = print  # 日誌文件即將關閉，之後的輸出（如已取消的預取）不再寫入
+            
+            result['duration'] = time.time() - started
+            with self._lock:
+                del self.active[job['index']]
+                self.results.append(result)
+                done = len(self.results)
+            
+            if result['file']:
+                print(f"✅ [{done}/{total}] #{job['index']} {result.get('title', '')}：{result['chapters']} 章，"
+                      f"{result['duration']:.0f} 秒 → {result['file']}")
+            else:
+                print(f"❌ [{done}/{total}] #{job['index']} {job['url']}：{result['error'] or '沒有獲取到內容'}（日誌：{log_path}）")
+
+    def print_progress(self):
+        """顯示正在爬取的書籍進度"""
+        with self._lock:
+            running = sorted(self.active.values(), key=lambda item: item[0]['index'])
+            done = len(self.results)
+        print(f"\n📊 批量進度：已完成 {done} 本，進行中 {len(running)} 本")
+        for job, scraper, started in running:
+            chapters = scraper.stats['successful_count']
+            print(f"   #{job['index']} {urlparse(job['url']).netloc}：{chapters} 章，{time.time() - started:.0f} 秒")
+
+    def run(self, jobs):
+        """按主機分組後並行爬取，返回每本書的結果"""
+        os.makedirs(self.log_dir, exist_ok=True)
+        
+        hosts = {}
+        for job in jobs:
+            hosts.setdefault(urlparse(job['url']).netloc, []).append(job)
+        
+        print(f"📚 批量爬取：{len(jobs)} 本書，{len(hosts)} 個主機，最多同時 {self.max_parallel_hosts} 個主機")
+        print(f"📝 每本書的詳細日誌：{os.path.abspath(self.log_dir)}")
+        print("-" * 60)
         
-        print("=" * 80)
+        started = time.time()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(len(hosts), self.max_parallel_hosts))) as executor:
+                futures = [executor.submit(self._run_host, host_jobs, len(jobs)) for host_jobs in hosts.values()]
+                next_report = started + (self.progress_interval or 0)
+                while not all(future.done() for future in futures):
+                    time.sleep(1)
+                    if self.progress_interval and time.time() >= next_report:
+                        self.print_progress()
+                        next_report += self.progress_interval
+                for future in futures:
+                    future.result()
+        finally:
+            self.response_cache.flush()
+            self.site_profiles.flush()
+            self.metrics.export()
+            if self.fetch_engine:
+                self.fetch_engine.close()
+        
+        duration = time.time() - started
+        succeeded = [result for result in self.results if result['file']]
+        total_chapters = sum(result['chapters'] for result in succeeded)
+        print("\n" + "=" * 60)
+        print("🎊 批量爬取完成")
+        print(f"   ✅ 成功：{len(succeeded)} 本 | ❌ 失敗：{len(self.results) - len(succeeded)} 本")
+        print(f"   📖 總章節：{total_chapters} 章")
+        print(f"   ⏰ 耗時：{duration:.0f} 秒 ({duration/60:.1f} 分鐘)")
+        if duration > 0:
+            print(f"   📚 章節速度：{total_chapters / duration * 60:.1f} 章/分鐘")
+        if self.metrics.export_path:
+            print(f"   📈 各階段耗時指標：{self.metrics.export_path}")
+        print("=" * 60)
+        return self.results
+
+def export_from_log(log_path, output_filename=None):
+    """獨立的導出步驟：把章節日誌轉換為 OursReader 書籍 JSON"""
+    scraper = UniversalBookScraper()
+    chapter_log = ChapterLog(log_path)
+    if not chapter_log.exists():
+        print(f"❌ 章節日誌不存在：{log_path}")
+        return None
+    
+    book_info = chapter_log.book_info() or {'title': '未知書名', 'author': '未知作者'}
+    if not output_filename:
+        safe_title = re.sub(r'[^\w\s-]', '', book_info['title'])
+        safe_title = safe_title.replace(' ', '_')[:50]
+        output_filename = f"{safe_title}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    
+    scraper.export_book(chapter_log, output_filename, book_info['title'], book_info['author'])
+    print(f"💾 已從章節日誌導出：{output_filename}")
+    return output_filename
 
 def main():
     """主函數：從用戶輸入的URL開始爬取（支援續傳和自動恢復）"""
+    parser = argparse.ArgumentParser(description="Universal Book Scraper")
+    parser.add_argument('--export', metavar='LOG', help="從章節日誌（*.chapters.jsonl）導出書籍 JSON 後退出")
+    parser.add_argument('-o', '--output', help="導出文件名（配合 --export 使用）")
+    parser.add_argument('--batch', metavar='FILE', help="批量模式：任務文件每行為「起始URL [最大章節數]」")
+    parser.add_argument('--max-hosts', type=int, default=8, help="批量模式下同時爬取的主機數（默認 8）")
+    parser.add_argument('--max-chapters', type=int, default=999, help="批量模式下每本書的默認最大章節數")
+    parser.add_argument('--pipeline', action='store_true', help="使用管線模式爬取")
+    parser.add_argument('--engine', choices=['requests', 'async'], default='requests',
+                        help="抓取引擎：requests（默認）或 async（asyncio + httpx 連接池）")
+    parser.add_argument('--http2', action='store_true', help="異步引擎使用 HTTP/2（需安裝 httpx[http2]）")
+    parser.add_argument('--max-page-mb', type=float, default=8, help="單個頁面的大小上限（MB，默認 8）")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="運行中定期導出各階段耗時直方圖（.prom/.txt 為 Prometheus 文本格式，其餘為 JSON）")
+    args = parser.parse_args()
+    
+    if args.export:
+        return export_from_log(args.export, args.output)
+    
+    if args.batch:
+        jobs = BatchScraper.load_jobs(args.batch, args.max_chapters)
+        if not jobs:
+            print("❌ 任務文件中沒有任何URL")
+            return None
+        return BatchScraper(max_parallel_hosts=args.max_hosts, pipeline=args.pipeline,
+                            async_engine=(args.engine == 'async'), http2=args.http2,
+                            metrics_path=args.metrics,
+                            max_page_bytes=int(args.max_page_mb * 1024 * 1024)).run(jobs)
+    
     scraper = UniversalBookScraper()
+    scraper.pipeline_mode = args.pipeline
+    scraper.metrics.export_path = args.metrics
+    scraper.max_page_bytes = int(args.max_page_mb * 1024 * 1024)
+    if args.engine == 'async':
+        scraper.use_async_engine(http2=args.http2)
     
     print("📚 Universal Book Scraper v2.3 (with Auto-Recovery)")
     print("=" * 50)
@@ -1081,37 +3354,36 @@ def main():
     print(f"\n🚀 開始爬取：{start_url}")
     print(f"📖 自動爬取所有可用章節")
     print(f"🔄 重試機制：最多重試 {scraper.max_retries} 次")
-    print(f"⏱️  重試延遲：{scraper.retry_delay} 秒")
+    print(f"⏱️  重試延遲：至少 {scraper.retry_delay} 秒（遇到 429/503 會自動延長）")
+    print(f"🚦 自適應限速：初始間隔 {scraper.delay} 秒，回應良好時逐步加速至每 {scraper.rate_limiter.min_interval} 秒一次")
     print(f"🛡️  自動恢復：啟用（最多 {scraper.max_recoveries} 次，等待 {scraper.recovery_delay} 秒）")
     print(f"📂 續傳功能：自動檢測已存在的文件")
+    if scraper.pipeline_mode:
+        print(f"⚡ 管線模式：{scraper.pipeline_workers} 個工作執行緒，每主機最多 {scraper.max_concurrent_per_host} 個並發請求")
+    if scraper.fetch_engine:
+        engine = scraper.fetch_engine
+        print(f"🔌 異步引擎：每主機 {engine.pool_size_per_host} 個長連接{'，HTTP/2' if engine.http2 else ''}")
+    if scraper.metrics.export_path:
+        print(f"📈 階段耗時指標：每 {StageMetrics.EXPORT_INTERVAL} 秒導出到 {scraper.metrics.export_path}")
     print("-" * 50)
     
     # 開始爬取
     try:
         ebook_data = scraper.scrape_from_url(start_url, max_chapters)
         
-        if ebook_data:
-            # 文件名處理
-            safe_title = re.sub(r'[^\w\s-]', '', ebook_data['title'])
-            safe_title = safe_title.replace(' ', '_')[:50]  # 限制文件名長度
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            filename = f"{safe_title}_{timestamp}.json"
-            
-            # 保存文件
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump([ebook_data], f, ensure_ascii=False, indent=2)
-            
+        # scrape_from_url 已經從章節日誌導出書籍文件，這裡不再重複寫入
+        filename = scraper.last_saved_file
+        if ebook_data and filename:
             # 最終總結
             print("\n🎊 任務完成！最終報告")
             print("=" * 60)
             print(f"📚 書名：{ebook_data['title']}")
             print(f"👤 作者：{ebook_data['author']}")
-            print(f"📄 總頁數：{len(ebook_data['pages'])} 頁")
+            print(f"📄 總頁數：{ebook_data['totalPages']} 頁")
             print(f"📖 總章節：{scraper.stats['total_chapters']} 章")
             
             if scraper.continue_mode:
-                existing_pages = len(scraper.existing_book_data.get('pages', []))
-                new_pages = len(ebook_data['pages']) - existing_pages
+                new_pages = ebook_data['totalPages'] - scraper.existing_page_count()
                 print(f"🔄 續傳結果：新增 {new_pages} 頁")
             
             print(f"📝 總字符：{scraper.stats['total_characters']:,}")
@@ -1126,7 +3398,7 @@ def main():
             
             print("\n💡 續傳功能說明：")
             print("   1. 下次運行時輸入相同的起始URL")
-            print("   2. 腳本會自動檢測已存在的文件")
+            print("   2. 腳本會自動檢測章節日誌或已存在的文件")
             print("   3. 跳過已爬取的章節，繼續未完成的部分")
             print("   4. 適合處理大型書籍或網絡中斷的情況")
             
@@ -1144,6 +3416,9 @@ def main():
         print("   3. 嘗試重新運行腳本")
         print("   4. 檢查網站是否有反爬蟲保護")
         return False
+    finally:
+        if scraper.fetch_engine:
+            scraper.fetch_engine.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF to Ebook Converter 性能基準測試
+accumulate：比較原來的字符串拼接累積章節和 ChapterBuffer，並檢查輸出一致
+convert：生成單章多頁的測試PDF，測量 convert_pdf_to_ebook 的整體耗時
+headers：生成帶頁眉頁腳的測試PDF，比較只用規則和按版面位置移除頁眉頁腳的耗時和殘留
+
+用法：
+    python pdf_converter_benchmark.py accumulate --pages 2000
+    python pdf_converter_benchmark.py convert --pages 2000 --workers 4
+    python pdf_converter_benchmark.py headers --pages 500
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fitz  # PyMuPDF
+
+from pdf_to_ebook_converter import ChapterBuffer, PDFToEbookConverter
+
+WORDS_EN = "the quick brown fox jumps over lazy dog while reading books about history science and art".split()
+WORDS_ZH = "天地玄黃宇宙洪荒日月盈昃辰宿列張寒來暑往秋收冬藏閏餘成歲律呂調陽"
+
+def generate_page_text(page_num, size_chars=1500):
+    """生成一頁清理後的正文（中英混合，以句號分段）"""
+    rng = random.Random(page_num)
+    paragraphs = []
+    length = 0
+    while length < size_chars:
+        if rng.random() < 0.5:
+            paragraph = ' '.join(rng.choice(WORDS_EN) for _ in range(rng.randint(20, 60))) + '.'
+        else:
+            paragraph = ''.join(rng.choice(WORDS_ZH) for _ in range(rng.randint(40, 120))) + '。'
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return '\n\n'.join(paragraphs)
+
+def legacy_accumulate(page_texts):
+    """原來的章節累積：整章字符串 += 拼接，完成時多次 strip / split 全文"""
+    content = ""
+    for text in page_texts:
+        if content:
+            content += "\n\n" + text
+        else:
+            content = text
+
+    # 原來的 _is_valid_chapter_content
+    stripped = content.strip()
+    valid = (len(stripped) >= 100 and len(stripped.split()) >= 30 and
+             sum(1 for c in stripped if c.isalpha() or '\u4e00' <= c <= '\u9fff') / len(stripped) >= 0.3)
+
+    # 原來的章節記錄和統計
+    return {
+        'valid': valid,
+        'content': content.strip(),
+        'char_count': len(content),
+        'word_count': len(content.split()),
+        'total_words': len(content.split())
+    }
+
+def buffer_accumulate(page_texts):
+    """ChapterBuffer：逐頁累計計數，完成時拼接一次"""
+    converter = PDFToEbookConverter()
+    chapter = ChapterBuffer("開始", 0)
+    for page_num, text in enumerate(page_texts):
+        chapter.append(text, page_num)
+
+    valid = converter._is_valid_chapter_content(chapter)
+    record = converter._chapter_record(chapter)
+    return {
+        'valid': valid,
+        'content': record['content'],
+        'char_count': record['char_count'],
+        'word_count': record['word_count'],
+        'total_words': converter.stats['total_words']
+    }
+
+def bench_accumulate(pages=2000, rounds=3):
+    """返回 (原來的平均毫秒, ChapterBuffer 平均毫秒, 輸出是否一致)"""
+    page_texts = [generate_page_text(page_num) for page_num in range(pages)]
+    same = legacy_accumulate(page_texts) == buffer_accumulate(page_texts)
+
+    timings = {'legacy': [], 'buffer': []}
+    for _ in range(rounds):
+        started = time.perf_counter()
+        legacy_accumulate(page_texts)
+        timings['legacy'].append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        buffer_accumulate(page_texts)
+        timings['buffer'].append((time.perf_counter() - started) * 1000)
+
+    return statistics.mean(timings['legacy']), statistics.mean(timings['buffer']), same
+
+def generate_single_chapter_pdf(path, pages):
+    """生成沒有章節標題的多頁PDF（標題規則找不到分章，整本書為一章）"""
+    document = fitz.open()
+    for page_num in range(pages):
+        rng = random.Random(page_num)
+        page = document.new_page()
+        lines = [' '.join(rng.choice(WORDS_EN) for _ in range(11)) + ('.' if line_num % 3 == 2 else '')
+                 for line_num in range(36)]
+        page.insert_text((50, 50), '\n'.join(lines), fontsize=10, lineheight=2)
+    document.save(path)
+    document.close()
+
+def bench_convert(pages=2000, workers=1):
+    """返回 (總秒數, 處理頁數, 章節數, Ebook 頁數)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = os.path.join(workdir, 'single_chapter.pdf')
+        output_path = os.path.join(workdir, 'single_chapter.json')
+        generate_single_chapter_pdf(pdf_path, pages)
+
+        converter = PDFToEbookConverter()
+        converter.max_pages = pages
+        converter.workers = workers
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            converter.convert_pdf_to_ebook(pdf_path, output_path)
+        elapsed = time.perf_counter() - started
+
+        with open(output_path, 'r', encoding='utf-8') as f:
+            ebook_pages = json.load(f)[0]['totalPages']
+
+    return elapsed, converter.stats['processed_pages'], converter.stats['total_chapters'], ebook_pages
+
+BOOK_HEADER = "A Study of Running Headers"
+
+def generate_running_header_pdf(path, pages, chapter_pages=20):
+    """
+    生成帶頁眉頁腳的多頁PDF：偶數頁頁眉為書名，奇數頁為章名，頁腳為「— 頁碼 —」
+    正文為多行段落，章首頁以「Chapter N. ...」標題行開頭
+    """
+    document = fitz.open()
+    for page_num in range(pages):
+        rng = random.Random(page_num)
+        page = document.new_page()
+        chapter_num = page_num // chapter_pages + 1
+        header = BOOK_HEADER if page_num % 2 == 0 else f"Chapter {chapter_num}: The Part About Things"
+        page.insert_text((72, 40), header, fontsize=9)
+        page.insert_text((280, 810), f"— {page_num + 1} —", fontsize=9)
+
+        paragraphs = []
+        if page_num % chapter_pages == 0:
+            paragraphs.append(f"Chapter {chapter_num}. Where It All Begins Again.")
+        while len(paragraphs) < 6:
+            sentences = [' '.join(rng.choice(WORDS_EN) for _ in range(rng.randint(8, 16))).capitalize() + '.'
+                         for _ in range(rng.randint(3, 5))]
+            paragraphs.append(' '.join(sentences))
+        page.insert_textbox(fitz.Rect(72, 60, 523, 780), '\n'.join(paragraphs), fontsize=10)
+    document.save(path)
+    document.close()
+
+def generate_short_chapter_pdf(path, pages=12):
+    """生成每頁一個短章的PDF，章標題位於頁面頂部區域內（不是頁眉，不應被移除）"""
+    document = fitz.open()
+    for page_num in range(pages):
+        rng = random.Random(page_num)
+        page = document.new_page()
+        page.insert_text((72, 60), f"Chapter {page_num + 1}. A Short Tale Of Things.", fontsize=12)
+        sentences = [' '.join(rng.choice(WORDS_EN) for _ in range(rng.randint(8, 16))).capitalize() + '.'
+                     for _ in range(12)]
+        page.insert_textbox(fitz.Rect(72, 90, 523, 780), ' '.join(sentences), fontsize=10)
+    document.save(path)
+    document.close()
+
+def _convert_quietly(pdf_path, output_path, pages, layout):
+    """按指定的頁眉頁腳模式轉換，返回 (秒數, 轉換器, Ebook)"""
+    converter = PDFToEbookConverter()
+    converter.max_pages = pages
+    converter.workers = 1
+    converter.segmentation = 'heuristic'
+    converter.layout_header_footer = layout
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        converter.convert_pdf_to_ebook(pdf_path, output_path)
+    elapsed = time.perf_counter() - started
+
+    with open(output_path, 'r', encoding='utf-8') as f:
+        ebook = json.load(f)[0]
+    return elapsed, converter, ebook
+
+def bench_headers(pages=500, short_chapters=12):
+    """
+    返回 ({模式: (秒數, 殘留頁眉頁腳行數, 章節數, Ebook 頁數)}, {模式: (短章標題數, 短章章節數)})
+    """
+    results = {}
+    short_results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        pdf_path = os.path.join(workdir, 'running_headers.pdf')
+        generate_running_header_pdf(pdf_path, pages)
+        short_path = os.path.join(workdir, 'short_chapters.pdf')
+        generate_short_chapter_pdf(short_path, short_chapters)
+
+        for mode, layout in (('regex', False), ('layout', True)):
+            output_path = os.path.join(workdir, f'{mode}.json')
+            elapsed, converter, ebook = _convert_quietly(pdf_path, output_path, pages, layout)
+            text = '\n'.join(ebook['pages'])
+            leftovers = (text.count(BOOK_HEADER) + text.count('The Part About Things') +
+                         len(re.findall(r'— \d+ —', text)))
+            results[mode] = (elapsed, leftovers, converter.stats['total_chapters'], ebook['totalPages'])
+
+            # 頂部區域內的短章標題每頁不同，必須保留
+            _, converter, ebook = _convert_quietly(short_path, output_path, short_chapters, layout)
+            text = '\n'.join(ebook['pages'])
+            headings = len(set(re.findall(r'Chapter \d+\. A Short Tale', text)))
+            short_results[mode] = (headings, converter.stats['total_chapters'])
+
+    return results, short_results
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF to Ebook Converter 性能基準測試")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    accumulate_cmd = subparsers.add_parser('accumulate', help="比較字符串拼接和 ChapterBuffer 的章節累積")
+    accumulate_cmd.add_argument('--pages', type=int, default=2000, help="單章頁數")
+    accumulate_cmd.add_argument('--rounds', type=int, default=3, help="重複次數")
+
+    convert_cmd = subparsers.add_parser('convert', help="測量單章多頁PDF的整體轉換耗時")
+    convert_cmd.add_argument('--pages', type=int, default=2000, help="PDF頁數")
+    convert_cmd.add_argument('--workers', type=int, default=1, help="頁面提取進程數")
+
+    headers_cmd = subparsers.add_parser('headers', help="比較規則和版面位置兩種頁眉頁腳移除")
+    headers_cmd.add_argument('--pages', type=int, default=500, help="PDF頁數")
+
+    args = parser.parse_args()
+
+    if args.command == 'headers':
+        results, short_results = bench_headers(args.pages)
+        print(f"\n📊 頁眉頁腳移除：{args.pages} 頁（奇偶頁交替頁眉 + 頁碼頁腳）")
+        print("-" * 70)
+        print(f"{'模式':<12}{'秒數':>10}{'殘留行':>10}{'章節':>8}{'Ebook頁數':>12}")
+        for mode, (elapsed, leftovers, chapters, ebook_pages) in results.items():
+            print(f"{mode:<12}{elapsed:>10.2f}{leftovers:>10}{chapters:>8}{ebook_pages:>12}")
+
+        print(f"\n📖 短章檢查：12 頁，每頁一章，標題位於頂部區域")
+        for mode, (headings, chapters) in short_results.items():
+            print(f"   {mode:<10}標題 {headings}，章節 {chapters}")
+        same = short_results['regex'] == short_results['layout']
+        print(f"🔍 短章標題和章節數{'一致' if same else '不一致，版面模式誤刪了章標題'}")
+        return
+
+    if args.command == 'accumulate':
+        legacy_ms, buffer_ms, same = bench_accumulate(args.pages, args.rounds)
+        print(f"\n📊 章節累積微基準：單章 {args.pages} 頁（平均毫秒）")
+        print("-" * 60)
+        print(f"{'字符串 += 拼接':<30}{legacy_ms:>12.2f}")
+        print(f"{'ChapterBuffer':<30}{buffer_ms:>12.2f}   (x{legacy_ms / buffer_ms:.2f})")
+        print(f"\n🔍 輸出{'完全一致' if same else '不一致，請檢查'}")
+        return
+
+    if args.command == 'convert':
+        elapsed, processed, chapters, ebook_pages = bench_convert(args.pages, args.workers)
+        print(f"\n📊 單章PDF轉換：{args.pages} 頁，{args.workers} 個進程")
+        print("-" * 60)
+        print(f"   ⏰ 總耗時：{elapsed:.2f} 秒（{processed / elapsed:.0f} 頁/秒）")
+        print(f"   📖 章節：{chapters}，📑 Ebook頁數：{ebook_pages}")
+
+if __name__ == "__main__":
+    main()
@@ -7,20 +7,91 @@ PDF to Ebook JSON Converter
 """
 
 import fitz  # PyMuPDF
+import hashlib
 import json
 import time
 import re
 import os
 import sys
+import tempfile
 import requests
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from urllib.parse import urlparse, unquote
 from pathlib import Path
 
+class ChapterBuffer:
+    """
+    章節文本緩衝：按頁收集片段，逐頁累計字符數、詞數和文字字符數
+    只在章節完成時拼接一次，避免整章字符串反覆複製和反覆 split
+    """
+    SEPARATOR = "\n\n"
+    
+    def __init__(self, title, page_start):
+        self.title = title
+        self.page_start = page_start
+        self.page_end = page_start
+        self.parts = []
+        self.char_count = 0  # 等於拼接後的長度（含分隔符）
+        self.word_count = 0
+        self.text_chars = 0  # 字母和漢字的數量
+        self.has_text = False
+    
+    def append(self, text, page_num):
+        if self.parts:
+            self.char_count += len(self.SEPARATOR)
+        self.parts.append(text)
+        self.char_count += len(text)
+        # 分隔符是空白，所以整章詞數等於各頁詞數之和
+        self.word_count += len(text.split())
+        # 漢字本身也屬於 isalpha()
+        self.text_chars += sum(map(str.isalpha, text))
+        self.page_end = page_num
+        if not self.has_text and text.strip():
+            self.has_text = True
+    
+    def has_content(self):
+        return self.has_text
+    
+    def text(self):
+        return self.SEPARATOR.join(self.parts)
+
 class PDFToEbookConverter:
+    # 原來逐條匹配的頁眉頁腳規則，合併為一個預編譯的正則
+    HEADER_FOOTER_PATTERN = re.compile('|'.join([
+        r'^第?\s*\d+\s*頁',
+        r'^Page\s*\d+',
+        r'Copyright\s*©',
+        r'版權所有',
+        r'www\.',
+        r'http[s]?://',
+        r'ISBN',
+        r'出版社',
+        r'^\d{4}年\d{1,2}月',
+    ]), re.I)
+    # 像頁碼的短行（12、— 12 —、Page 12、第 12 頁、xii、12 / 300）比較時視為同一內容，其餘行按原文比較
+    LAYOUT_PAGE_NUMBER_PATTERN = re.compile(
+        r'^[\W_]*(?:page|p\.|第)?\s*(?:\d+|[ivxlcdm]+)\s*(?:頁|(?:/|of)\s*\d+)?[\W_]*$', re.I)
+    LAYOUT_PAGE_NUMBER_MAX_LENGTH = 24
+    
     def __init__(self):
         self.max_pages = 2000  # 最大處理頁數
         self.min_text_length = 30  # 最小文本長度
         self.max_chars_per_page = 1500  # 每頁最大字符數
+        self.layout_header_footer = True  # 按文本塊位置和鄰頁重複移除頁眉頁腳
+        self.header_band_ratio = 0.1  # 頁面頂部和底部各多少比例視為頁眉頁腳區
+        self.header_window = 8  # 與前後多少頁比對（只比對奇偶相同的頁，以覆蓋交替的頁眉）
+        self._layout_cache = {}
+        self.segmentation = 'auto'  # 章節分割：auto = 有書籤目錄時按目錄，否則用標題規則；heuristic = 只用標題規則
+        self.workers = os.cpu_count() or 1  # 頁面提取的進程數（1 = 單進程）
+        self.parallel_min_pages = 64  # 少於此頁數時不值得啟動進程池
+        self.pages_per_task = 32  # 每個進程任務處理的頁數
+        self.max_download_mb = 500  # 網路PDF大小上限（MB），超過則放棄下載
+        self.download_dir = os.path.join(tempfile.gettempdir(), 'ourreader_pdf_cache')  # 下載緩存目錄
+        self.download_chunk_bytes = 256 * 1024  # 串流下載的分塊大小
+        self.download_retries = 3  # 下載中斷後的續傳次數
+        self.download_retry_delay = 2  # 續傳前等待秒數
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
@@ -80,8 +151,12 @@ class PDFToEbookConverter:
             print(f"📊 處理限制：最多 {self.max_pages} 頁")
             print("-" * 60)
             
-            # 提取章節
-            chapters = self._extract_chapters_from_pdf(pdf_document)
+            # 提取章節：優先使用PDF書籤目錄，沒有目錄時才按標題規則猜測
+            sections = self._outline_sections(pdf_document) if self.segmentation == 'auto' else []
+            if sections:
+                chapters = self._extract_chapters_from_outline(pdf_document, sections)
+            else:
+                chapters = self._extract_chapters_from_pdf(pdf_document)
             
             # 關閉PDF
             pdf_document.close()
@@ -120,37 +195,18 @@ class PDFToEbookConverter:
                 self.stats['end_time'] = time.time()
     
     def _download_and_open_pdf(self, url):
-        """下載並打開網路PDF"""
+        """下載並打開網路PDF（串流寫入緩存文件後從磁盤打開）"""
         try:
             print("   📥 正在下載PDF...")
             
-            # 發送HEAD請求檢查文件大小
-            head_response = self.session.head(url, timeout=10)
-            content_length = head_response.headers.get('Content-Length')
-            
-            if content_length:
-                file_size_mb = int(content_length) / (1024 * 1024)
-                if file_size_mb > 100:  # 100MB 限制
-                    print(f"⚠️ 文件太大（{file_size_mb:.1f}MB），可能需要很長時間")
-                    confirm = input("是否繼續？(y/n): ").lower().strip()
-                    if confirm != 'y':
-                        return None
-                
-                print(f"   📊 文件大小：{file_size_mb:.1f}MB")
-            
-            # 下載PDF
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            
-            # 檢查內容類型
-            content_type = response.headers.get('Content-Type', '').lower()
-            if 'pdf' not in content_type:
-                print(f"⚠️ 警告：內容類型不是PDF ({content_type})")
+            pdf_path = self._download_pdf(url)
+            if not pdf_path:
+                return None
             
             print("   ✅ 下載完成，正在打開PDF...")
             
-            # 使用內存流打開PDF
-            pdf_document = fitz.open(stream=response.content, filetype="pdf")
+            # 從文件打開，MuPDF 按需讀取頁面，不必把整個PDF載入內存
+            pdf_document = fitz.open(pdf_path)
             return pdf_document
             
         except requests.exceptions.RequestException as e:
@@ -160,6 +216,148 @@ class PDFToEbookConverter:
             print(f"❌ 打開PDF失敗：{e}")
             return None
     
+    def _download_pdf(self, url):
+        """
+        分塊串流下載PDF到緩存目錄，支援 HTTP Range 斷點續傳
+        返回完整文件路徑；超過大小上限時返回 None
+        """
+        max_bytes = self.max_download_mb * 1024 * 1024
+        os.makedirs(self.download_dir, exist_ok=True)
+        
+        cache_key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        pdf_path = os.path.join(self.download_dir, f"{cache_key}.pdf")
+        part_path = pdf_path + '.part'
+        meta_path = pdf_path + '.meta.json'
+        
+        # 發送HEAD請求檢查文件大小和版本標識
+        total_size, validator = None, None
+        try:
+            head_response = self.session.head(url, timeout=10, allow_redirects=True)
+            if head_response.ok:
+                total_size = self._parse_content_length(head_response.headers)
+                validator = head_response.headers.get('ETag') or head_response.headers.get('Last-Modified')
+        except requests.exceptions.RequestException:
+            pass
+        
+        if total_size is not None:
+            file_size_mb = total_size / (1024 * 1024)
+            if total_size > max_bytes:
+                print(f"⚠️ 文件太大（{file_size_mb:.1f}MB），超過上限 {self.max_download_mb}MB，已放棄")
+                return None
+            print(f"   📊 文件大小：{file_size_mb:.1f}MB")
+        
+        # 只有在服務器給出版本標識或大小且與上次一致時，才重用緩存或續傳
+        meta = self._load_download_meta(meta_path)
+        same_version = bool(validator or total_size) and \
+            meta.get('validator') == validator and meta.get('size') == total_size
+        
+        if same_version and os.path.exists(pdf_path):
+            print("   ♻️ 使用已緩存的PDF")
+            return pdf_path
+        
+        if not same_version and os.path.exists(part_path):
+            os.remove(part_path)
+        
+        self._save_download_meta(meta_path, validator, total_size)
+        
+        for attempt in range(self.download_retries + 1):
+            downloaded = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {}
+            if downloaded:
+                headers['Range'] = f"bytes={downloaded}-"
+                if validator:
+                    # 文件已變更時服務器會返回完整的 200 響應，而不是錯位的片段
+                    headers['If-Range'] = validator
+                print(f"   ⏯️ 從 {downloaded / (1024 * 1024):.1f}MB 處續傳...")
+            
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=30) as response:
+                    if response.status_code == 416:
+                        # 已有片段與服務器文件不符，從頭下載
+                        os.remove(part_path)
+                        continue
+                    
+                    response.raise_for_status()
+                    
+                    if downloaded and response.status_code != 206:
+                        print("   🔄 服務器不支援續傳或文件已變更，重新下載")
+                        downloaded = 0
+                    
+                    if attempt == 0:
+                        # 檢查內容類型
+                        content_type = response.headers.get('Content-Type', '').lower()
+                        if 'pdf' not in content_type:
+                            print(f"⚠️ 警告：內容類型不是PDF ({content_type})")
+                    
+                    remaining = self._parse_content_length(response.headers)
+                    if remaining is not None:
+                        if downloaded + remaining > max_bytes:
+                            print(f"⚠️ 文件太大，超過上限 {self.max_download_mb}MB，已放棄")
+                            self._discard_download(part_path, meta_path)
+                            return None
+                        total_size = downloaded + remaining
+                    
+                    next_report = downloaded + 10 * 1024 * 1024
+                    with open(part_path, 'ab' if downloaded else 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=self.download_chunk_bytes):
+                            f.write(chunk)
+                            downloaded += len(chunk)
+                            
+                            if downloaded > max_bytes:
+                                print(f"⚠️ 下載超過上限 {self.max_download_mb}MB，已放棄")
+                                f.close()
+                                self._discard_download(part_path, meta_path)
+                                return None
+                            
+                            if downloaded >= next_report:
+                                if total_size:
+                                    print(f"   📥 已下載 {downloaded / (1024 * 1024):.1f}/{total_size / (1024 * 1024):.1f}MB")
+                                else:
+                                    print(f"   📥 已下載 {downloaded / (1024 * 1024):.1f}MB")
+                                next_report = downloaded + 10 * 1024 * 1024
+                
+                if total_size is not None and downloaded < total_size:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        f"連接提前關閉（{downloaded}/{total_size} 字節）"
+                    )
+                
+                os.replace(part_path, pdf_path)
+                return pdf_path
+                
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                if attempt >= self.download_retries:
+                    raise
+                print(f"   ⚠️ 下載中斷：{e}")
+                time.sleep(self.download_retry_delay)
+        
+        raise requests.exceptions.RequestException("多次嘗試後仍無法完成下載")
+    
+    def _parse_content_length(self, headers):
+        """解析 Content-Length，缺失或無效時返回 None"""
+        content_length = headers.get('Content-Length', '')
+        return int(content_length) if content_length.isdigit() else None
+    
+    def _load_download_meta(self, meta_path):
+        """讀取緩存文件的版本信息"""
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_download_meta(self, meta_path, validator, size):
+        """保存緩存文件的版本信息，供下次重用緩存或續傳時比對"""
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'validator': validator, 'size': size}, f)
+    
+    def _discard_download(self, part_path, meta_path):
+        """刪除未完成的下載及其版本信息"""
+        for path in (part_path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
     def _extract_book_info(self, pdf_document, pdf_input, metadata):
         """提取書籍基本信息"""
         # ...existing code... (從元數據獲取信息)
@@ -207,82 +405,371 @@ class PDFToEbookConverter:
     def _extract_chapters_from_pdf(self, pdf_document):
         """從PDF提取章節"""
         chapters = []
-        current_chapter_content = ""
-        current_chapter_title = "開始"
-        chapter_count = 1
+        chapter = ChapterBuffer("開始", 0)
         
         max_pages_to_process = min(pdf_document.page_count, self.max_pages)
         
-        for page_num in range(max_pages_to_process):
-            try:
-                page = pdf_document[page_num]
-                page_text = page.get_text()
-                
-                cleaned_text = self._clean_pdf_text(page_text)
-                
-                if len(cleaned_text) < self.min_text_length:
-                    self.stats['skipped_pages'] += 1
-                    continue
-                
-                self.stats['processed_pages'] += 1
-                
-                potential_title = self._detect_chapter_title(cleaned_text)
+        # 頁面提取可在多進程中進行，章節組裝始終在主進程按頁序完成
+        for page_num, cleaned_text, potential_title, error in self._iter_page_results(pdf_document, 0, max_pages_to_process):
+            if error:
+                print(f"⚠️ 處理第 {page_num + 1} 頁時出錯：{error}")
+                self.stats['skipped_pages'] += 1
+                continue
+            
+            if len(cleaned_text) < self.min_text_length:
+                self.stats['skipped_pages'] += 1
+                continue
+            
+            self.stats['processed_pages'] += 1
+            
+            if potential_title and chapter.has_content():
+                if self._is_valid_chapter_content(chapter):
+                    chapters.append(self._chapter_record(chapter))
                 
-                if potential_title and current_chapter_content.strip():
-                    if self._is_valid_chapter_content(current_chapter_content):
-                        chapters.append({
-                            'title': current_chapter_title,
-                            'content': current_chapter_content.strip(),
-                            'page_start': page_num - 1,
-                            'page_end': page_num,
-                            'char_count': len(current_chapter_content),
-                            'word_count': len(current_chapter_content.split())
-                        })
-                        
-                        self.stats['total_characters'] += len(current_chapter_content)
-                        self.stats['total_words'] += len(current_chapter_content.split())
-                    
-                    current_chapter_title = potential_title
-                    current_chapter_content = cleaned_text
-                    chapter_count += 1
-                    
-                    print(f"📖 發現第 {len(chapters) + 1} 章：{potential_title}")
-                    
-                else:
-                    if current_chapter_content:
-                        current_chapter_content += "\n\n" + cleaned_text
-                    else:
-                        current_chapter_content = cleaned_text
+                chapter = ChapterBuffer(potential_title, page_num)
+                chapter.append(cleaned_text, page_num)
                 
-                if (page_num + 1) % 50 == 0:
-                    progress = ((page_num + 1) / max_pages_to_process) * 100
-                    print(f"📄 處理進度：{page_num + 1}/{max_pages_to_process} ({progress:.1f}%) - 已找到 {len(chapters)} 章")
+                print(f"📖 發現第 {len(chapters) + 1} 章：{potential_title}")
                 
-            except Exception as e:
-                print(f"⚠️ 處理第 {page_num + 1} 頁時出錯：{e}")
-                self.stats['skipped_pages'] += 1
+            else:
+                chapter.append(cleaned_text, page_num)
+            
+            if (page_num + 1) % 50 == 0:
+                progress = ((page_num + 1) / max_pages_to_process) * 100
+                print(f"📄 處理進度：{page_num + 1}/{max_pages_to_process} ({progress:.1f}%) - 已找到 {len(chapters)} 章")
+        
+        if chapter.has_content() and self._is_valid_chapter_content(chapter):
+            chapters.append(self._chapter_record(chapter))
+        
+        self.stats['total_chapters'] = len(chapters)
+        
+        print(f"\n✅ 章節提取完成：共 {len(chapters)} 章")
+        return chapters
+    
+    def _chapter_record(self, chapter, page_end=None):
+        """把章節緩衝拼接為章節記錄，並累計統計"""
+        self.stats['total_characters'] += chapter.char_count
+        self.stats['total_words'] += chapter.word_count
+        
+        return {
+            'title': chapter.title,
+            'content': chapter.text().strip(),
+            'page_start': chapter.page_start,
+            'page_end': chapter.page_end if page_end is None else page_end,
+            'char_count': chapter.char_count,
+            'word_count': chapter.word_count
+        }
+    
+    def _outline_sections(self, pdf_document):
+        """
+        從PDF書籤目錄生成章節分段 [(標題, 起始頁), ...]（頁碼從0開始，按頁序排列）
+        使用至少有兩個有效條目的最淺層級；沒有可用目錄時返回空列表
+        """
+        try:
+            toc = pdf_document.get_toc(simple=True)
+        except Exception:
+            return []
+        
+        max_pages_to_process = min(pdf_document.page_count, self.max_pages)
+        entries = [(level, title.strip(), page - 1) for level, title, page in toc
+                   if title.strip() and 1 <= page <= pdf_document.page_count]
+        
+        levels = sorted({level for level, _, _ in entries})
+        chapter_level = next((level for level in levels
+                              if sum(1 for entry in entries if entry[0] == level) >= 2), None)
+        if chapter_level is None:
+            return []
+        
+        # 更深層級的書籤併入所屬章節；多個書籤指向同一頁時保留第一個
+        sections = []
+        seen_pages = set()
+        for level, title, page_num in sorted(
+                (entry for entry in entries if entry[0] == chapter_level), key=lambda entry: entry[2]):
+            if page_num in seen_pages or page_num >= max_pages_to_process:
                 continue
+            seen_pages.add(page_num)
+            sections.append((title, page_num))
         
-        if current_chapter_content.strip() and self._is_valid_chapter_content(current_chapter_content):
-            chapters.append({
-                'title': current_chapter_title,
-                'content': current_chapter_content.strip(),
-                'page_start': 0,
-                'page_end': max_pages_to_process - 1,
-                'char_count': len(current_chapter_content),
-                'word_count': len(current_chapter_content.split())
-            })
+        return sections
+    
+    def _page_label(self, pdf_document, page_num):
+        """返回PDF自帶的頁碼標籤（如 xii、A-3），沒有時返回實際頁碼"""
+        try:
+            label = pdf_document[page_num].get_label()
+        except Exception:
+            label = ''
+        return label or str(page_num + 1)
+    
+    def _extract_chapters_from_outline(self, pdf_document, sections):
+        """按書籤目錄的頁範圍提取章節，只處理目錄覆蓋的頁面"""
+        chapters = []
+        max_pages_to_process = min(pdf_document.page_count, self.max_pages)
+        first_page = sections[0][1]
+        section_starts = {page_num: index for index, (_, page_num) in enumerate(sections)}
+        
+        print(f"📑 使用PDF書籤目錄：共 {len(sections)} 章")
+        
+        # 第一個書籤之前的封面、版權頁等不提取
+        self.stats['skipped_pages'] += first_page
+        
+        chapter = None
+        
+        def flush(end_page):
+            if chapter is None or not chapter.has_content():
+                return
+            record = self._chapter_record(chapter, page_end=end_page)
+            record['page_labels'] = (self._page_label(pdf_document, chapter.page_start),
+                                     self._page_label(pdf_document, end_page))
+            chapters.append(record)
+            label_start, label_end = record['page_labels']
+            print(f"📖 第 {len(chapters)} 章：{chapter.title}（第 {label_start}–{label_end} 頁）")
+        
+        for page_num, cleaned_text, _, error in self._iter_page_results(
+                pdf_document, first_page, max_pages_to_process, detect_titles=False):
+            if page_num in section_starts:
+                flush(page_num - 1)
+                chapter = ChapterBuffer(sections[section_starts[page_num]][0], page_num)
+            
+            if error:
+                print(f"⚠️ 處理第 {page_num + 1} 頁時出錯：{error}")
+                self.stats['skipped_pages'] += 1
+                continue
             
-            self.stats['total_characters'] += len(current_chapter_content)
-            self.stats['total_words'] += len(current_chapter_content.split())
+            if len(cleaned_text) < self.min_text_length:
+                self.stats['skipped_pages'] += 1
+                continue
+            
+            self.stats['processed_pages'] += 1
+            chapter.append(cleaned_text, page_num)
+            
+            if (page_num + 1) % 50 == 0:
+                progress = ((page_num + 1) / max_pages_to_process) * 100
+                print(f"📄 處理進度：{page_num + 1}/{max_pages_to_process} ({progress:.1f}%) - 已找到 {len(chapters)} 章")
+        
+        flush(max_pages_to_process - 1)
         
         self.stats['total_chapters'] = len(chapters)
         
         print(f"\n✅ 章節提取完成：共 {len(chapters)} 章")
         return chapters
     
-    def _clean_pdf_text(self, text):
-        """清理PDF提取的文本"""
+    def _extract_page(self, pdf_document, page_num, detect_titles=True):
+        """提取單頁文本，返回 (清理後文本, 章節標題候選)"""
+        if not self.layout_header_footer:
+            cleaned_text = self._clean_pdf_text(pdf_document[page_num].get_text())
+            return cleaned_text, self._detect_chapter_title(cleaned_text) if detect_titles else None
+        
+        fragments, _, _ = self._page_layout(pdf_document, page_num)
+        sides = self._neighbour_pages(page_num, pdf_document.page_count)
+        bands = {other: self._page_layout(pdf_document, other)[1:] for side in sides for other in side}
+        return self._finish_page(fragments, sides, bands, detect_titles)
+    
+    def _finish_page(self, fragments, sides, bands, detect_titles=True):
+        """按鄰頁的頁眉頁腳區內容去掉本頁頁眉頁腳，清理並檢測標題，返回 (清理後文本, 章節標題候選)"""
+        page_text, compared = self._page_text_without_running_lines(fragments, sides, bands)
+        # 版面比對已去掉頁眉頁腳時不再逐行匹配規則；鄰頁不足（文件首尾、頁數很少）才退回規則
+        cleaned_text = self._clean_pdf_text(page_text, match_header_footer=not compared)
+        return cleaned_text, self._detect_chapter_title(cleaned_text) if detect_titles else None
+    
+    def _page_layout(self, pdf_document, page_num):
+        """
+        返回 (文本片段列表, 頁眉區內容集合, 頁腳區內容集合)
+        片段是正文文本塊或頁眉頁腳區內的單行，格式為 (文字, 所在區域, 比對用內容)，區域是 'top'、'bottom' 或 None
+        結果按頁緩存，連續處理時每頁只解析一次
+        """
+        if page_num in self._layout_cache:
+            return self._layout_cache[page_num]
+        
+        page = pdf_document[page_num]
+        band = page.rect.height * self.header_band_ratio
+        top_limit = page.rect.y0 + band
+        bottom_limit = page.rect.y1 - band
+        
+        fragments = []
+        top_keys, bottom_keys = set(), set()
+        
+        def add(text, region):
+            key = None
+            if region == 'top':
+                key = self._layout_key(text)
+                top_keys.add(key)
+            elif region == 'bottom':
+                key = self._layout_key(text)
+                bottom_keys.add(key)
+            fragments.append((text, region, key))
+        
+        for x0, y0, x1, y1, text, block_no, block_type in page.get_text("blocks", flags=fitz.TEXTFLAGS_TEXT):
+            if block_type != 0:
+                continue  # 圖片塊
+            
+            block_lines = text.splitlines(keepends=True)
+            
+            if y1 <= top_limit or y0 >= bottom_limit:
+                # 整塊位於頁眉或頁腳區：逐行比對（頁眉和章節標題常被合併為一個塊）
+                for line in block_lines:
+                    add(line, 'top' if y1 <= top_limit else 'bottom')
+                continue
+            
+            # 跨越區域邊界的文本塊，只有首行可能是頁眉、末行可能是頁腳
+            head = block_lines.pop(0) if y0 < top_limit and len(block_lines) > 1 else None
+            tail = block_lines.pop() if y1 > bottom_limit and len(block_lines) > 1 else None
+            if head:
+                add(head, 'top')
+            add(''.join(block_lines), None)
+            if tail:
+                add(tail, 'bottom')
+        
+        # 只保留比對窗口內的頁面
+        for cached_page in [cached for cached in self._layout_cache
+                            if abs(cached - page_num) > self.header_window * 2]:
+            del self._layout_cache[cached_page]
+        
+        self._layout_cache[page_num] = (fragments, top_keys, bottom_keys)
+        return self._layout_cache[page_num]
+    
+    def _layout_key(self, text):
+        """頁眉頁腳比對用的內容：忽略空白和大小寫，像頁碼的短行統一為 #"""
+        key = ' '.join(text.split()).lower()
+        if len(key) <= self.LAYOUT_PAGE_NUMBER_MAX_LENGTH and self.LAYOUT_PAGE_NUMBER_PATTERN.match(key):
+            return '#'
+        return key
+    
+    def _neighbour_pages(self, page_num, page_count):
+        """
+        返回用來比對頁眉頁腳的鄰頁：前面和後面 header_window 頁內奇偶相同的頁面各一組
+        不足兩頁的一組無法判斷多數，不返回
+        """
+        before = [other for other in range(page_num - 2, page_num - self.header_window - 1, -2) if other >= 0]
+        after = [other for other in range(page_num + 2, page_num + self.header_window + 1, 2) if other < page_count]
+        return [side for side in (before, after) if len(side) >= 2]
+    
+    def _page_text_without_running_lines(self, fragments, sides, bands):
+        """
+        按位置拼接頁面文字，去掉頁眉頁腳，返回 (文字, 是否做了鄰頁比對)
+        位於頂部或底部區域、且在前面或後面大多數鄰頁的同一區域重複出現的片段視為頁眉頁腳；
+        只在一兩頁重複的內容（如相鄰的短章標題）會保留
+        bands 是 {鄰頁頁碼: (頁眉區內容集合, 頁腳區內容集合)}，出錯的鄰頁不在其中
+        """
+        running_top, running_bottom = set(), set()
+        compared = False
+        
+        # 前後分開判斷，章節邊界附近只要有一側的頁面大多重複即可
+        for side in sides:
+            side = [other for other in side if other in bands]
+            if len(side) < 2:
+                continue
+            compared = True
+            
+            top_counts, bottom_counts = Counter(), Counter()
+            for other in side:
+                top_keys, bottom_keys = bands[other]
+                top_counts.update(top_keys)
+                bottom_counts.update(bottom_keys)
+            
+            majority = len(side) // 2 + 1
+            running_top.update(key for key, count in top_counts.items() if count >= majority)
+            running_bottom.update(key for key, count in bottom_counts.items() if count >= majority)
+        
+        kept = []
+        for text, region, key in fragments:
+            if region == 'top' and key in running_top:
+                continue
+            if region == 'bottom' and key in running_bottom:
+                continue
+            kept.append(text)
+        
+        # 每個片段都以換行結尾，沒有移除任何片段時拼接結果與 page.get_text() 相同
+        return ''.join(kept), compared
+    
+    def _page_settings(self):
+        """傳給進程池工作者的頁面處理設定"""
+        return {
+            'layout_header_footer': self.layout_header_footer,
+            'header_band_ratio': self.header_band_ratio,
+            'header_window': self.header_window,
+        }
+    
+    def _iter_page_results(self, pdf_document, start_page, end_page, detect_titles=True):
+        """
+        按頁序產生 [start_page, end_page) 範圍內的 (頁碼, 清理後文本, 章節標題候選, 錯誤)
+        頁數足夠且PDF在磁盤上時，按頁範圍分派到進程池，每個進程自行打開文件
+        """
+        page_count = end_page - start_page
+        self._layout_cache = {}  # 頁面佈局緩存只對同一份文件有效
+        workers = min(self.workers or 1, (page_count + self.pages_per_task - 1) // self.pages_per_task)
+        pdf_path = pdf_document.name
+        
+        if workers <= 1 or page_count < self.parallel_min_pages or not pdf_path or not os.path.exists(pdf_path):
+            for page_num in range(start_page, end_page):
+                try:
+                    cleaned_text, potential_title = self._extract_page(pdf_document, page_num, detect_titles)
+                    yield page_num, cleaned_text, potential_title, None
+                except Exception as e:
+                    yield page_num, "", None, e
+            return
+        
+        page_ranges = [(start, min(start + self.pages_per_task, end_page), detect_titles)
+                       for start in range(start_page, end_page, self.pages_per_task)]
+        print(f"⚡ 並行提取：{workers} 個進程，{len(page_ranges)} 個頁範圍")
+        
+        def in_page_order(results, edge_future):
+            if edge_future is not None:
+                results = sorted(results + edge_future.result(), key=lambda result: result[0])
+            return results
+        
+        # 每個進程只解析自己範圍內的頁面；比對鄰頁超出範圍的邊緣頁，等相鄰範圍帶回
+        # 邊緣頁的頁眉頁腳內容後，連同已解析的片段再交給進程池完成，不重新解析任何一頁
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_page_worker,
+                                 initargs=(pdf_path, self._page_settings())) as executor:
+            bands = {}
+            waiting = deque()  # 按頁範圍順序排隊的 (已完成結果, 邊緣頁任務)
+            previous = None
+            
+            # executor.map 按提交順序返回結果，保證章節組裝確定且有序
+            for index, current in enumerate(chain(executor.map(_extract_page_range, page_ranges), [None])):
+                if current is not None:
+                    bands.update(current[2])
+                
+                if previous is not None:
+                    # 上一個範圍的前後相鄰範圍都已返回，可以完成它的邊緣頁
+                    results, pending, _ = previous
+                    edge_future = None
+                    if pending:
+                        edge_bands = self._neighbour_bands(pdf_document, pending, bands, start_page, end_page)
+                        edge_future = executor.submit(_finish_edge_pages, (pending, edge_bands, detect_titles))
+                    waiting.append((results, edge_future))
+                    
+                    range_start = page_ranges[index - 1][0]
+                    for page in [page for page in bands if page < range_start]:
+                        del bands[page]
+                previous = current
+                
+                while waiting and (waiting[0][1] is None or waiting[0][1].done()):
+                    yield from in_page_order(*waiting.popleft())
+            
+            while waiting:
+                yield from in_page_order(*waiting.popleft())
+    
+    def _neighbour_bands(self, pdf_document, pending, bands, start_page, end_page):
+        """
+        收集邊緣頁比對需要的鄰頁頁眉頁腳內容
+        提取範圍以外的鄰頁（如書籤目錄第一章之前的頁面）沒有進程處理，在主進程解析
+        """
+        needed = {}
+        for page_num in pending:
+            for side in self._neighbour_pages(page_num, pdf_document.page_count):
+                for other in side:
+                    if other in bands:
+                        needed[other] = bands[other]
+                    elif not start_page <= other < end_page and other not in needed:
+                        try:
+                            needed[other] = self._page_layout(pdf_document, other)[1:]
+                        except Exception:
+                            pass  # 出錯的鄰頁不參與比對
+        return needed
+    
+    def _clean_pdf_text(self, text, match_header_footer=True):
+        """清理PDF提取的文本；match_header_footer 為 False 時不再按規則逐行判斷頁眉頁腳"""
         text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
         text = re.sub(r'([。！？])([a-zA-Z\u4e00-\u9fff])', r'\1\n\2', text)
         
@@ -302,7 +789,7 @@ class PDFToEbookConverter:
             if len(line) < 3:
                 continue
             
-            if self._is_header_footer(line):
+            if match_header_footer and self._is_header_footer(line):
                 continue
             
             cleaned_lines.append(line)
@@ -326,23 +813,7 @@ class PDFToEbookConverter:
     
     def _is_header_footer(self, line):
         """判斷是否為頁眉頁腳"""
-        patterns = [
-            r'^第?\s*\d+\s*頁',
-            r'^Page\s*\d+',
-            r'Copyright\s*©',
-            r'版權所有',
-            r'www\.',
-            r'http[s]?://',
-            r'ISBN',
-            r'出版社',
-            r'^\d{4}年\d{1,2}月',
-        ]
-        
-        for pattern in patterns:
-            if re.search(pattern, line, re.I):
-                return True
-        
-        return False
+        return self.HEADER_FOOTER_PATTERN.search(line) is not None
     
     def _detect_chapter_title(self, text):
         """檢測章節標題"""
@@ -366,19 +837,15 @@ class PDFToEbookConverter:
         
         return None
     
-    def _is_valid_chapter_content(self, content):
-        """判斷是否為有效的章節內容"""
-        content = content.strip()
-        
-        if len(content) < 100:
+    def _is_valid_chapter_content(self, chapter):
+        """判斷是否為有效的章節內容（使用章節緩衝的累計計數，無需重新掃描全文）"""
+        if chapter.char_count < 100:
             return False
         
-        words = content.split()
-        if len(words) < 30:
+        if chapter.word_count < 30:
             return False
         
-        text_chars = sum(1 for c in content if c.isalpha() or '\u4e00' <= c <= '\u9fff')
-        if text_chars / len(content) < 0.3:
+        if chapter.text_chars / chapter.char_count < 0.3:
             return False
         
         return True
@@ -542,6 +1009,64 @@ class PDFToEbookConverter:
         
         print("=" * 70)
 
+# 進程池工作者狀態：每個進程打開一次PDF，之後重複使用
+_worker_document = None
+_worker_converter = None
+
+def _init_page_worker(pdf_path, settings):
+    """進程池初始化：在工作進程內自行打開PDF，並沿用主進程的頁面處理設定"""
+    global _worker_document, _worker_converter
+    _worker_document = fitz.open(pdf_path)
+    _worker_converter = PDFToEbookConverter()
+    for key, value in settings.items():
+        setattr(_worker_converter, key, value)
+
+def _extract_page_range(page_range):
+    """
+    在工作進程中提取一段頁範圍，只解析範圍內的頁面
+    返回 (已完成的 [(頁碼, 清理後文本, 章節標題候選, 錯誤), ...], {邊緣頁碼: 版面片段}, {頁碼: (頁眉區內容集合, 頁腳區內容集合)})
+    比對鄰頁超出範圍的邊緣頁先不完成；範圍兩端的頁眉頁腳內容帶回主進程，供相鄰範圍的邊緣頁比對
+    """
+    start, end, detect_titles = page_range
+    converter, document = _worker_converter, _worker_document
+    edge = converter.header_window * 2  # 邊緣頁和它在範圍內的鄰頁都落在兩端這麼多頁之內
+    results, pending, bands = [], {}, {}
+    
+    for page_num in range(start, end):
+        try:
+            if converter.layout_header_footer:
+                fragments, top_keys, bottom_keys = converter._page_layout(document, page_num)
+                if page_num < start + edge or page_num >= end - edge:
+                    bands[page_num] = (top_keys, bottom_keys)
+                
+                sides = converter._neighbour_pages(page_num, document.page_count)
+                if not all(start <= other < end for side in sides for other in side):
+                    pending[page_num] = fragments
+                    continue
+            
+            cleaned_text, potential_title = converter._extract_page(document, page_num, detect_titles)
+            results.append((page_num, cleaned_text, potential_title, None))
+        except Exception as e:
+            # 異常對象不一定可序列化，轉為字符串傳回主進程
+            results.append((page_num, "", None, str(e)))
+    
+    return results, pending, bands
+
+def _finish_edge_pages(task):
+    """在工作進程中用相鄰範圍帶回的頁眉頁腳內容完成邊緣頁，返回 [(頁碼, 清理後文本, 章節標題候選, 錯誤), ...]"""
+    pending, bands, detect_titles = task
+    results = []
+    
+    for page_num, fragments in pending.items():
+        try:
+            sides = _worker_converter._neighbour_pages(page_num, _worker_document.page_count)
+            cleaned_text, potential_title = _worker_converter._finish_page(fragments, sides, bands, detect_titles)
+            results.append((page_num, cleaned_text, potential_title, None))
+        except Exception as e:
+            results.append((page_num, "", None, str(e)))
+    
+    return results
+
 def main():
     """主函數"""
     converter = PDFToEbookConverter()
@@ -576,6 +1101,14 @@ def main():
         if chars_per_page_input.isdigit():
             converter.max_chars_per_page = int(chars_per_page_input)
         
+        segmentation_input = input(f"章節分割（auto = 優先用書籤目錄，heuristic = 標題規則；默認{converter.segmentation}）：").strip().lower()
+        if segmentation_input in ('auto', 'heuristic'):
+            converter.segmentation = segmentation_input
+        
+        workers_input = input(f"並行進程數（默認{converter.workers}，1 = 單進程）：").strip()
+        if workers_input.isdigit() and int(workers_input) > 0:
+            converter.workers = int(workers_input)
+        
         output_name = input("自訂輸出文件名（不含.json，按Enter自動生成）：").strip()
         if output_name:
             output_name = output_name.replace('.json', '') + '.json'